@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Group-by / top-k queries over stored Search Analytics
+Runs against the columnar tables built from analytics_store partitions,
+so ad-hoc questions cost no API calls
+"""
+
+import heapq
+import math
+import re
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from columnar_store import AnalyticsTable
+
+DIMENSIONS = ["query", "page", "date", "country", "device"]
+SORT_METRICS = ["clicks", "impressions", "ctr", "position"]
+
+# Checked in this order, so '!=' is not mistaken for '='
+FILTER_OPERATORS = {
+    "!=": "not equal",
+    "^=": "starts with",
+    "*=": "contains",
+    "~=": "matches regex",
+    "=": "equals",
+}
+
+class QueryError(Exception):
+    """Invalid query: unknown dimension, bad filter or regex"""
+
+class Filter:
+    """A dimension condition such as page^=https://example.com/blog/"""
+
+    def __init__(self, dimension: str, operator: str, value: str):
+        if operator not in FILTER_OPERATORS:
+            raise QueryError(f"Unknown filter operator: {operator}")
+        self.dimension = dimension
+        self.operator = operator
+        self.value = value
+        if operator == "~=":
+            try:
+                self.pattern = re.compile(value)
+            except re.error as e:
+                raise QueryError(f"Bad regex in filter {self}: {e}")
+
+    @classmethod
+    def parse(cls, text: str) -> "Filter":
+        """Parse 'dimension<op>value', e.g. 'query~=^how ' or 'country=usa'"""
+        for operator in FILTER_OPERATORS:
+            dimension, found, value = text.partition(operator)
+            if found and dimension and re.fullmatch(r"\w+", dimension):
+                return cls(dimension, operator, value)
+        raise QueryError(f"Cannot parse filter '{text}' "
+                         f"(use one of: {', '.join('dim' + op + 'value' for op in FILTER_OPERATORS)})")
+
+    def matches(self, value: str) -> bool:
+        if self.operator == "=":
+            return value == self.value
+        if self.operator == "!=":
+            return value != self.value
+        if self.operator == "^=":
+            return value.startswith(self.value)
+        if self.operator == "*=":
+            return self.value in value
+        return self.pattern.search(value) is not None
+
+    def __str__(self):
+        return f"{self.dimension}{self.operator}{self.value}"
+
+def apply_filters(table: AnalyticsTable, filters: Sequence[Filter],
+                  start: Optional[str] = None, end: Optional[str] = None) -> AnalyticsTable:
+    """
+    Rows passing every filter and falling within [start, end]
+
+    Each filter is evaluated once per distinct dictionary value rather than
+    once per row; rows are then selected through their codes.
+    """
+    if start or end:
+        table = table.between("date", start, end)
+    if not filters:
+        return table
+
+    selector = np.ones(len(table), dtype=bool)
+    for condition in filters:
+        if condition.dimension not in table.codes:
+            raise QueryError(f"Dimension '{condition.dimension}' is not in this store "
+                             f"(has: {', '.join(table.dimensions)})")
+        dictionary = table.dictionaries[condition.dimension]
+        keep = np.fromiter((condition.matches(value) for value in dictionary),
+                           dtype=bool, count=len(dictionary))
+        selector &= keep[table.codes[condition.dimension]]
+    return table.take(selector)
+
+def group_by(table: AnalyticsTable, dimensions: Sequence[str]) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+    """
+    Aggregate metrics per distinct combination of dimensions
+
+    Returns:
+        (group key codes, one row per group with a column per dimension,
+         {"clicks", "impressions", "ctr", "position"} arrays per group)
+    """
+    for dimension in dimensions:
+        if dimension not in table.codes:
+            raise QueryError(f"Dimension '{dimension}' is not in this store "
+                             f"(has: {', '.join(table.dimensions)})")
+
+    if not dimensions:
+        inverse = np.zeros(len(table), dtype=np.int64)
+        keys = np.zeros((1 if len(table) else 0, 0), dtype=np.int64)
+    else:
+        sizes = [len(table.dictionaries[d]) for d in dimensions]
+        if math.prod(sizes) < 2 ** 62:
+            # Mixed-radix number per row: one int64 key instead of a tuple
+            combined = np.zeros(len(table), dtype=np.int64)
+            for dimension, size in zip(dimensions, sizes):
+                combined = combined * size + table.codes[dimension]
+            unique, inverse = np.unique(combined, return_inverse=True)
+            keys = np.empty((len(unique), len(dimensions)), dtype=np.int64)
+            for i in range(len(dimensions) - 1, -1, -1):
+                unique, keys[:, i] = np.divmod(unique, sizes[i])
+        else:
+            stacked = np.stack([table.codes[d].astype(np.int64) for d in dimensions], axis=1)
+            keys, inverse = np.unique(stacked, axis=0, return_inverse=True)
+        inverse = inverse.reshape(-1)
+
+    count = len(keys)
+    clicks = np.bincount(inverse, weights=table.metrics["clicks"], minlength=count)
+    impressions = np.bincount(inverse, weights=table.metrics["impressions"], minlength=count)
+    weighted = np.bincount(inverse, weights=table.metrics["position"] * table.metrics["impressions"].astype(np.float64),
+                           minlength=count)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        metrics = {
+            "clicks": clicks,
+            "impressions": impressions,
+            "ctr": np.where(impressions > 0, clicks / impressions, 0.0),
+            "position": weighted / impressions,
+        }
+    return keys, metrics
+
+def top_k(scores: Sequence[float], k: int, ascending: bool = False) -> List[int]:
+    """Indexes of the k best scores using a bounded heap (NaN always ranks last)"""
+    worst = math.inf if ascending else -math.inf
+    values = [worst if math.isnan(score) else score for score in scores]
+    select = heapq.nsmallest if ascending else heapq.nlargest
+    return select(k, range(len(values)), key=values.__getitem__)
+
+def run_query(table: AnalyticsTable, dimensions: Sequence[str], filters: Sequence[Filter] = (),
+              start: Optional[str] = None, end: Optional[str] = None, limit: int = 10,
+              sort: str = "clicks", ascending: Optional[bool] = None) -> List[Dict]:
+    """
+    Filter, group by dimensions and return the top limit groups by sort
+
+    Position sorts ascending by default (1 is the best position); every
+    other metric sorts descending.
+
+    Returns:
+        [{dimension: value, ..., "clicks", "impressions", "ctr", "position"}]
+    """
+    if sort not in SORT_METRICS:
+        raise QueryError(f"Cannot sort by '{sort}' (use one of: {', '.join(SORT_METRICS)})")
+    if ascending is None:
+        ascending = sort == "position"
+
+    keys, metrics = group_by(apply_filters(table, filters, start, end), dimensions)
+    results = []
+    for index in top_k(metrics[sort].tolist(), limit, ascending):
+        row = {d: str(table.dictionaries[d][keys[index, i]]) for i, d in enumerate(dimensions)}
+        row["clicks"] = int(metrics["clicks"][index])
+        row["impressions"] = int(metrics["impressions"][index])
+        row["ctr"] = float(metrics["ctr"][index])
+        row["position"] = float(metrics["position"][index])
+        results.append(row)
+    return results
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+Incremental, date-partitioned Search Analytics history
+Keeps one file per site, dimension set and day, plus a high-water mark,
+so each sync fetches only new or changed days instead of a rolling window
+"""
+
+import gzip
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterator, List, Optional
+
+from search_analytics import iter_analytics_rows, query_search_analytics, write_rows
+
+STORE_DIR = "analytics_data"
+DEFAULT_BACKFILL_DAYS = 28  # Days fetched on a site's first sync
+DEFAULT_REFETCH_DAYS = 3    # Recent days re-checked for late-finalized data
+DEFAULT_DAY_PARALLEL = 4
+
+def safe_name(value: str) -> str:
+    """Turn a site URL into a directory name"""
+    return "".join(c if c.isalnum() or c in "-." else "_" for c in value)
+
+def day_range(start: date, end: date) -> Iterator[date]:
+    day = start
+    while day <= end:
+        yield day
+        day += timedelta(days=1)
+
+class AnalyticsStore:
+    """
+    Per-day partitions for one site and dimension set
+
+    Layout: <root>/<site>/<dim+dim>/<YYYY-MM-DD>.jsonl.gz holding that day's
+    flattened rows, and _sync.json with the high-water mark and each stored
+    day's totals as reported by a date-only query.
+    """
+
+    def __init__(self, site_url: str, dimensions: List[str], root: str = STORE_DIR):
+        self.site_url = site_url
+        self.dimensions = list(dimensions)
+        self.path = os.path.join(root, safe_name(site_url), "+".join(dimensions))
+        self.state_path = os.path.join(self.path, "_sync.json")
+        try:
+            with open(self.state_path, "r") as f:
+                self.state = json.load(f)
+        except FileNotFoundError:
+            self.state = {"site_url": site_url, "dimensions": self.dimensions,
+                          "high_water": None, "days": {}}
+
+    @property
+    def high_water(self) -> Optional[date]:
+        """Latest stored day"""
+        value = self.state["high_water"]
+        return date.fromisoformat(value) if value else None
+
+    @property
+    def days(self) -> Dict[str, Dict]:
+        """{YYYY-MM-DD: {"rows", "clicks", "impressions", "fetched_at"}}"""
+        return self.state["days"]
+
+    def partition_path(self, day: str) -> str:
+        return os.path.join(self.path, f"{day}.jsonl.gz")
+
+    def write_day(self, day: str, rows: Iterator[Dict]) -> int:
+        """Replace one day's partition; returns its row count"""
+        os.makedirs(self.path, exist_ok=True)
+        return write_rows(rows, self.partition_path(day), self.dimensions)
+
+    def record_day(self, day: str, row_count: int, totals: Dict):
+        """Mark a day as stored and persist the sync state"""
+        self.days[day] = {
+            "rows": row_count,
+            "clicks": totals.get("clicks", 0),
+            "impressions": totals.get("impressions", 0),
+            "fetched_at": datetime.now().isoformat(timespec="seconds"),
+        }
+        self.state["high_water"] = max(self.days)
+        self.save_state()
+
+    def save_state(self):
+        os.makedirs(self.path, exist_ok=True)
+        tmp_path = self.state_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.state, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.state_path)
+
+    def iter_rows(self, start: Optional[str] = None, end: Optional[str] = None) -> Iterator[Dict]:
+        """Yield stored rows between start and end (inclusive), each with its 'date'"""
+        for day in sorted(self.days):
+            if (start and day < start) or (end and day > end):
+                continue
+            with gzip.open(self.partition_path(day), "rt") as f:
+                for line in f:
+                    row = json.loads(line)
+                    row["date"] = day
+                    yield row
+
+    def totals(self, start: Optional[str] = None, end: Optional[str] = None) -> Dict[str, int]:
+        """Clicks and impressions over stored days, from the recorded day totals"""
+        days = [info for day, info in self.days.items()
+                if not ((start and day < start) or (end and day > end))]
+        return {
+            "clicks": sum(info["clicks"] for info in days),
+            "impressions": sum(info["impressions"] for info in days),
+        }
+
+def iter_stores(root: str = STORE_DIR) -> Iterator[AnalyticsStore]:
+    """Every site/dimension store under root that has been synced"""
+    if not os.path.isdir(root):
+        return
+    for site_dir in sorted(os.listdir(root)):
+        site_path = os.path.join(root, site_dir)
+        if not os.path.isdir(site_path):
+            continue
+        for dims_dir in sorted(os.listdir(site_path)):
+            state_path = os.path.join(site_path, dims_dir, "_sync.json")
+            if os.path.exists(state_path):
+                with open(state_path, "r") as f:
+                    state = json.load(f)
+                yield AnalyticsStore(state["site_url"], state["dimensions"], root)
+
+def plan_days(store: AnalyticsStore, probe: Dict[str, Dict], refetch_days: int) -> List[str]:
+    """
+    Choose the days to download
+
+    probe maps each day Google has data for to its date-only totals. A day
+    is fetched if it is not stored yet, or if it falls in the re-fetch
+    window behind the high-water mark and its totals have changed since it
+    was stored. Days without data are never fetched or stored, so the
+    high-water mark only advances over days Google has published.
+    """
+    window_start = None
+    if store.high_water:
+        window_start = (store.high_water - timedelta(days=refetch_days - 1)).isoformat()
+
+    wanted = []
+    for day, totals in sorted(probe.items()):
+        stored = store.days.get(day)
+        if stored is None:
+            wanted.append(day)
+        elif window_start and day >= window_start and (
+                stored["clicks"] != totals["clicks"] or stored["impressions"] != totals["impressions"]):
+            wanted.append(day)
+    return wanted
+
+def sync_site(token: str, site_url: str, dimensions: List[str], root: str = STORE_DIR,
+              backfill_days: Optional[int] = None, refetch_days: int = DEFAULT_REFETCH_DAYS,
+              parallel: int = DEFAULT_DAY_PARALLEL, end: Optional[date] = None,
+              headers: Optional[Dict[str, str]] = None) -> Dict:
+    """
+    Bring one site's partitions up to date
+
+    A single date-dimension query over the candidate range tells which days
+    have data and their totals; only the days chosen by plan_days are then
+    downloaded in full, parallel days at a time. The candidate range starts
+    refetch_days before the high-water mark, or backfill_days before end on
+    the first sync (or when backfill_days is given explicitly).
+
+    Returns:
+        {"site", "fetched": [days], "rows": n, "unchanged": n, "failed": {day: error}}
+    """
+    store = AnalyticsStore(site_url, dimensions, root)
+    end = end or date.today()
+    starts = []
+    if store.high_water:
+        starts.append(store.high_water - timedelta(days=max(refetch_days, 1) - 1))
+    if backfill_days or not store.high_water:
+        starts.append(end - timedelta(days=(backfill_days or DEFAULT_BACKFILL_DAYS) - 1))
+    start = min(starts)
+
+    summary = {"site": site_url, "fetched": [], "rows": 0, "unchanged": 0, "failed": {}}
+    response = query_search_analytics(token, site_url, {
+        "startDate": start.isoformat(),
+        "endDate": end.isoformat(),
+        "dimensions": ["date"],
+        "rowLimit": len(list(day_range(start, end))),
+    }, headers)
+    if "error" in response:
+        summary["failed"]["probe"] = response["error"].get("message", str(response["error"]))
+        return summary
+
+    probe = {
+        row["keys"][0]: {"clicks": row.get("clicks", 0), "impressions": row.get("impressions", 0)}
+        for row in response.get("rows", [])
+    }
+    wanted = plan_days(store, probe, refetch_days)
+    summary["unchanged"] = len(probe) - len(wanted)
+
+    def fetch_day(day: str) -> int:
+        rows = iter_analytics_rows(token, site_url, day, day, dimensions, headers=headers)
+        return store.write_day(day, rows)
+
+    # Each day is recorded as soon as it lands, so an interrupted sync
+    # resumes where it stopped instead of refetching finished days
+    with ThreadPoolExecutor(max_workers=max(parallel, 1)) as executor:
+        futures = {executor.submit(fetch_day, day): day for day in wanted}
+        for future in as_completed(futures):
+            day = futures[future]
+            try:
+                count = future.result()
+            except Exception as e:
+                summary["failed"][day] = str(e)
+                continue
+            store.record_day(day, count, probe[day])
+            summary["fetched"].append(day)
+            summary["rows"] += count
+
+    summary["fetched"].sort()
+    summary["high_water"] = store.state["high_water"]
+    last_week = (end - timedelta(days=6)).isoformat()
+    summary["last_7_days"] = store.totals(start=last_week, end=end.isoformat())
+    return summary
@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+"""
+Shared HTTP client for the Google API scripts
+Pooled keep-alive connections, gzip and structured errors using only the stdlib
+"""
+
+import gzip
+import http.client
+import json
+import os
+import socket
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlencode, urlsplit
+
+from metrics import endpoint_name, get_metrics
+from response_cache import CACHEABLE_STATUS, ResponseCache
+from retry_policy import RetryPolicy, parse_retry_after
+
+DEFAULT_TIMEOUT = 30
+DEFAULT_POOL_SIZE = 8
+USER_AGENT = "gsc-indexing-tools/1.0 (gzip)"
+
+# Send every *.googleapis.com call to this base URL instead (see mock_google_api.py)
+API_OVERRIDE = os.environ.get("GOOGLE_API_OVERRIDE", "").rstrip("/")
+
+# Errors that mean a pooled keep-alive connection was closed by the server
+# before our request reached it, so it is safe to resend on a new connection
+STALE_CONNECTION_ERRORS = (
+    http.client.RemoteDisconnected,
+    http.client.CannotSendRequest,
+    BrokenPipeError,
+    ConnectionResetError,
+)
+
+def resolve_url(url: str) -> str:
+    """Apply GOOGLE_API_OVERRIDE to a Google API URL; other URLs pass through"""
+    if not API_OVERRIDE:
+        return url
+    parts = urlsplit(url)
+    if not (parts.hostname or "").endswith("googleapis.com"):
+        return url
+    return API_OVERRIDE + url[len(f"{parts.scheme}://{parts.netloc}"):]
+
+class ApiError(Exception):
+    """Transport-level failure: DNS, connect, TLS, timeout or a broken connection"""
+
+    def __init__(self, message: str, url: str):
+        super().__init__(message)
+        self.message = message
+        self.url = url
+
+class ApiResponse:
+    """A fully read HTTP response"""
+
+    def __init__(self, status_code: int, headers: Dict[str, str], body: bytes, elapsed: float,
+                 wire_size: Optional[int] = None):
+        self.status_code = status_code
+        self.headers = headers
+        self.body = body
+        self.elapsed = elapsed
+        self.wire_size = len(body) if wire_size is None else wire_size  # Bytes before gunzip
+
+    @property
+    def ok(self) -> bool:
+        return 200 <= self.status_code < 300
+
+    @property
+    def text(self) -> str:
+        return self.body.decode("utf-8", "replace")
+
+    def json(self):
+        return json.loads(self.body) if self.body else {}
+
+class HttpClient:
+    """
+    Thread-safe HTTP/1.1 client with a per-host pool of keep-alive connections
+
+    Each connection is used by one thread at a time. Up to pool_size idle
+    connections per host are kept for reuse; extra ones are closed.
+    """
+
+    def __init__(self, pool_size: int = DEFAULT_POOL_SIZE, timeout: float = DEFAULT_TIMEOUT):
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self._idle: Dict[Tuple[str, str, int], List[http.client.HTTPConnection]] = {}
+        self._lock = threading.Lock()
+
+    def _acquire(self, key: Tuple[str, str, int]) -> Tuple[http.client.HTTPConnection, bool]:
+        """Return (connection, reused)"""
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle:
+                return idle.pop(), True
+        scheme, host, port = key
+        if scheme == "https":
+            return http.client.HTTPSConnection(host, port, timeout=self.timeout), False
+        return http.client.HTTPConnection(host, port, timeout=self.timeout), False
+
+    def _release(self, key: Tuple[str, str, int], conn: http.client.HTTPConnection):
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.pool_size:
+                idle.append(conn)
+                return
+        conn.close()
+
+    def request(self, method: str, url: str, headers: Optional[Dict[str, str]] = None,
+                body: Optional[bytes] = None) -> ApiResponse:
+        """
+        Send a request and read the whole response
+
+        Raises:
+            ApiError: if no HTTP response could be obtained
+        """
+        url = resolve_url(url)
+        parts = urlsplit(url)
+        port = parts.port or (443 if parts.scheme == "https" else 80)
+        key = (parts.scheme, parts.hostname, port)
+        path = parts.path or "/"
+        if parts.query:
+            path += "?" + parts.query
+
+        send_headers = {
+            "Accept-Encoding": "gzip",
+            "User-Agent": USER_AGENT,
+        }
+        send_headers.update(headers or {})
+
+        while True:
+            conn, reused = self._acquire(key)
+            start = time.perf_counter()
+            try:
+                conn.request(method, path, body=body, headers=send_headers)
+                response = conn.getresponse()
+                payload = response.read()
+            except STALE_CONNECTION_ERRORS as e:
+                conn.close()
+                if reused:
+                    continue
+                raise ApiError(f"Connection failed: {e}", url) from e
+            except (OSError, http.client.HTTPException, socket.timeout) as e:
+                conn.close()
+                raise ApiError(f"{type(e).__name__}: {e}", url) from e
+            break
+
+        elapsed = time.perf_counter() - start
+        response_headers = {k.lower(): v for k, v in response.getheaders()}
+        wire_size = len(payload)
+        if response_headers.get("content-encoding") == "gzip":
+            payload = gzip.decompress(payload)
+
+        if response.will_close:
+            conn.close()
+        else:
+            self._release(key, conn)
+
+        return ApiResponse(response.status, response_headers, payload, elapsed, wire_size)
+
+    def close(self):
+        """Close every idle pooled connection"""
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for conns in idle.values():
+            for conn in conns:
+                conn.close()
+
+_client: Optional[HttpClient] = None
+_retry_policy: Optional[RetryPolicy] = None
+_response_cache: Optional[ResponseCache] = None
+_client_lock = threading.Lock()
+
+def get_client() -> HttpClient:
+    """Return the process-wide shared client"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = HttpClient()
+        return _client
+
+def get_retry_policy() -> RetryPolicy:
+    """Return the process-wide retry policy, whose circuit breaker all calls share"""
+    global _retry_policy
+    with _client_lock:
+        if _retry_policy is None:
+            _retry_policy = RetryPolicy()
+        return _retry_policy
+
+def set_response_cache(cache: Optional[ResponseCache]):
+    """Serve cacheable read calls made through call_api from cache (None disables)"""
+    global _response_cache
+    _response_cache = cache
+
+def _classify(outcome) -> Tuple[Optional[int], Optional[float]]:
+    if isinstance(outcome, ApiError):
+        return None, None
+    return outcome.status_code, parse_retry_after(outcome.headers.get("retry-after"))
+
+def call_api(method: str, url: str, token: Optional[str] = None,
+             json_body: Optional[Dict] = None, form: Optional[Dict] = None,
+             params: Optional[Dict] = None, headers: Optional[Dict[str, str]] = None,
+             policy: Optional[RetryPolicy] = None) -> Dict:
+    """
+    Call a JSON API through the shared client, retrying 429/5xx/transport errors
+
+    Args:
+        method: HTTP method
+        url: Endpoint URL
+        token: Optional OAuth bearer token
+        json_body: Optional body sent as application/json
+        form: Optional body sent as application/x-www-form-urlencoded
+        params: Optional query string parameters
+        headers: Extra request headers
+        policy: Retry policy (default: the shared get_retry_policy())
+
+    Read calls matched by response_cache.RESPONSE_TTLS are served from the
+    cache installed with set_response_cache, when there is one. Every
+    attempt, cache hit and retry is recorded in metrics.get_metrics().
+
+    Returns:
+        The decoded JSON body. Failures always come back in Google's error
+        shape, {"error": {"code": <HTTP status or None>, "message": ...}},
+        so callers can keep checking 'error' in result.
+    """
+    send_headers = dict(headers or {})
+    if token:
+        send_headers["Authorization"] = f"Bearer {token}"
+
+    body = None
+    if json_body is not None:
+        body = json.dumps(json_body).encode()
+        send_headers["Content-Type"] = "application/json"
+    elif form is not None:
+        body = urlencode(form).encode()
+        send_headers["Content-Type"] = "application/x-www-form-urlencoded"
+
+    if params:
+        url += ("&" if "?" in url else "?") + urlencode(params)
+
+    metrics = get_metrics()
+    endpoint = endpoint_name(url)
+    cache = _response_cache
+    cache_key, cached = None, None
+    if cache is not None:
+        start = time.perf_counter()
+        cache_key, cached, fresh = cache.lookup(method, url, body, token)
+        if fresh:
+            metrics.observe(endpoint, "cache", time.perf_counter() - start)
+            return _decode(ApiResponse(cached.status, {}, cached.body, 0.0))
+        if cached is not None and cached.etag:
+            send_headers["If-None-Match"] = cached.etag
+
+    def attempt():
+        start = time.perf_counter()
+        try:
+            response = get_client().request(method, url, send_headers, body)
+        except ApiError as e:
+            metrics.observe(endpoint, None, time.perf_counter() - start, len(body or b""))
+            return e
+        metrics.observe(endpoint, response.status_code, time.perf_counter() - start,
+                        len(body or b""), response.wire_size)
+        return response
+
+    response, outcome = (policy or get_retry_policy()).call(attempt, _classify)
+    metrics.add_retries(endpoint, outcome["retries"])
+    if isinstance(response, ApiError):
+        return {"error": {"code": None, "status": "TRANSPORT_ERROR", "message": response.message}}
+
+    if cache_key is not None:
+        if response.status_code == 304 and cached is not None:
+            cache.touch(cache_key)
+            cache.count("revalidated")
+            response = ApiResponse(cached.status, response.headers, cached.body, response.elapsed)
+        elif response.status_code in CACHEABLE_STATUS:
+            cache.put(cache_key, response.status_code, response.headers.get("etag"), response.body)
+            cache.count("misses")
+
+    return _decode(response)
+
+def _decode(response: ApiResponse) -> Dict:
+    """JSON body of a response, or an error in Google's error shape"""
+    try:
+        result = response.json()
+    except ValueError:
+        result = None
+
+    if response.ok and isinstance(result, dict):
+        return result
+    if isinstance(result, dict) and isinstance(result.get("error"), dict):
+        result["error"].setdefault("code", response.status_code)
+        return result
+    return {"error": {"code": response.status_code, "message": response.text}}
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Benchmark: curl subprocess per call vs the shared pooled HTTP client
+Runs both against the local mock API server so no quota is spent
+"""
+
+import json
+import subprocess
+import sys
+import time
+
+from api_client import call_api
+from mock_google_api import MockGoogleApi
+
+def curl_call(url, token, data):
+    """The per-call path the scripts used before the shared client"""
+    cmd = ['curl', '-s', '-X', 'POST', url]
+    cmd.extend(['-H', f'Authorization: Bearer {token}'])
+    cmd.extend(['-H', 'Content-Type: application/json'])
+    cmd.extend(['-d', json.dumps(data)])
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    return json.loads(result.stdout)
+
+def client_call(url, token, data):
+    return call_api('POST', url, token=token, json_body=data)
+
+def run(name, fn, url, calls):
+    """Time calls sequential requests and print calls per second"""
+    data = {"url": "https://example.com/", "type": "URL_UPDATED"}
+    start = time.perf_counter()
+    for _ in range(calls):
+        fn(url, "stub-token", data)
+    elapsed = time.perf_counter() - start
+    print(f"{name:<16} {calls:>6} calls  {elapsed:8.3f}s  {calls / elapsed:10.1f} calls/s")
+    return calls / elapsed
+
+def main():
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+
+    mock = MockGoogleApi().start()
+    url = f"{mock.base_url}/v3/urlNotifications:publish"
+
+    print("HTTP client benchmark")
+    print("=====================\n")
+
+    # Warm up both paths so the first-call costs are not measured
+    curl_call(url, "stub-token", {})
+    client_call(url, "stub-token", {})
+
+    curl_rate = run("curl subprocess", curl_call, url, calls)
+    client_rate = run("pooled client", client_call, url, calls)
+
+    print(f"\nSpeedup: {client_rate / curl_rate:.1f}x")
+    mock.stop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+Throughput benchmark for the indexing and Search Console tools
+Drives the real code paths against mock_google_api.py and reports
+items/s, p50/p99 call latency and peak RSS for each scenario
+"""
+
+import contextlib
+import importlib.util
+import json
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List
+
+from mock_google_api import MockGoogleApi
+
+DEFAULT_URLS = 1000
+DEFAULT_CONCURRENCY = 16
+
+def load_script(name: str, filename: str):
+    """Import a script whose filename is not a valid module name"""
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), filename)
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def timed(fn: Callable, latencies: List[float]) -> Callable:
+    """Wrap fn so each call's duration is appended to latencies"""
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            latencies.append(time.perf_counter() - start)
+    return wrapper
+
+def bench_policy():
+    """Retry policy with short delays so retried calls do not dominate timings"""
+    from retry_policy import CircuitBreaker, RetryPolicy
+    return RetryPolicy(max_retries=3, base_delay=0.05, max_delay=1.0,
+                       breaker=CircuitBreaker(threshold=50, cooldown=1.0))
+
+def bench_urls(count: int) -> List[str]:
+    return [f"https://example.com/page-{i}" for i in range(count)]
+
+def scenario_submit(count: int, concurrency: int, use_batch: bool) -> Dict:
+    """indexing_tool.batch_submit_urls, timing each HTTP call"""
+    import indexing_tool
+
+    latencies: List[float] = []
+    indexing_tool.submit_url = timed(indexing_tool.submit_url, latencies)
+    indexing_tool.submit_url_batch = timed(indexing_tool.submit_url_batch, latencies)
+
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        records = indexing_tool.batch_submit_urls(
+            bench_urls(count), "bench-token", concurrency=concurrency,
+            use_batch=use_batch, policy=bench_policy()
+        )
+    return {
+        "items": len(records),
+        "errors": sum("error" in record["result"] for record in records),
+        "retries": sum(record["retries"] for record in records),
+        "latencies": latencies,
+    }
+
+def scenario_make_api_call(count: int, concurrency: int) -> Dict:
+    """search-console-check.make_api_call against searchAnalytics.query"""
+    checker = load_script("search_console_check", "search-console-check.py")
+    url = "https://www.googleapis.com/webmasters/v3/sites/sc-domain%3Aexample.com/searchAnalytics/query"
+    query = {"startDate": "2024-01-01", "endDate": "2024-01-28",
+             "dimensions": ["query"], "rowLimit": 10}
+
+    latencies: List[float] = []
+    call = timed(lambda _: checker.make_api_call(url, "bench-token", "POST", query), latencies)
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(call, range(count)))
+    return {
+        "items": len(results),
+        "errors": sum("error" in result for result in results),
+        "latencies": latencies,
+    }
+
+def scenario_token_refresh(count: int, concurrency: int) -> Dict:
+    """indexing_oauth.refresh_access_token: one token endpoint call each"""
+    indexing_oauth = load_script("indexing_oauth", "indexing_oauth.py")
+
+    latencies: List[float] = []
+    refresh = timed(lambda _: indexing_oauth.refresh_access_token("bench-refresh-token"), latencies)
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(refresh, range(count)))
+    return {
+        "items": len(results),
+        "errors": sum("access_token" not in result for result in results),
+        "latencies": latencies,
+    }
+
+def scenario_token_cache(count: int, concurrency: int) -> Dict:
+    """TokenCache.get_token from many threads: one refresh, then cache hits"""
+    from token_cache import TokenCache
+    indexing_oauth = load_script("indexing_oauth", "indexing_oauth.py")
+
+    latencies: List[float] = []
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = TokenCache(os.path.join(tmp, "token.json"))
+        cache.store({"refresh_token": "bench-refresh-token", "expires_at": 0})
+        get = timed(lambda _: cache.get_token(
+            lambda tokens: indexing_oauth.refresh_access_token(tokens["refresh_token"])
+        ), latencies)
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            tokens = list(executor.map(get, range(count)))
+    return {
+        "items": len(tokens),
+        "errors": sum(not token for token in tokens),
+        "latencies": latencies,
+    }
+
+SCENARIOS = {
+    "submit-serial": (scenario_submit, {"concurrency": 1, "use_batch": False}),
+    "submit-concurrent": (scenario_submit, {"use_batch": False}),
+    "submit-batch": (scenario_submit, {"use_batch": True}),
+    "make-api-call": (scenario_make_api_call, {}),
+    "token-refresh": (scenario_token_refresh, {}),
+    "token-cache": (scenario_token_cache, {}),
+}
+
+def percentile(values: List[float], fraction: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[round(fraction * (len(ordered) - 1))]
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process (ru_maxrss is KB on Linux, bytes on macOS)"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def run_scenario(name: str, count: int, concurrency: int, queue):
+    """Child process entry point: run one scenario and report its stats"""
+    fn, options = SCENARIOS[name]
+    options = dict(options)
+    options.setdefault("concurrency", concurrency)
+
+    start = time.perf_counter()
+    stats = fn(count, **options)
+    elapsed = time.perf_counter() - start
+
+    latencies = stats.pop("latencies")
+    stats.update({
+        "scenario": name,
+        "seconds": round(elapsed, 3),
+        "per_second": round(stats["items"] / elapsed, 1) if elapsed else 0.0,
+        "calls": len(latencies),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    })
+    queue.put(stats)
+
+def main():
+    args = sys.argv[1:]
+
+    def option(name, default, cast):
+        if name in args:
+            return cast(args[args.index(name) + 1])
+        return default
+
+    if "-h" in args or "--help" in args:
+        print("Usage:")
+        print("  python benchmark_suite.py [--urls N] [--concurrency N] [--latency MS] [--jitter MS]")
+        print("                            [--error-rate 0.01] [--quota-per-minute N]")
+        print("                            [--only name,name] [--json results.json]")
+        print(f"\nScenarios: {', '.join(SCENARIOS)}")
+        sys.exit(0)
+
+    count = option("--urls", DEFAULT_URLS, int)
+    concurrency = option("--concurrency", DEFAULT_CONCURRENCY, int)
+    names = option("--only", ",".join(SCENARIOS), str).split(",")
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        print(f"Unknown scenario(s): {', '.join(unknown)}")
+        sys.exit(1)
+
+    mock = MockGoogleApi(
+        latency=option("--latency", 0.0, float) / 1000,
+        jitter=option("--jitter", 0.0, float) / 1000,
+        error_rate=option("--error-rate", 0.0, float),
+        quota_per_minute=option("--quota-per-minute", None, int),
+    ).start()
+    # Children inherit the override, so every Google API call hits the mock
+    os.environ["GOOGLE_API_OVERRIDE"] = mock.base_url
+
+    print("Indexing tools benchmark")
+    print("========================")
+    print(f"Mock server: {mock.base_url}  items: {count}  concurrency: {concurrency}\n")
+    print(f"{'scenario':<18} {'items':>6} {'calls':>6} {'errors':>6} {'seconds':>8} "
+          f"{'items/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'peak RSS':>9}")
+
+    # Each scenario runs in a fresh process so peak RSS is its own
+    context = multiprocessing.get_context("spawn")
+    results = []
+    for name in names:
+        queue = context.Queue()
+        process = context.Process(target=run_scenario, args=(name, count, concurrency, queue))
+        process.start()
+        stats = queue.get()
+        process.join()
+        results.append(stats)
+        print(f"{name:<18} {stats['items']:>6} {stats['calls']:>6} {stats['errors']:>6} "
+              f"{stats['seconds']:>8.2f} {stats['per_second']:>9.1f} {stats['p50_ms']:>8.2f} "
+              f"{stats['p99_ms']:>8.2f} {stats['peak_rss_mb']:>7.1f}MB")
+
+    print(f"\nMock server handled {mock.state.requests} HTTP requests")
+    mock.stop()
+
+    output = option("--json", None, str)
+    if output:
+        with open(output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results saved to: {output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""
+Build directory scanner for sitemap generation
+Maps a static build's files to URLs with ordered rules and dates each page
+from its mtime or from when its content hash last changed
+"""
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import quote
+
+from site_crawler import ROBOTS_AGENT, LinkParser, RobotsRules
+from ttl_cache import CACHE_DIR
+
+HASH_CACHE = os.path.join(CACHE_DIR, "build_hashes.db")
+HASH_WORKERS = 8
+HASH_CHUNK = 1 << 20
+HEAD_BYTES = 1 << 16  # Read for a page's meta robots tag
+
+# Never descended into
+SKIP_DIRS = {"node_modules", "__pycache__"}
+
+# (regex matched against the whole path relative to the build root, URL path
+# template or None to exclude); the first matching rule wins, and files no
+# rule matches are not pages
+Rule = Tuple[str, Optional[str]]
+DEFAULT_RULES: List[Rule] = [
+    (r"(?:.*/)?(?:404|500)\.html?", None),
+    (r"(.*/)?index\.html?", r"/\1"),
+    (r"(.*\.html?)", r"/\1"),
+]
+# Extensionless URLs, for hosts that serve about.html as /about
+CLEAN_URL_RULES: List[Rule] = [
+    (r"(?:.*/)?(?:404|500)\.html?", None),
+    (r"(.*/)?index\.html?", r"/\1"),
+    (r"(.*)\.html?", r"/\1"),
+]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    root TEXT NOT NULL,
+    path TEXT NOT NULL,
+    inode INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    hash TEXT NOT NULL,
+    lastmod TEXT NOT NULL,
+    PRIMARY KEY (root, path)
+) WITHOUT ROWID
+"""
+
+def load_rules(path: str) -> List[Rule]:
+    """Rules from a JSON file of [[pattern, template-or-null], ...]"""
+    with open(path) as f:
+        return [(pattern, template) for pattern, template in json.load(f)]
+
+def hash_file(path: str) -> str:
+    """sha256 of a file, read in chunks (hashlib releases the GIL, so threads overlap)"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(HASH_CHUNK)
+            if not chunk:
+                break
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def is_noindex(path: str) -> bool:
+    """Whether a page's <head> carries meta robots noindex (or none), as the crawler checks"""
+    with open(path, "rb") as f:
+        head = f.read(HEAD_BYTES)
+    lowered = head.lower()
+    end = lowered.find(b"</head>")
+    if end >= 0:
+        head, lowered = head[:end], lowered[:end]
+    if b"robots" not in lowered and ROBOTS_AGENT.encode() not in lowered:
+        return False
+    parser = LinkParser()
+    parser.feed(head.decode("utf-8", "replace"))
+    return parser.noindex
+
+@lru_cache(maxsize=4096)
+def _day(seconds: int) -> str:
+    return datetime.fromtimestamp(seconds).strftime("%Y-%m-%d")
+
+def _date(mtime: float) -> str:
+    return _day(int(mtime))  # Build output shares a handful of mtimes
+
+class BuildScanner:
+    """
+    Walk a build directory with os.scandir and list its pages
+
+    lastmod="mtime" dates each page by its file's mtime without reading
+    it. lastmod="hash" dates it by the mtime at which its content last
+    changed, so a rebuild that rewrites identical files moves nothing.
+    Hashes are cached by (inode, size, mtime), so a rescan only reads
+    files that were touched. Paths the build's own robots.txt disallows
+    and, unless noindex=False, pages marked meta robots noindex are left
+    out, as a crawl would.
+    """
+
+    def __init__(self, root: str, base_url: str, rules: List[Rule] = DEFAULT_RULES,
+                 lastmod: str = "mtime", cache_path: str = HASH_CACHE, robots: bool = True,
+                 noindex: bool = True):
+        if lastmod not in ("mtime", "hash"):
+            raise ValueError(f"lastmod must be 'mtime' or 'hash', not {lastmod!r}")
+        self.root = os.path.abspath(root)
+        self.base_url = base_url.rstrip("/")
+        # Anchored so re.sub (which caches parsed templates, unlike Match.expand) rewrites the whole path
+        self.rules = [(re.compile(rf"\A(?:{pattern})\Z"), template) for pattern, template in rules]
+        self.lastmod = lastmod
+        self.cache_path = cache_path
+        self.noindex = noindex
+        self.robots = RobotsRules()
+        robots_path = os.path.join(self.root, "robots.txt")
+        if robots and os.path.isfile(robots_path):
+            with open(robots_path, errors="replace") as f:
+                self.robots = RobotsRules.parse(f.read())
+        self.stats = {}
+
+    def url_path(self, relative: str) -> Optional[str]:
+        """URL path for a file's root-relative POSIX path, or None if it is not a page"""
+        for regex, template in self.rules:
+            if regex.match(relative):
+                return None if template is None else quote(regex.sub(template, relative, count=1),
+                                                           safe="/-._~!$&'()*+,;=:@%")
+        return None
+
+    def _walk(self) -> List[Tuple[str, str, os.stat_result]]:
+        """(relative path, URL path, stat) of every page file, depth first"""
+        found = []
+        stack = [("", self.root)]
+        while stack:
+            prefix, directory = stack.pop()
+            try:
+                entries = os.scandir(directory)
+            except OSError:
+                continue
+            with entries:
+                for entry in entries:
+                    if entry.name.startswith("."):
+                        continue
+                    if entry.is_dir():
+                        if entry.name not in SKIP_DIRS:
+                            stack.append((prefix + entry.name + "/", entry.path))
+                        continue
+                    if not entry.is_file():
+                        continue
+                    self.stats["files"] += 1
+                    relative = prefix + entry.name
+                    url_path = self.url_path(relative)
+                    if url_path is None:
+                        continue
+                    if not self.robots.allowed(url_path):
+                        self.stats["disallowed"] += 1
+                        continue
+                    try:
+                        found.append((relative, url_path, entry.stat()))
+                    except OSError:
+                        continue  # Removed mid-scan by a running build
+        return found
+
+    def _noindex(self, relative: str) -> bool:
+        try:
+            return is_noindex(os.path.join(self.root, relative))
+        except OSError:
+            return True  # Removed mid-scan by a running build
+
+    def _hash_lastmods(self, files: List[Tuple[str, str, os.stat_result]]) -> Dict[str, Tuple[str, str]]:
+        """relative path -> (hash, lastmod), hashing only files whose (inode, size, mtime) changed"""
+        os.makedirs(os.path.dirname(self.cache_path) or ".", exist_ok=True)
+        conn = sqlite3.connect(self.cache_path)
+        try:
+            conn.execute(SCHEMA)
+            cached = {path: row for path, *row in conn.execute(
+                "SELECT path, inode, size, mtime_ns, hash, lastmod FROM files WHERE root = ?", (self.root,))}
+
+            results = {}
+            stale = []
+            for relative, _, st in files:
+                row = cached.get(relative)
+                if row and row[:3] == [st.st_ino, st.st_size, st.st_mtime_ns]:
+                    results[relative] = (row[3], row[4])
+                else:
+                    stale.append((relative, st))
+
+            with ThreadPoolExecutor(max_workers=HASH_WORKERS) as executor:
+                hashes = executor.map(hash_file, (os.path.join(self.root, relative) for relative, _ in stale))
+                updates = []
+                for (relative, st), digest in zip(stale, hashes):
+                    row = cached.get(relative)
+                    # Same content rewritten by a rebuild keeps the date it last changed
+                    lastmod = row[4] if row and row[3] == digest else _date(st.st_mtime)
+                    results[relative] = (digest, lastmod)
+                    updates.append((self.root, relative, st.st_ino, st.st_size, st.st_mtime_ns, digest, lastmod))
+            self.stats["hashed"] = len(stale)
+
+            conn.executemany("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?)", updates)
+            gone = [(self.root, path) for path in cached.keys() - results.keys()]
+            conn.executemany("DELETE FROM files WHERE root = ? AND path = ?", gone)
+            conn.commit()
+        finally:
+            conn.close()
+        return results
+
+    def scan(self) -> List[Dict]:
+        """
+        Scan the build
+
+        Returns:
+            [{"loc", "lastmod", "fingerprint", "path"}] sorted by loc,
+            ready for SitemapWriter.add or IncrementalSitemap.update;
+            fingerprint is 'sha256:...' with lastmod="hash", else None.
+            When two files map to one URL the first path in sort order wins.
+        """
+        start = time.perf_counter()
+        self.stats = {"files": 0, "pages": 0, "hashed": 0, "disallowed": 0, "noindex": 0, "duplicates": 0,
+                      "seconds": 0.0}
+        files = sorted(self._walk())
+        if self.noindex:
+            with ThreadPoolExecutor(max_workers=HASH_WORKERS) as executor:
+                flags = list(executor.map(self._noindex, (relative for relative, _, _ in files)))
+            files = [file for file, flag in zip(files, flags) if not flag]
+            self.stats["noindex"] = flags.count(True)
+        hashed = self._hash_lastmods(files) if self.lastmod == "hash" else {}
+
+        entries: Dict[str, Dict] = {}
+        for relative, url_path, st in files:
+            loc = self.base_url + url_path
+            if loc in entries:
+                self.stats["duplicates"] += 1
+                continue
+            if relative in hashed:
+                digest, lastmod = hashed[relative]
+                entries[loc] = {"loc": loc, "lastmod": lastmod, "fingerprint": "sha256:" + digest,
+                                "path": relative}
+            else:
+                entries[loc] = {"loc": loc, "lastmod": _date(st.st_mtime), "fingerprint": None,
+                                "path": relative}
+
+        self.stats["pages"] = len(entries)
+        self.stats["seconds"] = time.perf_counter() - start
+        return [entries[loc] for loc in sorted(entries)]
+
+def main():
+    args = sys.argv[1:]
+
+    def option(name, default, cast):
+        if name in args:
+            return cast(args[args.index(name) + 1])
+        return default
+
+    if len(args) < 2 or args[0] in ("-h", "--help"):
+        print("Usage:")
+        print("  python build_scanner.py <build-dir> <base-url> [--lastmod mtime|hash]")
+        print("                          [--rules rules.json | --clean-urls] [--keep-noindex]")
+        print("                          [--output urls.txt]")
+        sys.exit(0)
+
+    rules = CLEAN_URL_RULES if "--clean-urls" in args else DEFAULT_RULES
+    rules = option("--rules", rules, load_rules)
+    scanner = BuildScanner(args[0], args[1], rules=rules, lastmod=option("--lastmod", "mtime", str),
+                           noindex="--keep-noindex" not in args)
+    entries = scanner.scan()
+    stats = scanner.stats
+    print(f"✅ {stats['pages']} pages from {stats['files']} files in {stats['seconds']:.2f}s "
+          f"({stats['hashed']} hashed, {stats['disallowed']} disallowed by robots.txt, {stats['noindex']} noindex, "
+          f"{stats['duplicates']} duplicate URLs)")
+
+    output = option("--output", None, str)
+    if output:
+        with open(output, "w") as f:
+            f.writelines(entry["loc"] + "\n" for entry in entries)
+        print(f"📝 Wrote {len(entries)} URLs to {output}")
+    else:
+        for entry in entries:
+            print(f"{entry['loc']}  {entry['lastmod']}")
+
+if __name__ == "__main__":
+    main()
@@ -64,39 +64,20 @@ get_verified_sites() {
     fi
 }
 
-# Check site performance data
-check_site_performance() {
-    local token=$1
-    local site_url=$2
-    local encoded_url=$(python3 -c "import urllib.parse; print(urllib.parse.quote('$site_url'))")
-    
-    echo "Checking performance for: $site_url"
+# Sync per-day performance data for every verified site
+# Only days not stored yet (plus recently changed ones) are downloaded;
+# history accumulates under analytics_data/ instead of being overwritten
+sync_site_performance() {
+    local script_dir=$(cd "$(dirname "$0")" && pwd)
+    local sites=()
     
-    # Get search analytics data for the last 7 days
-    local end_date=$(date +%Y-%m-%d)
-    local start_date=$(date -v-7d +%Y-%m-%d 2>/dev/null || date -d '7 days ago' +%Y-%m-%d)
-    
-    PERF_DATA=$(curl -s -X POST \
-        "https://www.googleapis.com/webmasters/v3/sites/$encoded_url/searchAnalytics/query" \
-        -H "Authorization: Bearer $token" \
-        -H "Content-Type: application/json" \
-        -d "{
-            \"startDate\": \"$start_date\",
-            \"endDate\": \"$end_date\",
-            \"dimensions\": [\"page\"],
-            \"rowLimit\": 10
-        }")
+    while IFS= read -r site_url; do
+        if [ ! -z "$site_url" ]; then
+            sites+=("$site_url")
+        fi
+    done < verified_sites.txt
     
-    if echo "$PERF_DATA" | jq -e '.rows' > /dev/null 2>&1; then
-        local total_clicks=$(echo "$PERF_DATA" | jq '[.rows[].clicks] | add // 0')
-        local total_impressions=$(echo "$PERF_DATA" | jq '[.rows[].impressions] | add // 0')
-        echo "  Last 7 days: $total_clicks clicks, $total_impressions impressions"
-        
-        # Save detailed data
-        echo "$PERF_DATA" > "performance_${site_url//[^a-zA-Z0-9]/_}.json"
-    else
-        echo "  No performance data available"
-    fi
+    python3 "$script_dir/search-console-check.py" sync "${sites[@]}" --dimensions page
 }
 
 # Main execution
@@ -116,18 +97,12 @@ if get_verified_sites "$ACCESS_TOKEN"; then
     echo "Checking performance data for each site..."
     echo "=========================================="
     
-    # Read sites and check each one
-    while IFS= read -r site_url; do
-        if [ ! -z "$site_url" ]; then
-            check_site_performance "$ACCESS_TOKEN" "$site_url"
-            echo ""
-        fi
-    done < verified_sites.txt
+    sync_site_performance
     
     echo ""
     echo "Site data saved to:"
     echo "- search_console_sites.json (all sites)"
-    echo "- performance_*.json (individual site data)"
+    echo "- analytics_data/ (per-day performance history for each site)"
     echo "- verified_sites.txt (list of URLs)"
 else
     echo "Could not retrieve sites from Search Console"
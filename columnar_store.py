@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+Columnar analytics tables backed by NumPy
+Dictionary-encoded dimensions and typed metric arrays, built from the
+per-day partitions in analytics_store and aggregated without Python loops
+"""
+
+import json
+import os
+import time
+import zipfile
+from array import array
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from analytics_store import AnalyticsStore
+
+TABLE_FILE = "table.npz"
+
+# CTR is not stored: it is always clicks / impressions, derived on demand
+METRIC_DTYPES = {
+    "clicks": np.uint32,
+    "impressions": np.uint32,
+    "position": np.float32,
+}
+# array module typecodes matching METRIC_DTYPES, used while building
+METRIC_TYPECODES = {"clicks": "I", "impressions": "I", "position": "f"}
+
+# Fast deflate: tables are rewritten on every sync, so speed beats ratio
+COMPRESS_LEVEL = 1
+
+def narrow_codes(codes: np.ndarray, size: int) -> np.ndarray:
+    """Store codes in the smallest unsigned type that can index size values"""
+    return codes.astype(np.min_scalar_type(max(size - 1, 0)), copy=False)
+
+def encode_strings(values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Pack strings as one UTF-8 byte array plus end offsets (no pickling needed)"""
+    encoded = [value.encode("utf-8") for value in values]
+    offsets = np.cumsum([len(b) for b in encoded], dtype=np.uint64)
+    return np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets
+
+def decode_strings(blob: np.ndarray, offsets: np.ndarray) -> np.ndarray:
+    data = blob.tobytes()
+    values = np.empty(len(offsets), dtype=object)
+    start = 0
+    for i, end in enumerate(offsets.tolist()):
+        values[i] = data[start:end].decode("utf-8")
+        start = end
+    return values
+
+class AnalyticsTable:
+    """
+    Search analytics rows stored column by column
+
+    Each dimension is an unsigned code array plus a dictionary (an object
+    array of str) of its distinct values, so a page URL repeated over a
+    year of days is stored once. Aggregations run as NumPy reductions
+    over these arrays.
+    """
+
+    def __init__(self, codes: Dict[str, np.ndarray], dictionaries: Dict[str, np.ndarray],
+                 metrics: Dict[str, np.ndarray]):
+        self.codes = codes
+        self.dictionaries = dictionaries
+        self.metrics = metrics
+
+    @property
+    def dimensions(self) -> List[str]:
+        return list(self.codes)
+
+    def __len__(self) -> int:
+        return len(self.metrics["clicks"])
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate in-memory size: arrays plus the dictionary strings"""
+        arrays = list(self.codes.values()) + list(self.metrics.values())
+        return (sum(a.nbytes for a in arrays) +
+                sum(d.nbytes + sum(len(value) for value in d) for d in self.dictionaries.values()))
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Dict], dimensions: Sequence[str]) -> "AnalyticsTable":
+        """Build a table from flattened rows in one streaming pass"""
+        lookups: Dict[str, Dict[str, int]] = {d: {} for d in dimensions}
+        codes = {d: array("I") for d in dimensions}
+        metrics = {m: array(METRIC_TYPECODES[m]) for m in METRIC_DTYPES}
+        for row in rows:
+            for dimension in dimensions:
+                lookup = lookups[dimension]
+                value = row[dimension]
+                code = lookup.get(value)
+                if code is None:
+                    code = lookup[value] = len(lookup)
+                codes[dimension].append(code)
+            for metric, column in metrics.items():
+                column.append(row.get(metric, 0))
+        return cls(
+            {d: narrow_codes(np.frombuffer(codes[d], dtype=np.uint32), len(lookups[d])).copy()
+             for d in dimensions},
+            {d: np.array(list(lookups[d]), dtype=object) for d in dimensions},
+            {m: np.frombuffer(metrics[m], dtype=METRIC_DTYPES[m]).copy() for m in metrics},
+        )
+
+    @classmethod
+    def concat(cls, tables: Sequence["AnalyticsTable"]) -> "AnalyticsTable":
+        """Append tables with the same dimensions, merging their dictionaries"""
+        tables = [t for t in tables if len(t)] or list(tables[:1])
+        if len(tables) == 1:
+            return tables[0]
+        codes, dictionaries = {}, {}
+        for dimension in tables[0].dimensions:
+            merged, inverse = np.unique(
+                np.concatenate([t.dictionaries[dimension] for t in tables]), return_inverse=True
+            )
+            parts, offset = [], 0
+            for t in tables:
+                remap = inverse[offset:offset + len(t.dictionaries[dimension])].astype(np.uint32)
+                parts.append(remap[t.codes[dimension]])
+                offset += len(t.dictionaries[dimension])
+            codes[dimension] = narrow_codes(np.concatenate(parts), len(merged))
+            dictionaries[dimension] = merged
+        metrics = {m: np.concatenate([t.metrics[m] for t in tables]) for m in METRIC_DTYPES}
+        return cls(codes, dictionaries, metrics)
+
+    def take(self, selector: np.ndarray) -> "AnalyticsTable":
+        """Rows selected by a boolean mask or index array; dictionaries are shared"""
+        return AnalyticsTable(
+            {d: c[selector] for d, c in self.codes.items()},
+            self.dictionaries,
+            {m: v[selector] for m, v in self.metrics.items()},
+        )
+
+    def mask(self, dimension: str, values: Iterable[str]) -> np.ndarray:
+        """Boolean mask of rows whose dimension is one of values"""
+        wanted = np.flatnonzero(np.isin(self.dictionaries[dimension], list(values)))
+        return np.isin(self.codes[dimension], wanted)
+
+    def where(self, **equals) -> "AnalyticsTable":
+        """Rows matching every dimension=value (or dimension=[values]) given"""
+        selector = np.ones(len(self), dtype=bool)
+        for dimension, values in equals.items():
+            if isinstance(values, str):
+                values = [values]
+            selector &= self.mask(dimension, values)
+        return self.take(selector)
+
+    def between(self, dimension: str, low: Optional[str] = None,
+                high: Optional[str] = None) -> "AnalyticsTable":
+        """Rows whose dimension value lies in [low, high]; handy for ISO dates"""
+        dictionary = self.dictionaries[dimension]
+        keep = np.ones(len(dictionary), dtype=bool)
+        if low is not None:
+            keep &= dictionary >= low
+        if high is not None:
+            keep &= dictionary <= high
+        return self.take(keep[self.codes[dimension]])
+
+    def totals(self) -> Dict[str, float]:
+        """Clicks, impressions, CTR and impression-weighted position"""
+        clicks = int(self.metrics["clicks"].sum(dtype=np.uint64))
+        impressions = int(self.metrics["impressions"].sum(dtype=np.uint64))
+        return {
+            "clicks": clicks,
+            "impressions": impressions,
+            "ctr": clicks / impressions if impressions else 0.0,
+            "position": self.weighted_position(),
+        }
+
+    def sum_by(self, dimension: str, metric: str = "clicks") -> Tuple[np.ndarray, np.ndarray]:
+        """(dictionary values, per-value sums of metric), aligned by index"""
+        sums = np.bincount(self.codes[dimension], weights=self.metrics[metric],
+                           minlength=len(self.dictionaries[dimension]))
+        return self.dictionaries[dimension], sums
+
+    def weighted_position(self, dimension: Optional[str] = None):
+        """
+        Average position weighted by impressions, as Search Console reports it
+
+        Returns a float overall, or with a dimension (values, positions)
+        where values without impressions get NaN.
+        """
+        impressions = self.metrics["impressions"].astype(np.float64)
+        weighted = self.metrics["position"] * impressions
+        if dimension is None:
+            total = impressions.sum()
+            return float(weighted.sum() / total) if total else 0.0
+        size = len(self.dictionaries[dimension])
+        weights = np.bincount(self.codes[dimension], weights=impressions, minlength=size)
+        sums = np.bincount(self.codes[dimension], weights=weighted, minlength=size)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return self.dictionaries[dimension], sums / weights
+
+    def top_k(self, dimension: str, k: int = 10, metric: str = "clicks") -> List[Tuple[str, float]]:
+        """The k dimension values with the largest summed metric, descending"""
+        values, sums = self.sum_by(dimension, metric)
+        present = np.flatnonzero(np.bincount(self.codes[dimension], minlength=len(values)))
+        if len(present) > k:
+            present = present[np.argpartition(-sums[present], k - 1)[:k]]
+        order = present[np.argsort(-sums[present], kind="stable")]
+        return [(str(values[i]), float(sums[i])) for i in order]
+
+    def save(self, path: str, manifest: Optional[Dict] = None):
+        """Write a deflated .npz; manifest is stored alongside as JSON"""
+        arrays = {f"code:{d}": c for d, c in self.codes.items()}
+        for dimension, values in self.dictionaries.items():
+            arrays[f"dict:{dimension}"], arrays[f"offsets:{dimension}"] = encode_strings(values)
+        arrays.update({f"metric:{m}": v for m, v in self.metrics.items()})
+        arrays["manifest"] = np.array(json.dumps(manifest or {}))
+        tmp_path = path + ".tmp"
+        with zipfile.ZipFile(tmp_path, "w", zipfile.ZIP_DEFLATED, compresslevel=COMPRESS_LEVEL) as zf:
+            for name, value in arrays.items():
+                with zf.open(name + ".npy", "w", force_zip64=True) as f:
+                    np.lib.format.write_array(f, np.asanyarray(value), allow_pickle=False)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> Tuple["AnalyticsTable", Dict]:
+        """Return (table, manifest) from a file written by save"""
+        with np.load(path, allow_pickle=False) as data:
+            codes, dictionaries, metrics = {}, {}, {}
+            for name in data.files:
+                kind, _, key = name.partition(":")
+                if kind == "code":
+                    codes[key] = data[name]
+                elif kind == "dict":
+                    dictionaries[key] = decode_strings(data[name], data[f"offsets:{key}"])
+                elif kind == "metric":
+                    metrics[key] = data[name]
+            manifest = json.loads(str(data["manifest"]))
+        return cls(codes, dictionaries, metrics), manifest
+
+def build_table(store: AnalyticsStore, rebuild: bool = False) -> Tuple[AnalyticsTable, Dict]:
+    """
+    Load a store's columnar table, bringing it up to date with its partitions
+
+    The table remembers which partition versions (fetched_at) it holds, so
+    only new or re-fetched days are read; rows of re-fetched or removed
+    days are dropped first. Rows carry a 'date' dimension.
+
+    Returns:
+        (table, {"rows", "days_added", "days_dropped", "seconds"})
+    """
+    start = time.perf_counter()
+    path = os.path.join(store.path, TABLE_FILE)
+    dimensions = ["date"] + store.dimensions
+    current = {day: info["fetched_at"] for day, info in store.days.items()}
+
+    table, held = None, {}
+    if not rebuild and os.path.exists(path):
+        table, manifest = AnalyticsTable.load(path)
+        held = manifest.get("days", {})
+
+    stale = [day for day, fetched_at in held.items() if current.get(day) != fetched_at]
+    missing = sorted(day for day, fetched_at in current.items() if held.get(day) != fetched_at)
+    if table is not None and not stale and not missing:
+        return table, {"rows": len(table), "days_added": 0, "days_dropped": 0,
+                       "seconds": time.perf_counter() - start}
+
+    parts = []
+    if table is not None:
+        parts.append(table.take(~table.mask("date", stale)) if stale else table)
+    if missing:
+        parts.append(AnalyticsTable.from_rows(
+            (row for day in missing for row in store.iter_rows(start=day, end=day)), dimensions
+        ))
+    table = AnalyticsTable.concat(parts) if parts else AnalyticsTable.from_rows([], dimensions)
+    table.save(path, {"site_url": store.site_url, "days": current})
+    return table, {"rows": len(table), "days_added": len(missing), "days_dropped": len(stale),
+                   "seconds": time.perf_counter() - start}
@@ -1,9 +1,22 @@
 #!/usr/bin/env python3
 """Generate sitemaps for all domains"""
 
+import io
 import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from contextlib import redirect_stdout
 from datetime import datetime
 
+from build_scanner import BuildScanner
+from incremental_sitemap import IncrementalSitemap
+from site_crawler import SiteCrawler
+from sitemap_writer import MAX_URLS, SitemapWriter
+from submission_ledger import fetch_fingerprint
+
+FETCH_PER_JOB = 8  # Lastmod fetches in flight per --jobs slot; they wait on the network, not the CPU
+
 domains = [
     "mysimplestack.com",
     "simple.company", 
@@ -21,53 +34,108 @@ common_pages = [
     "terms"
 ]
 
-sitemap_template = '''<?xml version="1.0" encoding="UTF-8"?>
-<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
-{urls}
-</urlset>'''
-
-url_template = '''  <url>
-    <loc>{url}</loc>
-    <lastmod>{date}</lastmod>
-    <changefreq>weekly</changefreq>
-    <priority>{priority}</priority>
-  </url>'''
-
-def generate_sitemap(domain):
-    """Generate sitemap for a domain"""
-    urls = []
+def find_build(build_dir, domain):
+    """A domain's build under build_dir: <domain>/ or, as deploy.sh lays out sites/, <name>/"""
+    for name in (domain, domain.split('.')[0]):
+        path = os.path.join(build_dir, name)
+        if os.path.isdir(path):
+            return path
+    return None
+
+def site_pages(domain, crawl=False, build_dir=None, lastmod="mtime"):
+    """
+    A domain's pages as [{"loc", "priority", and when discovered "lastmod", "fingerprint"}]
+
+    Pages come from the domain's build under build_dir when there is one,
+    else from a crawl when crawl is set. Otherwise (or when neither finds
+    anything) this is the homepage, its www version and the common pages.
+    """
+    build = find_build(build_dir, domain) if build_dir else None
+    if build:
+        scanner = BuildScanner(build, f"https://{domain}", lastmod=lastmod)
+        pages = scanner.scan()
+        stats = scanner.stats
+        print(f"📁 Scanned {build}: {stats['pages']} pages from {stats['files']} files "
+              f"({stats['hashed']} hashed, {stats['noindex']} noindex skipped) in {stats['seconds']:.2f}s")
+        if pages:
+            for page in pages:
+                page["priority"] = "1.0" if page["loc"] == f"https://{domain}/" else "0.8"
+            return pages
+        print(f"⚠️  {build} has no pages")
+    elif build_dir:
+        print(f"⚠️  No build for {domain} under {build_dir}")
+
+    if crawl:
+        crawler = SiteCrawler(f"https://{domain}/")
+        pages = crawler.crawl()
+        stats = crawler.stats
+        print(f"🕸  Crawled {stats['pages']} pages ({stats['fetched']} fetches) in {stats['seconds']:.2f}s")
+        if pages:
+            for page in pages:
+                page["priority"] = "1.0" if page["loc"] == crawler.start_url else "0.8"
+            return pages
+        print(f"⚠️  Crawl of {domain} found no pages; using the common pages list")
+
+    pages = [{"loc": f"https://{domain}/", "priority": "1.0"},
+             {"loc": f"https://www.{domain}/", "priority": "1.0"}]
+    pages += [{"loc": f"https://{domain}/{page}", "priority": "0.8"} for page in common_pages[1:]]
+    return pages
+
+def generate_sitemap(domain, compress=False, max_urls=MAX_URLS, shard_threads=1, crawl=False,
+                     build_dir=None, lastmod="mtime"):
+    """
+    Generate sitemap for a domain, sharded with an index if it outgrows one file
+
+    With shard_threads > 1, finished shards are compressed and written on
+    that many threads while the next shard fills.
+    """
     date = datetime.now().strftime("%Y-%m-%d")
+    filename = f"sitemap_{domain.replace('.', '_')}.xml"
+    pages = site_pages(domain, crawl, build_dir, lastmod)
+
+    executor = ThreadPoolExecutor(max_workers=shard_threads) if shard_threads > 1 else None
+    try:
+        with SitemapWriter(filename, f"https://{domain}", compress=compress, max_urls=max_urls,
+                           executor=executor, max_pending=2 * shard_threads) as writer:
+            for page in pages:
+                writer.add(page["loc"], page.get("lastmod") or date, "weekly", page["priority"])
+    finally:
+        if executor:
+            executor.shutdown()
+
+    print(f"✅ Generated {', '.join(writer.files)} ({writer.count} URLs)")
+    return filename
+
+def generate_sitemap_incremental(domain, compress=False, max_urls=MAX_URLS, fetch=True, crawl=False,
+                                 build_dir=None, lastmod="mtime", threads=1):
+    """
+    Update a domain's sitemap in place, rewriting only shards whose URLs changed
     
-    # Add homepage with highest priority
-    urls.append(url_template.format(
-        url=f"https://{domain}/",
-        date=date,
-        priority="1.0"
-    ))
-    
-    # Add www version
-    urls.append(url_template.format(
-        url=f"https://www.{domain}/",
-        date=date,
-        priority="1.0"
-    ))
-    
-    # Add common pages
-    for page in common_pages[1:]:  # Skip empty string (homepage)
-        urls.append(url_template.format(
-            url=f"https://{domain}/{page}",
-            date=date,
-            priority="0.8"
-        ))
-    
-    sitemap_content = sitemap_template.format(urls="\n".join(urls))
-    
-    # Save sitemap
+    lastmod moves only when a page's content fingerprint (ETag, Last-Modified
+    or body hash, fetched conditionally) changes; with fetch=False pages
+    keep the lastmod they were first listed with. Crawled pages already
+    carry a fingerprint, and build pages their file's date, so they are
+    not fetched again. Up to FETCH_PER_JOB * threads fetches run at once.
+    """
     filename = f"sitemap_{domain.replace('.', '_')}.xml"
-    with open(filename, 'w') as f:
-        f.write(sitemap_content)
+    pages = site_pages(domain, crawl, build_dir, lastmod)
     
-    print(f"✅ Generated {filename}")
+    with IncrementalSitemap(filename, f"https://{domain}", compress=compress, max_urls=max_urls) as sitemap:
+        fingerprints = {page["loc"]: page["fingerprint"] for page in pages if page.get("fingerprint")}
+        unknown = [page["loc"] for page in pages if page["loc"] not in fingerprints and not page.get("lastmod")]
+        if fetch and unknown:
+            previous = {url: sitemap.fingerprint(url) for url in unknown}
+            with ThreadPoolExecutor(max_workers=FETCH_PER_JOB * threads) as executor:
+                fingerprints.update(zip(previous, executor.map(
+                    lambda url: fetch_fingerprint(url, previous[url]), previous)))
+        stats = sitemap.update(
+            {"loc": page["loc"], "fingerprint": fingerprints.get(page["loc"]), "lastmod": page.get("lastmod"),
+             "changefreq": "weekly", "priority": page["priority"]}
+            for page in pages
+        )
+    
+    print(f"✅ {filename}: {stats['urls']} URLs ({stats['added']} added, {stats['changed']} changed, "
+          f"{stats['removed']} removed); rewrote {len(stats['written'])} file(s) of {stats['shards']} shard(s)")
     return filename
 
 def generate_robots(domain):
@@ -97,36 +165,99 @@ Disallow: /api/private/
     print(f"✅ Generated {filename}")
     return filename
 
-print("Generating Sitemaps and Robots.txt Files")
-print("========================================\n")
+def process_domain(domain, compress=False, max_urls=MAX_URLS, incremental=False, fetch=True, shard_threads=1,
+                   crawl=False, build_dir=None, lastmod="mtime"):
+    """
+    Generate one domain's sitemap and robots.txt
+
+    Runs in a worker process under --jobs, so output is captured and
+    returned rather than interleaved with other domains'.
+
+    Returns:
+        (output, {"sitemap": seconds, "robots": seconds})
+    """
+    output = io.StringIO()
+    timings = {}
+    with redirect_stdout(output):
+        start = time.perf_counter()
+        if incremental:
+            generate_sitemap_incremental(domain, compress, max_urls, fetch, crawl, build_dir, lastmod, shard_threads)
+        else:
+            generate_sitemap(domain, compress, max_urls, shard_threads, crawl, build_dir, lastmod)
+        timings["sitemap"] = time.perf_counter() - start
 
-for domain in domains:
+        start = time.perf_counter()
+        generate_robots(domain)
+        timings["robots"] = time.perf_counter() - start
+    return output.getvalue(), timings
+
+def report_domain(domain, output, timings):
+    """Print a domain's captured output and timings; returns its total seconds"""
+    total = sum(timings.values())
     print(f"\nProcessing {domain}:")
     print("-" * 30)
-    
-    # Skip castit.ai since it's not accessible
-    if domain == "castit.ai":
-        print("⚠️  Skipping castit.ai (site not accessible)")
-        continue
-    
-    sitemap_file = generate_sitemap(domain)
-    robots_file = generate_robots(domain)
-
-print("\n\n📋 Next Steps:")
-print("=============")
-print("\n1. Upload these files to your web servers:")
-print("   - Upload sitemap_*.xml as /sitemap.xml on each domain")
-print("   - Upload robots_*.txt as /robots.txt on each domain")
-
-print("\n2. Submit sitemaps in Google Search Console:")
-for domain in domains:
-    if domain != "castit.ai":
-        print(f"   - https://search.google.com/search-console?resource_id=sc-domain:{domain}")
-
-print("\n3. Test your robots.txt files:")
-for domain in domains:
-    if domain != "castit.ai":
-        print(f"   - https://{domain}/robots.txt")
-
-print("\n4. Validate sitemaps:")
-print("   - https://www.xml-sitemaps.com/validate-xml-sitemap.html")
\ No newline at end of file
+    print(output, end="")
+    print(f"⏱  sitemap {timings['sitemap']:.2f}s, robots {timings['robots']:.2f}s, total {total:.2f}s")
+    return total
+
+def main():
+    args = sys.argv[1:]
+    compress = '--gzip' in args
+    max_urls = int(args[args.index('--max-urls') + 1]) if '--max-urls' in args else MAX_URLS
+    incremental = '--incremental' in args
+    fetch = '--no-fetch' not in args
+    jobs = int(args[args.index('--jobs') + 1]) if '--jobs' in args else 1
+    crawl = '--crawl' in args
+    build_dir = args[args.index('--build-dir') + 1] if '--build-dir' in args else None
+    lastmod = args[args.index('--lastmod') + 1] if '--lastmod' in args else "mtime"
+
+    print("Generating Sitemaps and Robots.txt Files")
+    print("========================================\n")
+
+    active = []
+    for domain in domains:
+        # Skip castit.ai since it's not accessible
+        if domain == "castit.ai":
+            print("⚠️  Skipping castit.ai (site not accessible)")
+            continue
+        active.append(domain)
+
+    # Workers left over once every domain has a process go to shard compression,
+    # or with --incremental to lastmod fetches
+    shard_threads = max(1, jobs // max(len(active), 1))
+    options = (compress, max_urls, incremental, fetch, shard_threads, crawl, build_dir, lastmod)
+    start = time.perf_counter()
+    busy = 0.0
+    if jobs > 1 and len(active) > 1:
+        with ProcessPoolExecutor(max_workers=min(jobs, len(active))) as executor:
+            futures = {executor.submit(process_domain, domain, *options): domain for domain in active}
+            for future in as_completed(futures):
+                busy += report_domain(futures[future], *future.result())
+    else:
+        for domain in active:
+            busy += report_domain(domain, *process_domain(domain, *options))
+    print(f"\n⏱  {len(active)} domain(s) in {time.perf_counter() - start:.2f}s "
+          f"({busy:.2f}s of per-domain work, --jobs {jobs})")
+
+    print("\n\n📋 Next Steps:")
+    print("=============")
+    print("\n1. Upload these files to your web servers:")
+    print("   - Upload sitemap_*.xml as /sitemap.xml on each domain")
+    print("   - Upload shards (sitemap_*-N.xml) alongside it when a sitemap was split")
+    print("   - Upload robots_*.txt as /robots.txt on each domain")
+
+    print("\n2. Submit sitemaps in Google Search Console:")
+    for domain in domains:
+        if domain != "castit.ai":
+            print(f"   - https://search.google.com/search-console?resource_id=sc-domain:{domain}")
+
+    print("\n3. Test your robots.txt files:")
+    for domain in domains:
+        if domain != "castit.ai":
+            print(f"   - https://{domain}/robots.txt")
+
+    print("\n4. Validate sitemaps:")
+    print("   - https://www.xml-sitemaps.com/validate-xml-sitemap.html")
+
+if __name__ == "__main__":
+    main()
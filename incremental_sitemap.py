@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+"""
+Incremental sitemap regeneration
+Keeps each URL's content fingerprint, lastmod and shard between runs so
+lastmod only moves when a page changes and only the shards holding added,
+removed or changed URLs are rewritten
+"""
+
+import os
+import sqlite3
+from datetime import datetime
+from itertools import islice
+from typing import Dict, Iterable, Optional, Set
+
+from sitemap_writer import (INDEX_FOOTER, INDEX_HEADER, MAX_BYTES, MAX_URLS, URLSET_FOOTER,
+                            URLSET_HEADER, open_output, remove_stale_shards, sitemap_entry, url_entry)
+from ttl_cache import CACHE_DIR
+
+SITEMAP_STATE = os.path.join(CACHE_DIR, "sitemap_state.db")
+INSERT_CHUNK = 10000
+BUSY_TIMEOUT = 60  # Seconds to wait on another process's write, e.g. other domains under --jobs
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sitemaps (
+    sitemap TEXT PRIMARY KEY,
+    settings TEXT NOT NULL,
+    single INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS urls (
+    sitemap TEXT NOT NULL,
+    loc TEXT NOT NULL,
+    fingerprint TEXT,
+    lastmod TEXT,
+    changefreq TEXT,
+    priority TEXT,
+    size INTEGER NOT NULL,
+    shard INTEGER,
+    PRIMARY KEY (sitemap, loc)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS urls_shard ON urls (sitemap, shard);
+CREATE TABLE IF NOT EXISTS pending (
+    sitemap TEXT NOT NULL,
+    shard INTEGER NOT NULL,
+    PRIMARY KEY (sitemap, shard)
+) WITHOUT ROWID;
+"""
+
+class IncrementalSitemap:
+    """
+    A sitemap (sharded like SitemapWriter's output) kept in step with a URL set
+
+    Each URL stays in the shard it was first assigned to, so a change
+    touches only that shard; untouched shards are left byte-for-byte as
+    they were. New URLs fill shards that are being rewritten anyway, then
+    the last shard, then new ones. Changing compress or the limits
+    reassigns every URL once.
+
+    Several processes can share one state file: row changes are committed
+    in one short transaction before any file is written, and the shards
+    they dirty are recorded so a run that dies mid-write redoes them.
+    """
+
+    def __init__(self, path: str, base_url: str, compress: bool = False,
+                 max_urls: int = MAX_URLS, max_bytes: int = MAX_BYTES,
+                 state_path: str = SITEMAP_STATE):
+        os.makedirs(os.path.dirname(state_path) or ".", exist_ok=True)
+        self.path = path
+        self.key = os.path.abspath(path)
+        self.base_url = base_url.rstrip("/")
+        self.compress = compress
+        self.max_urls = max_urls
+        self.max_bytes = max_bytes
+        self.directory = os.path.dirname(path)
+        self.stem = os.path.basename(path)[:-4] if path.endswith(".xml") else os.path.basename(path)
+        self.settings = f"{self.base_url} gzip={int(compress)} urls={max_urls} bytes={max_bytes}"
+        self.conn = sqlite3.connect(state_path, timeout=BUSY_TIMEOUT)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self.conn.close()
+
+    def fingerprint(self, loc: str) -> Optional[str]:
+        """Stored fingerprint of a URL, for conditional fetches"""
+        row = self.conn.execute("SELECT fingerprint FROM urls WHERE sitemap = ? AND loc = ?",
+                                (self.key, loc)).fetchone()
+        return row[0] if row else None
+
+    def shard_path(self, shard: int, single: bool) -> str:
+        if single:
+            return self.path + (".gz" if self.compress else "")
+        return os.path.join(self.directory, f"{self.stem}-{shard}.xml" + (".gz" if self.compress else ""))
+
+    def update(self, entries: Iterable[Dict], today: Optional[str] = None) -> Dict:
+        """
+        Bring the sitemap in line with entries and rewrite what changed
+
+        Args:
+            entries: {"loc", and optionally "fingerprint", "lastmod",
+                     "changefreq", "priority"}; a later duplicate loc wins
+            today: lastmod for new URLs and changed fingerprints that
+                   come without their own lastmod (default: today)
+
+        A URL whose fingerprint is None keeps its stored fingerprint and
+        lastmod; one with an explicit lastmod always uses it.
+
+        Returns:
+            {urls, added, changed, removed, shards, written: [paths]}
+        """
+        today = today or datetime.now().strftime("%Y-%m-%d")
+        conn = self.conn
+        key = self.key
+        stats = {"added": 0, "changed": 0, "removed": 0}
+
+        conn.execute("DROP TABLE IF EXISTS temp.incoming")
+        conn.execute("CREATE TEMP TABLE incoming (loc TEXT PRIMARY KEY, fingerprint TEXT, lastmod TEXT, "
+                     "changefreq TEXT, priority TEXT) WITHOUT ROWID")
+        rows = ((e["loc"], e.get("fingerprint"), e.get("lastmod"), e.get("changefreq"), e.get("priority"))
+                for e in entries)
+        while True:
+            chunk = list(islice(rows, INSERT_CHUNK))
+            if not chunk:
+                break
+            conn.executemany("INSERT OR REPLACE INTO incoming VALUES (?, ?, ?, ?, ?)", chunk)
+        conn.commit()
+
+        # Take the write lock up front: a deferred transaction that reads
+        # first fails outright, without waiting, if another process commits
+        conn.execute("BEGIN IMMEDIATE")
+        dirty: Set[int] = {shard for (shard,) in conn.execute(
+            "SELECT shard FROM pending WHERE sitemap = ?", (key,))}  # Left by a run that died mid-write
+        previous = conn.execute("SELECT settings, single FROM sitemaps WHERE sitemap = ?", (key,)).fetchone()
+        if previous is None or previous[0] != self.settings:
+            conn.execute("UPDATE urls SET shard = NULL WHERE sitemap = ?", (key,))
+        was_single = bool(previous[1]) if previous else False
+
+        # Removed URLs
+        dirty.update(shard for (shard,) in conn.execute(
+            "SELECT DISTINCT shard FROM urls WHERE sitemap = ? AND shard IS NOT NULL "
+            "AND loc NOT IN (SELECT loc FROM incoming)", (key,)))
+        stats["removed"] = conn.execute(
+            "DELETE FROM urls WHERE sitemap = ? AND loc NOT IN (SELECT loc FROM incoming)", (key,)).rowcount
+
+        # Changed URLs: a new fingerprint or lastmod, or different changefreq/priority
+        updates = []
+        for loc, shard, fingerprint, lastmod, changefreq, priority, old_fingerprint, old_lastmod in conn.execute(
+                "SELECT u.loc, u.shard, i.fingerprint, i.lastmod, i.changefreq, i.priority, "
+                "u.fingerprint, u.lastmod FROM urls u JOIN incoming i ON u.loc = i.loc "
+                "WHERE u.sitemap = ? AND ((i.fingerprint IS NOT NULL AND i.fingerprint IS NOT u.fingerprint) "
+                "OR (i.lastmod IS NOT NULL AND i.lastmod IS NOT u.lastmod) "
+                "OR i.changefreq IS NOT u.changefreq OR i.priority IS NOT u.priority)", (key,)):
+            content_changed = fingerprint is not None and fingerprint != old_fingerprint
+            lastmod = lastmod or (today if content_changed else old_lastmod)
+            size = len(url_entry(loc, lastmod, changefreq, priority))
+            updates.append((fingerprint or old_fingerprint, lastmod, changefreq, priority, size, key, loc))
+            if shard is not None:
+                dirty.add(shard)
+        conn.executemany("UPDATE urls SET fingerprint = ?, lastmod = ?, changefreq = ?, priority = ?, size = ? "
+                         "WHERE sitemap = ? AND loc = ?", updates)
+        stats["changed"] = len(updates)
+
+        # Added URLs, unassigned for now
+        added = [
+            (key, loc, fingerprint, lastmod or today, changefreq, priority,
+             len(url_entry(loc, lastmod or today, changefreq, priority)))
+            for loc, fingerprint, lastmod, changefreq, priority in conn.execute(
+                "SELECT loc, fingerprint, lastmod, changefreq, priority FROM incoming i "
+                "WHERE NOT EXISTS (SELECT 1 FROM urls u WHERE u.sitemap = ? AND u.loc = i.loc)", (key,))
+        ]
+        conn.executemany("INSERT INTO urls (sitemap, loc, fingerprint, lastmod, changefreq, priority, size) "
+                         "VALUES (?, ?, ?, ?, ?, ?, ?)", added)
+        stats["added"] = len(added)
+        conn.execute("DROP TABLE temp.incoming")
+
+        dirty.update(self._assign_shards(dirty))
+
+        shards = {shard: (count, lastmod) for shard, count, lastmod in conn.execute(
+            "SELECT shard, COUNT(*), MAX(lastmod) FROM urls WHERE sitemap = ? GROUP BY shard", (key,))}
+        single = len(shards) <= 1
+        if single != was_single:
+            dirty.update(shards)  # Shard 1 moves between path and <stem>-1.xml
+        dirty.update(shard for shard in shards if not os.path.exists(self.shard_path(shard, single)))
+        if not shards:
+            shards = {1: (0, None)}
+            dirty.add(1)
+        dirty &= set(shards)
+
+        conn.execute("DELETE FROM pending WHERE sitemap = ?", (key,))
+        conn.executemany("INSERT INTO pending VALUES (?, ?)", ((key, shard) for shard in dirty))
+        conn.execute("INSERT OR REPLACE INTO sitemaps VALUES (?, ?, ?)", (key, self.settings, int(single)))
+        conn.commit()
+
+        # Files are written outside the transaction; only this sitemap's rows are read
+        written = []
+        for shard in sorted(dirty):
+            written.append(self._write_shard(shard, single))
+        if not single:
+            index = INDEX_HEADER + b"".join(
+                sitemap_entry(f"{self.base_url}/{os.path.basename(self.shard_path(shard, False))}", lastmod)
+                for shard, (_, lastmod) in sorted(shards.items())
+            ) + INDEX_FOOTER
+            if self._write_if_changed(self.path, index):
+                written.append(self.path)
+        else:
+            # The other format's single file, or a stale index from when the sitemap was sharded
+            stale = self.path if self.compress else self.path + ".gz"
+            if os.path.exists(stale):
+                os.remove(stale)
+        remove_stale_shards(self.directory, self.stem, () if single else shards, self.compress)
+
+        conn.execute("DELETE FROM pending WHERE sitemap = ?", (key,))
+        conn.commit()
+        stats.update(urls=sum(count for count, _ in shards.values()), shards=len(shards), written=written)
+        return stats
+
+    def _assign_shards(self, dirty: Set[int]) -> Set[int]:
+        """Place unassigned URLs; returns the shards that gained URLs"""
+        conn = self.conn
+        unassigned = conn.execute("SELECT loc, size FROM urls WHERE sitemap = ? AND shard IS NULL ORDER BY loc",
+                                  (self.key,)).fetchall()
+        if not unassigned:
+            return set()
+        usage = {shard: [count, size] for shard, count, size in conn.execute(
+            "SELECT shard, COUNT(*), SUM(size) FROM urls WHERE sitemap = ? AND shard IS NOT NULL GROUP BY shard",
+            (self.key,))}
+        overhead = len(URLSET_HEADER) + len(URLSET_FOOTER)
+        last = max(usage, default=0)
+        candidates = sorted(shard for shard in dirty if shard in usage) + ([last] if last else [])
+        next_new = last + 1
+
+        assignments = []
+        touched: Set[int] = set()
+        position = 0
+        for loc, size in unassigned:
+            while True:
+                if position < len(candidates):
+                    shard = candidates[position]
+                else:
+                    shard = next_new
+                    next_new += 1
+                    candidates.append(shard)
+                    usage[shard] = [0, 0]
+                count, used = usage[shard]
+                if count < self.max_urls and overhead + used + size <= self.max_bytes:
+                    break
+                position += 1
+            usage[shard][0] += 1
+            usage[shard][1] += size
+            touched.add(shard)
+            assignments.append((shard, self.key, loc))
+        conn.executemany("UPDATE urls SET shard = ? WHERE sitemap = ? AND loc = ?", assignments)
+        return touched
+
+    def _write_shard(self, shard: int, single: bool) -> str:
+        path = self.shard_path(shard, single)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        out, raw = open_output(tmp_path, self.compress)
+        with raw, out:
+            out.write(URLSET_HEADER)
+            for row in self.conn.execute("SELECT loc, lastmod, changefreq, priority FROM urls "
+                                         "WHERE sitemap = ? AND shard = ? ORDER BY loc", (self.key, shard)):
+                out.write(url_entry(*row))
+            out.write(URLSET_FOOTER)
+        os.replace(tmp_path, path)
+        return path
+
+    @staticmethod
+    def _write_if_changed(path: str, content: bytes) -> bool:
+        try:
+            with open(path, "rb") as f:
+                if f.read() == content:
+                    return False
+        except OSError:
+            pass
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+        return True
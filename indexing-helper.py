@@ -45,7 +45,10 @@ def check_url_indexing():
     search_url = f"https://www.google.com/search?q=site:{url}"
     print(f"   {search_url}")
     
-    print("\n3. Common indexing issues to check:")
+    print("\n3. To check every URL in a site's sitemap at once:")
+    print("   python3 search-console-check.py inspect sc-domain:yourdomain.com")
+    
+    print("\n4. Common indexing issues to check:")
     print("   - Page not found (404)")
     print("   - Blocked by robots.txt")
     print("   - Noindex tag present")
@@ -155,6 +158,8 @@ def generate_report():
     """Generate indexing report"""
     print("\nIndexing Report Generator")
     print("=========================")
+    print("For clicks, impressions and week-over-week trends from stored snapshots, run:")
+    print("  python3 search-console-check.py report [--format html]\n")
     
     sites = []
     print("Enter your sites (empty line to finish):")
@@ -11,15 +11,19 @@ import urllib.parse
 from http.server import HTTPServer, BaseHTTPRequestHandler
 import threading
 import time
-import subprocess
 import os
 import socket
 
+from api_client import call_api
+from metrics import export_on_exit
+from token_cache import TokenCache, TokenRefreshError
+
 # OAuth2 Configuration - Using Google's public OAuth client for installed apps
 CLIENT_ID = "764086051850-6qr4p6gpi6hn506pt8ejuq83di341hur.apps.googleusercontent.com"
 CLIENT_SECRET = "d-FL95Q19q7MQmFpd7hHD0Ty"  # This is public for installed apps
 REDIRECT_URI = "http://localhost:8085"  # Using same port as gcloud
 SCOPES = ["https://www.googleapis.com/auth/indexing", "https://www.googleapis.com/auth/webmasters"]
+TOKEN_URL = "https://oauth2.googleapis.com/token"
 
 # Store tokens
 TOKEN_FILE = os.path.expanduser("~/.indexing_tokens.json")
@@ -110,14 +114,7 @@ def exchange_code_for_tokens(code, redirect_uri):
         'grant_type': 'authorization_code'
     }
     
-    result = subprocess.run([
-        'curl', '-s', '-X', 'POST',
-        'https://oauth2.googleapis.com/token',
-        '-H', 'Content-Type: application/x-www-form-urlencoded',
-        '-d', '&'.join([f"{k}={v}" for k, v in data.items()])
-    ], capture_output=True, text=True)
-    
-    return json.loads(result.stdout)
+    return call_api('POST', TOKEN_URL, form=data)
 
 def refresh_access_token(refresh_token):
     """Get new access token using refresh token"""
@@ -128,28 +125,16 @@ def refresh_access_token(refresh_token):
         'grant_type': 'refresh_token'
     }
     
-    result = subprocess.run([
-        'curl', '-s', '-X', 'POST',
-        'https://oauth2.googleapis.com/token',
-        '-H', 'Content-Type: application/x-www-form-urlencoded',
-        '-d', '&'.join([f"{k}={v}" for k, v in data.items()])
-    ], capture_output=True, text=True)
-    
-    return json.loads(result.stdout)
+    return call_api('POST', TOKEN_URL, form=data)
 
 def get_access_token():
-    """Get valid access token, refreshing if needed"""
+    """Get valid access token, refreshing only when the cached one is expiring"""
+    cache = TokenCache(TOKEN_FILE)
     if os.path.exists(TOKEN_FILE):
-        with open(TOKEN_FILE, 'r') as f:
-            tokens = json.load(f)
-        
-        # Try to refresh
-        new_tokens = refresh_access_token(tokens['refresh_token'])
-        if 'access_token' in new_tokens:
-            tokens.update(new_tokens)
-            with open(TOKEN_FILE, 'w') as f:
-                json.dump(tokens, f)
-            return tokens['access_token']
+        try:
+            return cache.get_token(lambda tokens: refresh_access_token(tokens['refresh_token']))
+        except (TokenRefreshError, KeyError):
+            pass  # Refresh token revoked or missing; re-authenticate below
     
     # Need new authentication
     print("Need to authenticate with Google...")
@@ -160,8 +145,7 @@ def get_access_token():
         print(f"Error exchanging code: {tokens}")
         raise Exception("Failed to get access token")
     
-    with open(TOKEN_FILE, 'w') as f:
-        json.dump(tokens, f)
+    cache.store(tokens)
     
     return tokens['access_token']
 
@@ -169,20 +153,17 @@ def submit_url(url, action="URL_UPDATED"):
     """Submit URL to Indexing API"""
     access_token = get_access_token()
     
-    data = json.dumps({
+    data = {
         "url": url,
         "type": action
-    })
+    }
     
-    result = subprocess.run([
-        'curl', '-s', '-X', 'POST',
+    return call_api(
+        'POST',
         'https://indexing.googleapis.com/v3/urlNotifications:publish',
-        '-H', f'Authorization: Bearer {access_token}',
-        '-H', 'Content-Type: application/json',
-        '-d', data
-    ], capture_output=True, text=True)
-    
-    return json.loads(result.stdout)
+        token=access_token,
+        json_body=data
+    )
 
 def main():
     if len(sys.argv) < 2:
@@ -197,6 +178,7 @@ def main():
         print("      with the Google account you use to authenticate.")
         sys.exit(1)
     
+    export_on_exit("indexing_oauth")
     command = sys.argv[1]
     
     if command == "auth":
@@ -225,12 +207,12 @@ def main():
             else:  # status
                 # Add status check function
                 access_token = get_access_token()
-                result = subprocess.run([
-                    'curl', '-s', '-X', 'GET',
-                    f'https://indexing.googleapis.com/v3/urlNotifications/metadata?url={urllib.parse.quote(url)}',
-                    '-H', f'Authorization: Bearer {access_token}'
-                ], capture_output=True, text=True)
-                result = json.loads(result.stdout)
+                result = call_api(
+                    'GET',
+                    'https://indexing.googleapis.com/v3/urlNotifications/metadata',
+                    token=access_token,
+                    params={'url': url}
+                )
             
             print("\nResult:")
             print(json.dumps(result, indent=2))
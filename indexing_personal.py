@@ -8,7 +8,10 @@ import json
 import sys
 import subprocess
 import os
-from urllib.parse import quote
+import time
+
+from api_client import call_api
+from metrics import export_on_exit, get_metrics
 
 def login_with_personal_account():
     """Login with personal Google account for Indexing API access"""
@@ -50,9 +53,12 @@ def get_personal_access_token():
     print(f"Using account: {active_account}")
     
     # Get access token
+    start = time.perf_counter()
     result = subprocess.run([
         'gcloud', 'auth', 'print-access-token'
     ], capture_output=True, text=True)
+    get_metrics().observe("token", 200 if result.returncode == 0 else None,
+                          time.perf_counter() - start)
     
     if result.returncode == 0:
         return result.stdout.strip()
@@ -62,21 +68,17 @@ def get_personal_access_token():
 
 def check_search_console_access(access_token):
     """Check if we have access to Search Console"""
-    result = subprocess.run([
-        'curl', '-s',
+    response = call_api(
+        'GET',
         'https://www.googleapis.com/webmasters/v3/sites',
-        '-H', f'Authorization: Bearer {access_token}'
-    ], capture_output=True, text=True)
+        token=access_token
+    )
     
-    try:
-        response = json.loads(result.stdout)
-        if 'error' in response:
-            return False, response['error'].get('message', 'Unknown error')
-        else:
-            sites = response.get('siteEntry', [])
-            return True, sites
-    except:
-        return False, "Failed to check Search Console access"
+    if 'error' in response:
+        return False, response['error'].get('message', 'Unknown error')
+    else:
+        sites = response.get('siteEntry', [])
+        return True, sites
 
 def submit_url_personal(url, action="URL_UPDATED"):
     """Submit URL using personal account"""
@@ -95,25 +97,22 @@ def submit_url_personal(url, action="URL_UPDATED"):
         print("Make sure you have verified your site in Search Console with this account.")
     
     # Try to submit anyway
-    data = json.dumps({
+    data = {
         "url": url,
         "type": action
-    })
+    }
     
     project_id = subprocess.run([
         'gcloud', 'config', 'get-value', 'project'
     ], capture_output=True, text=True).stdout.strip()
     
-    result = subprocess.run([
-        'curl', '-s', '-X', 'POST',
+    return call_api(
+        'POST',
         'https://indexing.googleapis.com/v3/urlNotifications:publish',
-        '-H', f'Authorization: Bearer {access_token}',
-        '-H', 'Content-Type: application/json',
-        '-H', f'x-goog-user-project: {project_id}',
-        '-d', data
-    ], capture_output=True, text=True)
-    
-    return json.loads(result.stdout)
+        token=access_token,
+        json_body=data,
+        headers={'x-goog-user-project': project_id}
+    )
 
 def get_url_status_personal(url):
     """Get URL status using personal account"""
@@ -123,14 +122,13 @@ def get_url_status_personal(url):
         'gcloud', 'config', 'get-value', 'project'
     ], capture_output=True, text=True).stdout.strip()
     
-    result = subprocess.run([
-        'curl', '-s', '-X', 'GET',
-        f'https://indexing.googleapis.com/v3/urlNotifications/metadata?url={quote(url)}',
-        '-H', f'Authorization: Bearer {access_token}',
-        '-H', f'x-goog-user-project: {project_id}'
-    ], capture_output=True, text=True)
-    
-    return json.loads(result.stdout)
+    return call_api(
+        'GET',
+        'https://indexing.googleapis.com/v3/urlNotifications/metadata',
+        token=access_token,
+        params={'url': url},
+        headers={'x-goog-user-project': project_id}
+    )
 
 def main():
     if len(sys.argv) < 2:
@@ -147,6 +145,7 @@ def main():
         print("  2. The Indexing API must be enabled in your Google Cloud project")
         sys.exit(1)
     
+    export_on_exit("indexing_personal")
     command = sys.argv[1]
     
     if command == "login":
@@ -4,14 +4,55 @@ Google Search Console Indexing API Tool
 Uses Application Default Credentials to submit URLs for indexing
 """
 
+import atexit
+import bisect
+import hashlib
 import json
+import os
+import re
 import sys
-from typing import List, Dict
-from datetime import datetime
+import time
+import uuid
+from array import array
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from datetime import datetime, timezone
+from urllib.parse import quote
 from google.auth.transport.requests import Request
 from google.oauth2 import service_account
 import google.auth
 import requests
+from requests.adapters import HTTPAdapter
+
+from api_client import resolve_url
+from metrics import export_on_exit, get_metrics
+from rate_limiter import QUEUE_FILE, QueueWriter, QuotaScheduler, load_queue, next_quota_reset, save_queue
+from retry_policy import DEFAULT_MAX_RETRIES, RETRYABLE_STATUS, RetryPolicy, parse_retry_after
+from submission_ledger import SubmissionLedger, fetch_fingerprint
+from token_cache import RUN_LIFETIME, TokenCache, cache_path, fingerprint
+from ttl_cache import CACHE_DIR, TTLCache
+
+DEFAULT_CONCURRENCY = 1
+
+API_ROOT = resolve_url("https://indexing.googleapis.com")
+PUBLISH_PATH = "/v3/urlNotifications:publish"
+METADATA_PATH = "/v3/urlNotifications/metadata"
+BATCH_ENDPOINT = f"{API_ROOT}/batch"
+BATCH_SIZE = 100  # Maximum sub-requests per batch envelope
+
+BATCH_LOG = "batch_indexing_results.jsonl"
+
+METADATA_CACHE = os.path.join(CACHE_DIR, "url_metadata.db")
+METADATA_TTL = 6 * 3600  # Seconds a cached metadata lookup stays fresh
+
+def create_session(pool_size: int = DEFAULT_CONCURRENCY) -> requests.Session:
+    """Create a keep-alive session whose connection pool fits the worker count"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(pool_size, 1))
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
 
 def get_access_token() -> str:
     """Get access token using Application Default Credentials"""
@@ -21,17 +62,66 @@ def get_access_token() -> str:
             scopes=['https://www.googleapis.com/auth/indexing']
         )
         
-        # Refresh the credentials if needed
-        request = Request()
-        credentials.refresh(request)
+        # Refresh the credentials only when the cached token is expiring
+        def refresh(_cached: Dict) -> Dict:
+            request = Request()
+            start = time.perf_counter()
+            try:
+                credentials.refresh(request)
+            except Exception:
+                get_metrics().observe("token", None, time.perf_counter() - start)
+                raise
+            get_metrics().observe("token", 200, time.perf_counter() - start)
+            tokens = {"access_token": credentials.token}
+            if credentials.expiry:
+                tokens["expires_at"] = credentials.expiry.replace(tzinfo=timezone.utc).timestamp()
+            return tokens
         
-        return credentials.token
+        identity = (getattr(credentials, "service_account_email", None)
+                    or getattr(credentials, "client_id", None) or "")
+        cache = TokenCache(cache_path("adc_indexing_google_auth"))
+        # Fetched once per run, so it must outlast a quota-paced batch
+        return cache.get_token(refresh, source=fingerprint(type(credentials).__name__, identity),
+                               min_lifetime=RUN_LIFETIME)
     except Exception as e:
         print(f"Error getting access token: {e}")
         print("Make sure you've run: gcloud auth application-default login --scopes=https://www.googleapis.com/auth/cloud-platform,https://www.googleapis.com/auth/indexing")
         sys.exit(1)
 
-def submit_url(url: str, access_token: str, action: str = "URL_UPDATED") -> Dict:
+def error_result(status_code: Optional[int], message: str,
+                 retry_after: Optional[str] = None) -> Dict:
+    """
+    Build the result dict returned for a failed call
+    
+    status_code is None when no HTTP response was received at all.
+    """
+    result = {
+        "error": True,
+        "status_code": status_code,
+        "message": message
+    }
+    seconds = parse_retry_after(retry_after)
+    if seconds is not None:
+        result["retry_after"] = seconds
+    return result
+
+def record_call(endpoint: str, start: float, response: Optional[requests.Response] = None):
+    """Record one HTTP attempt (response is None on a transport error) in the metrics registry"""
+    if response is None:
+        get_metrics().observe(endpoint, None, time.perf_counter() - start)
+        return
+    sent = len(response.request.body or b"")
+    received = int(response.headers.get("Content-Length") or len(response.content))
+    get_metrics().observe(endpoint, response.status_code, time.perf_counter() - start, sent, received)
+
+def classify_result(result: Dict) -> Tuple[Optional[int], Optional[float]]:
+    """(status_code, retry_after) of a result dict, for the retry policy"""
+    if "error" not in result:
+        return 200, None
+    return result.get("status_code"), result.get("retry_after")
+
+def submit_url(url: str, access_token: str, action: str = "URL_UPDATED",
+               session: Optional[requests.Session] = None) -> Dict:
     """
     Submit a URL to Google's Indexing API
     
@@ -39,11 +129,12 @@ def submit_url(url: str, access_token: str, action: str = "URL_UPDATED") -> Dict
         url: The URL to submit
         access_token: Google Cloud access token
         action: Either 'URL_UPDATED' or 'URL_DELETED'
+        session: Optional shared session for connection reuse
     
     Returns:
         API response as dict
     """
-    endpoint = "https://indexing.googleapis.com/v3/urlNotifications:publish"
+    endpoint = f"{API_ROOT}{PUBLISH_PATH}"
     
     headers = {
         "Authorization": f"Bearer {access_token}",
@@ -55,29 +146,34 @@ def submit_url(url: str, access_token: str, action: str = "URL_UPDATED") -> Dict
         "type": action
     }
     
-    response = requests.post(endpoint, headers=headers, json=data)
+    start = time.perf_counter()
+    try:
+        response = (session or requests).post(endpoint, headers=headers, json=data)
+    except requests.RequestException as e:
+        record_call("publish", start)
+        return error_result(None, f"Transport error: {e}")
+    record_call("publish", start, response)
     
     if response.status_code == 200:
         return response.json()
     else:
-        return {
-            "error": True,
-            "status_code": response.status_code,
-            "message": response.text
-        }
+        return error_result(response.status_code, response.text,
+                            response.headers.get("Retry-After"))
 
-def get_url_status(url: str, access_token: str) -> Dict:
+def get_url_status(url: str, access_token: str,
+                   session: Optional[requests.Session] = None) -> Dict:
     """
     Get indexing status for a URL
     
     Args:
         url: The URL to check
         access_token: Google Cloud access token
+        session: Optional shared session for connection reuse
     
     Returns:
         API response as dict
     """
-    endpoint = "https://indexing.googleapis.com/v3/urlNotifications/metadata"
+    endpoint = f"{API_ROOT}{METADATA_PATH}"
     
     headers = {
         "Authorization": f"Bearer {access_token}"
@@ -87,18 +183,336 @@ def get_url_status(url: str, access_token: str) -> Dict:
         "url": url
     }
     
-    response = requests.get(endpoint, headers=headers, params=params)
+    start = time.perf_counter()
+    try:
+        response = (session or requests).get(endpoint, headers=headers, params=params)
+    except requests.RequestException as e:
+        record_call("metadata", start)
+        return error_result(None, f"Transport error: {e}")
+    record_call("metadata", start, response)
     
     if response.status_code == 200:
         return response.json()
     else:
-        return {
-            "error": True,
-            "status_code": response.status_code,
-            "message": response.text
-        }
+        return error_result(response.status_code, response.text,
+                            response.headers.get("Retry-After"))
+
+def build_batch_body(calls: List[Tuple[str, str, Optional[Dict]]], boundary: str) -> bytes:
+    """
+    Encode sub-requests as a multipart/mixed batch envelope
+    
+    Args:
+        calls: (method, path, json_body) tuples, e.g. ("POST", "/v3/urlNotifications:publish", {...})
+        boundary: Multipart boundary string
+    
+    Returns:
+        Request body for the batch endpoint
+    """
+    lines = []
+    for i, (method, path, body) in enumerate(calls):
+        lines.append(f"--{boundary}")
+        lines.append("Content-Type: application/http")
+        lines.append("Content-Transfer-Encoding: binary")
+        lines.append(f"Content-ID: <item{i}>")
+        lines.append("")
+        lines.append(f"{method} {path}")
+        if body is not None:
+            payload = json.dumps(body)
+            lines.append("Content-Type: application/json")
+            lines.append(f"Content-Length: {len(payload.encode())}")
+            lines.append("")
+            lines.append(payload)
+        else:
+            lines.append("")
+        lines.append("")
+    lines.append(f"--{boundary}--")
+    lines.append("")
+    return "\r\n".join(lines).encode()
+
+def parse_batch_response(content_type: str, body: bytes) -> Dict[int, Dict]:
+    """
+    Split a multipart/mixed batch response into per-item results
+    
+    Returns:
+        Mapping of sub-request index to the same dict shape submit_url returns
+    """
+    match = re.search(r'boundary="?([^";]+)"?', content_type)
+    if not match:
+        raise ValueError(f"No boundary in batch response content type: {content_type}")
+    delimiter = b"--" + match.group(1).encode()
+    
+    results = {}
+    for part in body.replace(b"\r\n", b"\n").split(delimiter)[1:]:
+        if part.startswith(b"--"):
+            break
+        part_headers, _, http_response = part.strip(b"\n").partition(b"\n\n")
+        content_id = re.search(rb"Content-ID:\s*<[^>]*?item(\d+)>", part_headers, re.IGNORECASE)
+        if not content_id:
+            continue
+        
+        status_line, _, rest = http_response.partition(b"\n")
+        response_headers, _, payload = rest.partition(b"\n\n")
+        status_code = int(status_line.split()[1])
+        text = payload.decode("utf-8", "replace").strip()
+        
+        if status_code == 200:
+            results[int(content_id.group(1))] = json.loads(text) if text else {}
+        else:
+            retry_after = re.search(rb"^Retry-After:\s*(.+)$", response_headers,
+                                    re.IGNORECASE | re.MULTILINE)
+            results[int(content_id.group(1))] = error_result(
+                status_code, text, retry_after.group(1).decode().strip() if retry_after else None
+            )
+    return results
+
+def send_batch(calls: List[Tuple[str, str, Optional[Dict]]], access_token: str,
+               session: Optional[requests.Session] = None) -> List[Dict]:
+    """
+    Send up to BATCH_SIZE sub-requests in one batch POST
+    
+    Returns:
+        One result dict per call, in the same order as calls
+    """
+    boundary = f"batch_{uuid.uuid4().hex}"
+    headers = {
+        "Authorization": f"Bearer {access_token}",
+        "Content-Type": f"multipart/mixed; boundary={boundary}"
+    }
+    
+    start = time.perf_counter()
+    try:
+        response = (session or requests).post(
+            BATCH_ENDPOINT, headers=headers, data=build_batch_body(calls, boundary)
+        )
+    except requests.RequestException as e:
+        record_call("batch", start)
+        return [error_result(None, f"Transport error: {e}") for _ in calls]
+    record_call("batch", start, response)
+    
+    if response.status_code != 200:
+        return [
+            error_result(response.status_code, response.text, response.headers.get("Retry-After"))
+            for _ in calls
+        ]
+    
+    parts = parse_batch_response(response.headers.get("Content-Type", ""), response.content)
+    return [
+        parts.get(i) or error_result(None, "No response part returned for this sub-request")
+        for i in range(len(calls))
+    ]
+
+def submit_url_batch(urls: List[str], access_token: str, action: str = "URL_UPDATED",
+                     session: Optional[requests.Session] = None) -> List[Dict]:
+    """Publish notifications for up to BATCH_SIZE URLs in one batch request"""
+    calls = [("POST", PUBLISH_PATH, {"url": url, "type": action}) for url in urls]
+    return send_batch(calls, access_token, session)
+
+def get_url_status_batch(urls: List[str], access_token: str,
+                         session: Optional[requests.Session] = None) -> List[Dict]:
+    """Fetch notification metadata for up to BATCH_SIZE URLs in one batch request"""
+    calls = [("GET", f"{METADATA_PATH}?url={quote(url, safe='')}", None) for url in urls]
+    return send_batch(calls, access_token, session)
+
+def chunked(items: Iterable, size: int) -> Iterator[List]:
+    """Yield successive lists of at most size items"""
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def run_bounded(items: Iterable, fn: Callable, concurrency: int) -> Iterator:
+    """
+    Apply fn to every item on a bounded worker pool
+    
+    Results are yielded in input order. At most 2 * concurrency calls are
+    in flight at once, so the input iterable is never fully materialized.
+    """
+    if concurrency <= 1:
+        for item in items:
+            yield fn(item)
+        return
+    
+    pending = deque()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for item in items:
+            pending.append(executor.submit(fn, item))
+            if len(pending) >= concurrency * 2:
+                yield pending.popleft().result()
+        for future in pending:
+            yield future.result()
+
+def _run_requests(urls: Iterable[str], single: Callable, batched: Callable,
+                  concurrency: int, use_batch: bool,
+                  limiter: Optional[QuotaScheduler] = None,
+                  deferred: Optional[List[str]] = None,
+                  policy: Optional[RetryPolicy] = None,
+                  endpoint: str = "publish") -> Iterator[Dict]:
+    """
+    Run single or batched API calls over urls and yield result records in order
+    
+    Args:
+        single: fn(url, session) -> result dict
+        batched: fn(urls, session) -> list of result dicts
+        limiter: Optional quota scheduler pacing each call
+        deferred: Receives URLs left over once the daily quota is used up
+        policy: Retry policy shared by all workers (default: RetryPolicy())
+        endpoint: Metrics label that single calls' retries are counted under
+    
+    Each record carries the number of retries it took and the delays
+    slept before them, alongside url, result and timestamp.
+    """
+    session = create_session(concurrency)
+    policy = policy or RetryPolicy()
+    
+    def run_one(url: str) -> List[Dict]:
+        result, retry_info = policy.call(lambda: single(url, session), classify_result)
+        get_metrics().add_retries(endpoint, retry_info["retries"])
+        return [{
+            "url": url,
+            "result": result,
+            "timestamp": datetime.now().isoformat(),
+            **retry_info
+        }]
+    
+    def run_chunk(chunk: List[str]) -> List[Dict]:
+        outcomes = policy.call_many(chunk, lambda urls: batched(list(urls), session), classify_result)
+        # Every retry round resends one envelope
+        get_metrics().add_retries("batch", max(info["retries"] for _, info in outcomes))
+        timestamp = datetime.now().isoformat()
+        return [
+            {"url": url, "result": result, "timestamp": timestamp, **retry_info}
+            for url, (result, retry_info) in zip(chunk, outcomes)
+        ]
+    
+    try:
+        if use_batch:
+            units = chunked(urls, BATCH_SIZE)
+            if limiter:
+                units = limiter.admit(units, deferred, size=len)
+            work = run_bounded(units, run_chunk, concurrency)
+        else:
+            units = limiter.admit(urls, deferred) if limiter else urls
+            work = run_bounded(units, run_one, concurrency)
+        for records in work:
+            yield from records
+    finally:
+        session.close()
+
+def filter_changed(urls: Iterable[str], ledger: SubmissionLedger, action: str,
+                   concurrency: int = DEFAULT_CONCURRENCY, force: bool = False,
+                   stats: Optional[Dict] = None,
+                   limiter: Optional[QuotaScheduler] = None,
+                   deferred: Optional[List[str]] = None) -> Iterator[str]:
+    """
+    Drop URLs that would repeat their last recorded notification
+    
+    For URL_UPDATED each page is fingerprinted (conditional HEAD, falling
+    back to a body hash) on the worker pool and compared with the ledger.
+    The fingerprint is recorded either way, so a forced run still leaves
+    the ledger ready to skip the page next time.
+    
+    Args:
+        stats: Optional dict whose 'unchanged' count is incremented per skipped URL
+        limiter, deferred: Once limiter's daily quota is exhausted, URLs not
+                           yet checked go straight to deferred, unfingerprinted
+                           (checks already in flight still finish)
+    """
+    stats = stats if stats is not None else {}
+    stats.setdefault("unchanged", 0)
+    
+    def unchecked(urls: Iterable[str]) -> Iterator[str]:
+        for url in urls:
+            if limiter is not None and limiter.exhausted:
+                deferred.append(url)
+            else:
+                yield url
+    urls = unchecked(urls)
+    
+    if action == "URL_DELETED":
+        for url in urls:
+            if not force and ledger.is_unchanged(ledger.get(url), action):
+                stats["unchanged"] += 1
+            else:
+                yield url
+        return
+    
+    def check(item):
+        url, row = item
+        return url, row, fetch_fingerprint(url, row["fingerprint"] if row else None)
+    
+    rows = ((url, ledger.get(url)) for url in urls)
+    for url, row, fingerprint in run_bounded(rows, check, concurrency):
+        ledger.mark_seen(url, fingerprint)
+        if not force and ledger.is_unchanged(row, action, fingerprint):
+            stats["unchanged"] += 1
+        else:
+            yield url
 
-def batch_submit_urls(urls: List[str], access_token: str, action: str = "URL_UPDATED") -> List[Dict]:
+def stream_submit_urls(urls: Iterable[str], access_token: str, action: str = "URL_UPDATED",
+                       concurrency: int = DEFAULT_CONCURRENCY,
+                       use_batch: bool = False,
+                       limiter: Optional[QuotaScheduler] = None,
+                       ledger: Optional[SubmissionLedger] = None,
+                       force: bool = False,
+                       policy: Optional[RetryPolicy] = None) -> Iterator[Dict]:
+    """
+    Submit URLs for indexing and yield each result record as it completes
+    
+    Records come out in input order. Neither urls nor the results are held
+    in memory, so this runs in constant space over any number of URLs.
+    URLs beyond the daily quota are appended to QUEUE_FILE. With a ledger,
+    URLs whose content is unchanged since their last notification are
+    skipped unless force is set, and successes are recorded.
+    """
+    stats = {"unchanged": 0}
+    deferred = QueueWriter(action)
+    if ledger:
+        urls = filter_changed(urls, ledger, action, concurrency, force, stats, limiter, deferred)
+    
+    records = _run_requests(
+        urls,
+        lambda url, session: submit_url(url, access_token, action, session=session),
+        lambda chunk, session: submit_url_batch(chunk, access_token, action, session=session),
+        concurrency,
+        use_batch,
+        limiter,
+        deferred,
+        policy
+    )
+    
+    try:
+        for record in records:
+            print(f"Submitting: {record['url']}")
+            result = record["result"]
+            if record["retries"]:
+                print(f"  Retried {record['retries']}x (waited {sum(record['retry_delays']):.1f}s)")
+            if "error" in result:
+                print(f"  Error: {result['message']}")
+            else:
+                print(f"  Success: {result}")
+                if ledger:
+                    ledger.mark_notified(record["url"], action)
+            yield record
+    finally:
+        deferred.close()
+    
+    if stats["unchanged"]:
+        print(f"\nSkipped {stats['unchanged']} URLs unchanged since their last notification (use --force to resend)")
+    if deferred.count:
+        print(f"\nDaily publish quota used up: queued {deferred.count} URLs in {QUEUE_FILE}")
+        print(f"Run 'python indexing_tool.py queue' after {next_quota_reset():%Y-%m-%d %H:%M %Z}")
+
+def batch_submit_urls(urls: List[str], access_token: str, action: str = "URL_UPDATED",
+                      concurrency: int = DEFAULT_CONCURRENCY,
+                      use_batch: bool = False,
+                      limiter: Optional[QuotaScheduler] = None,
+                      ledger: Optional[SubmissionLedger] = None,
+                      force: bool = False,
+                      policy: Optional[RetryPolicy] = None) -> List[Dict]:
     """
     Submit multiple URLs for indexing
     
@@ -106,25 +520,209 @@ def batch_submit_urls(urls: List[str], access_token: str, action: str = "URL_UPD
         urls: List of URLs to submit
         access_token: Google Cloud access token
         action: Either 'URL_UPDATED' or 'URL_DELETED'
+        concurrency: Number of requests to keep in flight
+        use_batch: Pack up to BATCH_SIZE notifications into each HTTP request
+        limiter: Optional publish quota scheduler; URLs beyond the daily
+                 quota are appended to QUEUE_FILE instead of being sent
+        ledger: Optional submission ledger used to skip unchanged URLs
+        force: Submit even URLs the ledger reports as unchanged
+        policy: Retry policy for 429/5xx/transport failures
     
     Returns:
-        List of API responses
+        List of API responses, in the same order as urls
     """
-    results = []
-    for url in urls:
-        print(f"Submitting: {url}")
-        result = submit_url(url, access_token, action)
-        results.append({
-            "url": url,
-            "result": result,
-            "timestamp": datetime.now().isoformat()
-        })
-        if "error" in result:
-            print(f"  Error: {result['message']}")
-        else:
-            print(f"  Success: {result}")
+    return list(stream_submit_urls(urls, access_token, action, concurrency, use_batch,
+                                   limiter, ledger, force, policy))
+
+def batch_get_url_status(urls: List[str], access_token: str,
+                         concurrency: int = DEFAULT_CONCURRENCY,
+                         use_batch: bool = False,
+                         limiter: Optional[QuotaScheduler] = None,
+                         policy: Optional[RetryPolicy] = None) -> List[Dict]:
+    """
+    Get indexing status for multiple URLs
     
-    return results
+    Returns:
+        List of {"url", "result", "timestamp", "retries", "retry_delays"}
+        records, in the same order as urls
+    """
+    return list(_run_requests(
+        urls,
+        lambda url, session: get_url_status(url, access_token, session=session),
+        lambda chunk, session: get_url_status_batch(chunk, access_token, session=session),
+        concurrency,
+        use_batch,
+        limiter,
+        [],
+        policy,
+        endpoint="metadata"
+    ))
+
+def iter_urls(file_path: str) -> Iterator[str]:
+    """Yield the non-empty lines of a URL file one at a time"""
+    with open(file_path, "r") as f:
+        for line in f:
+            url = line.strip()
+            if url:
+                yield url
+
+def _url_key(url: str) -> int:
+    return int.from_bytes(hashlib.blake2b(url.encode(), digest_size=8).digest(), "big")
+
+class CompletedUrls:
+    """
+    URLs already submitted successfully according to a JSONL results log
+    
+    Stored as a sorted array of 64-bit hashes (8 bytes per URL) rather than
+    a set of strings, so resuming a million-URL run stays cheap.
+    """
+    
+    def __init__(self, log_path: str):
+        keys = array("Q")
+        if os.path.exists(log_path):
+            with open(log_path, "r") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue  # Partially written last line from a crash
+                    if "error" not in record.get("result", {}):
+                        keys.append(_url_key(record["url"]))
+        self._keys = array("Q", sorted(keys))
+    
+    def __len__(self) -> int:
+        return len(self._keys)
+    
+    def __contains__(self, url: str) -> bool:
+        key = _url_key(url)
+        i = bisect.bisect_left(self._keys, key)
+        return i < len(self._keys) and self._keys[i] == key
+
+def _cacheable(result: Dict) -> bool:
+    # A 404 means the URL was never notified, which is as useful to cache as a hit
+    return "error" not in result or result.get("status_code") == 404
+
+def stream_url_status(urls: Iterable[str], access_token: str,
+                      concurrency: int = DEFAULT_CONCURRENCY,
+                      use_batch: bool = False,
+                      limiter: Optional[QuotaScheduler] = None,
+                      policy: Optional[RetryPolicy] = None,
+                      cache: Optional[TTLCache] = None,
+                      ttl: Optional[float] = None) -> Iterator[Dict]:
+    """
+    Look up notification metadata for many URLs, reading a TTL cache first
+    
+    Only cache misses are sent to the API (and counted against the
+    metadata quota); fresh answers are written back to the cache. Records
+    come out in input order with a 'cached' flag.
+    """
+    session = create_session(concurrency)
+    policy = policy or RetryPolicy()
+    
+    def resolve(chunk: List[str]) -> List[Dict]:
+        records: List[Optional[Dict]] = [None] * len(chunk)
+        misses = []
+        for i, url in enumerate(chunk):
+            hit = cache.get(url, ttl) if cache else None
+            if hit:
+                result, stored_at = hit
+                records[i] = {
+                    "url": url,
+                    "result": result,
+                    "timestamp": datetime.fromtimestamp(stored_at).isoformat(),
+                    "cached": True
+                }
+            else:
+                misses.append(i)
+        
+        if misses:
+            if limiter:
+                limiter.acquire(len(misses))
+            miss_urls = [chunk[i] for i in misses]
+            if use_batch:
+                outcomes = policy.call_many(
+                    miss_urls,
+                    lambda urls: get_url_status_batch(list(urls), access_token, session=session),
+                    classify_result
+                )
+            else:
+                outcomes = [
+                    policy.call(lambda: get_url_status(url, access_token, session=session),
+                                classify_result)
+                    for url in miss_urls
+                ]
+            if use_batch:
+                get_metrics().add_retries("batch", max(info["retries"] for _, info in outcomes))
+            else:
+                get_metrics().add_retries("metadata", sum(info["retries"] for _, info in outcomes))
+            timestamp = datetime.now().isoformat()
+            for i, (result, retry_info) in zip(misses, outcomes):
+                records[i] = {"url": chunk[i], "result": result, "timestamp": timestamp,
+                              "cached": False, **retry_info}
+            if cache:
+                cache.set_many(
+                    (url, result) for url, (result, _) in zip(miss_urls, outcomes) if _cacheable(result)
+                )
+        return records
+    
+    try:
+        for records in run_bounded(chunked(urls, BATCH_SIZE if use_batch else 1), resolve, concurrency):
+            yield from records
+    finally:
+        session.close()
+
+def latest_notify_time(result: Dict) -> Optional[str]:
+    """Most recent notifyTime across latestUpdate and latestRemove, if any"""
+    times = [
+        result.get(key, {}).get("notifyTime")
+        for key in ("latestUpdate", "latestRemove")
+    ]
+    times = [t for t in times if t]
+    return max(times) if times else None
+
+def notify_time_matches(result: Dict, after: Optional[str], before: Optional[str]) -> bool:
+    """
+    Filter on the latest notify time (ISO strings compare lexicographically)
+    
+    URLs that were never notified count as older than any date, so
+    --notified-before also finds pages that were never submitted.
+    """
+    notified = latest_notify_time(result) if "error" not in result else None
+    if after and (notified is None or notified < after):
+        return False
+    if before and notified is not None and notified >= before:
+        return False
+    return True
+
+def pop_option(args: List[str], name: str, default: Optional[str] = None) -> Optional[str]:
+    """Remove '--name value' or '--name=value' from args and return the value"""
+    for i, arg in enumerate(args):
+        if arg == name and i + 1 < len(args):
+            value = args[i + 1]
+            del args[i:i + 2]
+            return value
+        if arg.startswith(name + "="):
+            del args[i]
+            return arg.split("=", 1)[1]
+    return default
+
+def pop_int_option(args: List[str], name: str, default: Optional[int] = None) -> Optional[int]:
+    """Like pop_option, but parse the value as an integer or exit with an error"""
+    value = pop_option(args, name)
+    if value is None:
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        print(f"Error: {name} must be an integer")
+        sys.exit(1)
+
+def pop_flag(args: List[str], name: str) -> bool:
+    """Remove a boolean '--name' flag from args and report whether it was present"""
+    if name in args:
+        args.remove(name)
+        return True
+    return False
 
 def main():
     """Main CLI interface"""
@@ -132,20 +730,63 @@ def main():
         print("Usage:")
         print("  python indexing_tool.py submit <url> [url2 url3 ...]")
         print("  python indexing_tool.py delete <url> [url2 url3 ...]")
-        print("  python indexing_tool.py status <url>")
+        print("  python indexing_tool.py status <url> [url2 url3 ...]")
         print("  python indexing_tool.py batch <file_with_urls.txt>")
+        print("  python indexing_tool.py status-batch <file_with_urls.txt> [--format table|jsonl]")
+        print(f"  python indexing_tool.py queue          # Submit URLs deferred to {QUEUE_FILE}")
+        print("\nOptions:")
+        print("  --concurrency N   Requests to keep in flight (default: 1)")
+        print(f"  --batch           Send up to {BATCH_SIZE} calls per batch request")
+        print("  --per-minute N    Publish calls allowed per minute (default: project quota)")
+        print("  --per-day N       Publish calls allowed per quota day (default: project quota)")
+        print("  --no-quota        Do not pace calls against the quota scheduler")
+        print(f"  --resume          batch: skip URLs already logged as successful in {BATCH_LOG}")
+        print("  --force           Resubmit URLs whose content is unchanged since the last notification")
+        print("  --no-ledger       Do not check or update the submission ledger")
+        print(f"  --max-retries N   Retries for 429/5xx/transport errors (default: {DEFAULT_MAX_RETRIES})")
+        print(f"  --ttl SECONDS     status-batch: reuse cached metadata this fresh (default: {METADATA_TTL})")
+        print("  --refresh         status-batch: ignore cached metadata")
+        print("  --notified-after DATE / --notified-before DATE")
+        print("                    status-batch: filter on the latest notify time (ISO date or timestamp)")
+        print("  --metrics         Print per-endpoint latency, errors and retries at exit")
         sys.exit(1)
     
-    command = sys.argv[1]
+    args = sys.argv[:]
+    use_batch = pop_flag(args, "--batch")
+    no_quota = pop_flag(args, "--no-quota")
+    resume = pop_flag(args, "--resume")
+    force = pop_flag(args, "--force")
+    no_ledger = pop_flag(args, "--no-ledger")
+    concurrency = pop_int_option(args, "--concurrency", DEFAULT_CONCURRENCY)
+    per_minute = pop_int_option(args, "--per-minute")
+    per_day = pop_int_option(args, "--per-day")
+    max_retries = pop_int_option(args, "--max-retries", DEFAULT_MAX_RETRIES)
+    ttl = 0 if pop_flag(args, "--refresh") else pop_int_option(args, "--ttl", METADATA_TTL)
+    output_format = pop_option(args, "--format", "table")
+    notified_after = pop_option(args, "--notified-after")
+    notified_before = pop_option(args, "--notified-before")
+    export_on_exit("indexing_tool", print_report=pop_flag(args, "--metrics"))
+    
+    policy = RetryPolicy(max_retries=max_retries)
+    publish_limiter = None if no_quota else QuotaScheduler("publish", per_minute, per_day)
+    metadata_limiter = None if no_quota else QuotaScheduler("metadata")
+    
+    command = args[1]
     access_token = get_access_token()
     
+    ledger = None
+    if not no_ledger and command in ("submit", "delete", "batch", "queue"):
+        ledger = SubmissionLedger()
+        atexit.register(ledger.close)
+    
     if command == "submit":
-        if len(sys.argv) < 3:
+        if len(args) < 3:
             print("Error: Please provide at least one URL to submit")
             sys.exit(1)
         
-        urls = sys.argv[2:]
-        results = batch_submit_urls(urls, access_token, "URL_UPDATED")
+        urls = args[2:]
+        results = batch_submit_urls(urls, access_token, "URL_UPDATED", concurrency, use_batch,
+                                    publish_limiter, ledger, force, policy)
         
         # Save results
         with open("indexing_results.json", "w") as f:
@@ -154,12 +795,13 @@ def main():
         print(f"\nResults saved to indexing_results.json")
         
     elif command == "delete":
-        if len(sys.argv) < 3:
+        if len(args) < 3:
             print("Error: Please provide at least one URL to delete")
             sys.exit(1)
         
-        urls = sys.argv[2:]
-        results = batch_submit_urls(urls, access_token, "URL_DELETED")
+        urls = args[2:]
+        results = batch_submit_urls(urls, access_token, "URL_DELETED", concurrency, use_batch,
+                                    publish_limiter, ledger, force, policy)
         
         # Save results
         with open("deletion_results.json", "w") as f:
@@ -168,44 +810,157 @@ def main():
         print(f"\nResults saved to deletion_results.json")
         
     elif command == "status":
-        if len(sys.argv) < 3:
+        if len(args) < 3:
             print("Error: Please provide a URL to check")
             sys.exit(1)
         
-        url = sys.argv[2]
-        result = get_url_status(url, access_token)
+        urls = args[2:]
+        records = batch_get_url_status(urls, access_token, concurrency, use_batch,
+                                       metadata_limiter, policy)
         
-        if "error" in result:
-            print(f"Error: {result['message']}")
-        else:
-            print(json.dumps(result, indent=2))
+        for record in records:
+            result = record["result"]
+            if len(records) > 1:
+                print(f"{record['url']}:")
+            if "error" in result:
+                print(f"Error: {result['message']}")
+            else:
+                print(json.dumps(result, indent=2))
             
     elif command == "batch":
-        if len(sys.argv) < 3:
+        if len(args) < 3:
             print("Error: Please provide a file path containing URLs")
             sys.exit(1)
         
-        file_path = sys.argv[2]
-        try:
-            with open(file_path, "r") as f:
-                urls = [line.strip() for line in f if line.strip()]
-            
-            results = batch_submit_urls(urls, access_token, "URL_UPDATED")
-            
-            # Save results
-            with open("batch_indexing_results.json", "w") as f:
-                json.dump(results, f, indent=2)
+        file_path = args[2]
+        if not os.path.exists(file_path):
+            print(f"Error: File '{file_path}' not found")
+            sys.exit(1)
+        
+        urls = iter_urls(file_path)
+        skipped = 0
+        if resume:
+            completed = CompletedUrls(BATCH_LOG)
+            print(f"Resuming: {len(completed)} URLs already submitted in {BATCH_LOG}")
             
-            print(f"\nProcessed {len(urls)} URLs")
-            print(f"Results saved to batch_indexing_results.json")
+            def pending(urls: Iterator[str]) -> Iterator[str]:
+                nonlocal skipped
+                for url in urls:
+                    if url in completed:
+                        skipped += 1
+                    else:
+                        yield url
             
-        except FileNotFoundError:
+            urls = pending(urls)
+        
+        processed = failed = 0
+        # Append each record as it completes so a crash loses at most the in-flight URLs
+        with open(BATCH_LOG, "a" if resume else "w") as log:
+            for record in stream_submit_urls(urls, access_token, "URL_UPDATED", concurrency,
+                                             use_batch, publish_limiter, ledger, force, policy):
+                log.write(json.dumps(record) + "\n")
+                log.flush()
+                processed += 1
+                if "error" in record["result"]:
+                    failed += 1
+        
+        print(f"\nProcessed {processed} URLs ({failed} failed, {skipped} skipped as already submitted)")
+        print(f"Results appended to {BATCH_LOG}")
+        if failed:
+            print("Re-run with --resume to retry only the failed and unsent URLs")
+    
+    elif command == "status-batch":
+        if len(args) < 3:
+            print("Error: Please provide a file path containing URLs")
+            sys.exit(1)
+        if output_format not in ("table", "jsonl"):
+            print("Error: --format must be 'table' or 'jsonl'")
+            sys.exit(1)
+        
+        file_path = args[2]
+        if not os.path.exists(file_path):
             print(f"Error: File '{file_path}' not found")
             sys.exit(1)
+        
+        cache = TTLCache(METADATA_CACHE, METADATA_TTL)
+        records = stream_url_status(iter_urls(file_path), access_token, concurrency, use_batch,
+                                    metadata_limiter, policy, cache, ttl)
+        
+        if output_format == "table":
+            print(f"{'URL':<60} {'LAST UPDATED':<28} {'LAST REMOVED':<28} SOURCE")
+        
+        shown = hits = total = 0
+        for record in records:
+            total += 1
+            hits += record["cached"]
+            result = record["result"]
+            if not notify_time_matches(result, notified_after, notified_before):
+                continue
+            shown += 1
+            
+            latest_update = result.get("latestUpdate", {}).get("notifyTime")
+            latest_remove = result.get("latestRemove", {}).get("notifyTime")
+            if output_format == "jsonl":
+                line = {
+                    "url": record["url"],
+                    "latestUpdate": latest_update,
+                    "latestRemove": latest_remove,
+                    "cached": record["cached"],
+                    "fetched_at": record["timestamp"]
+                }
+                if "error" in result:
+                    line["error"] = result.get("status_code")
+                print(json.dumps(line))
+            else:
+                if "error" in result and result.get("status_code") == 404:
+                    latest_update = "never notified"
+                elif "error" in result:
+                    latest_update = f"error {result.get('status_code')}"
+                source = "cache" if record["cached"] else "api"
+                print(f"{record['url']:<60} {latest_update or '-':<28} {latest_remove or '-':<28} {source}")
+        
+        cache.close()
+        print(f"\n{shown} of {total} URLs shown ({hits} from cache, {total - hits} fetched)",
+              file=sys.stderr)
+    
+    elif command == "queue":
+        entries = load_queue()
+        if not entries:
+            print(f"No queued URLs in {QUEUE_FILE}")
+            return
+        
+        # The queue file stays in place while URLs are sent; anything still over
+        # quota is appended to it, and entries that were sent are removed at the
+        # end (or on Ctrl-C), so an interrupted run loses nothing
+        entries = list({(entry["url"], entry["action"]): entry for entry in entries}.values())
+        results = []
+        done = set()
+        try:
+            for action in ("URL_UPDATED", "URL_DELETED"):
+                urls = [entry["url"] for entry in entries if entry["action"] == action]
+                if not urls:
+                    continue
+                # Queued URLs already passed the change check when they were deferred
+                for record in stream_submit_urls(urls, access_token, action, concurrency,
+                                                 use_batch, publish_limiter, ledger, True, policy):
+                    results.append(record)
+                    # Failures the retry policy gave up on stay queued for another attempt
+                    result = record["result"]
+                    if "error" not in result or result.get("status_code") not in RETRYABLE_STATUS:
+                        done.add((record["url"], action))
+        finally:
+            remaining = {(entry["url"], entry["action"]): entry for entry in load_queue()}
+            save_queue([entry for key, entry in remaining.items() if key not in done])
+        
+        with open("queue_results.json", "w") as f:
+            json.dump(results, f, indent=2)
+        
+        print(f"\nProcessed {len(results)} of {len(entries)} queued URLs")
+        print(f"Results saved to queue_results.json")
     
     else:
         print(f"Error: Unknown command '{command}'")
-        print("Valid commands: submit, delete, status, batch")
+        print("Valid commands: submit, delete, status, batch, status-batch, queue")
         sys.exit(1)
 
 if __name__ == "__main__":
@@ -6,10 +6,15 @@ Uses gcloud ADC credentials to submit URLs for indexing
 
 import json
 import sys
-import subprocess
 from typing import List, Dict
 from datetime import datetime
 
+from api_client import call_api
+from metrics import export_on_exit
+from token_cache import RUN_LIFETIME, TokenCache, cache_path, fingerprint
+
+PROJECT_HEADERS = {'x-goog-user-project': 'titanium-vision-455301-c4'}
+
 def get_adc_token() -> str:
     """Get access token from Application Default Credentials"""
     try:
@@ -17,23 +22,20 @@ def get_adc_token() -> str:
         with open('/Users/adamanzuoni/.config/gcloud/application_default_credentials.json', 'r') as f:
             creds = json.load(f)
         
-        # Get access token using refresh token
-        result = subprocess.run([
-            'curl', '-s', '-X', 'POST',
-            'https://oauth2.googleapis.com/token',
-            '-H', 'Content-Type: application/x-www-form-urlencoded',
-            '-d', f"client_id={creds['client_id']}",
-            '-d', f"client_secret={creds['client_secret']}",
-            '-d', f"refresh_token={creds['refresh_token']}",
-            '-d', 'grant_type=refresh_token',
-            '-d', 'scope=https://www.googleapis.com/auth/cloud-platform https://www.googleapis.com/auth/indexing'
-        ], capture_output=True, text=True)
+        # Get access token using refresh token, reusing a cached one until it expires
+        def refresh(_cached):
+            return call_api('POST', 'https://oauth2.googleapis.com/token', form={
+                'client_id': creds['client_id'],
+                'client_secret': creds['client_secret'],
+                'refresh_token': creds['refresh_token'],
+                'grant_type': 'refresh_token',
+                'scope': 'https://www.googleapis.com/auth/cloud-platform https://www.googleapis.com/auth/indexing'
+            })
         
-        token_data = json.loads(result.stdout)
-        if 'access_token' not in token_data:
-            print(f"Token response: {token_data}")
-            raise Exception("No access token in response")
-        return token_data['access_token']
+        cache = TokenCache(cache_path('adc_indexing'))
+        # Fetched once per run, so it must not be about to expire
+        return cache.get_token(refresh, source=fingerprint(creds['client_id'], creds['refresh_token']),
+                               min_lifetime=RUN_LIFETIME)
     except Exception as e:
         print(f"Error getting access token: {e}")
         sys.exit(1)
@@ -41,39 +43,29 @@ def get_adc_token() -> str:
 def submit_url(url: str, access_token: str, action: str = "URL_UPDATED") -> Dict:
     """Submit a URL to Google's Indexing API"""
     
-    data = json.dumps({
+    data = {
         "url": url,
         "type": action
-    })
+    }
     
-    result = subprocess.run([
-        'curl', '-s', '-X', 'POST',
+    return call_api(
+        'POST',
         'https://indexing.googleapis.com/v3/urlNotifications:publish',
-        '-H', f'Authorization: Bearer {access_token}',
-        '-H', 'Content-Type: application/json',
-        '-H', 'x-goog-user-project: titanium-vision-455301-c4',
-        '-d', data
-    ], capture_output=True, text=True)
-    
-    try:
-        return json.loads(result.stdout)
-    except:
-        return {"error": True, "message": result.stdout}
+        token=access_token,
+        json_body=data,
+        headers=PROJECT_HEADERS
+    )
 
 def get_url_status(url: str, access_token: str) -> Dict:
     """Get indexing status for a URL"""
     
-    result = subprocess.run([
-        'curl', '-s', '-X', 'GET',
-        f'https://indexing.googleapis.com/v3/urlNotifications/metadata?url={url}',
-        '-H', f'Authorization: Bearer {access_token}',
-        '-H', 'x-goog-user-project: titanium-vision-455301-c4'
-    ], capture_output=True, text=True)
-    
-    try:
-        return json.loads(result.stdout)
-    except:
-        return {"error": True, "message": result.stdout}
+    return call_api(
+        'GET',
+        'https://indexing.googleapis.com/v3/urlNotifications/metadata',
+        token=access_token,
+        params={'url': url},
+        headers=PROJECT_HEADERS
+    )
 
 def main():
     """Main CLI interface"""
@@ -85,6 +77,7 @@ def main():
         print("  python indexing_tool_simple.py test")
         sys.exit(1)
     
+    export_on_exit("indexing_tool_simple")
     command = sys.argv[1]
     
     if command == "test":
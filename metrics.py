@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+Per-endpoint instrumentation for Google API calls
+Latency histograms, status counters, retries and bytes per endpoint,
+exported as a Prometheus textfile and a JSON summary when a tool exits
+"""
+
+import atexit
+import json
+import os
+import re
+import threading
+import time
+from typing import Dict, List, Union
+
+from ttl_cache import CACHE_DIR
+
+METRICS_DIR = os.environ.get("GSC_METRICS_DIR", os.path.join(CACHE_DIR, "metrics"))
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0]
+
+# First match names the endpoint; checked against the URL before any override
+ENDPOINTS = [
+    ("token", re.compile(r"oauth2\.googleapis\.com/token|/token$")),
+    ("publish", re.compile(r"urlNotifications:publish")),
+    ("metadata", re.compile(r"urlNotifications/metadata")),
+    ("batch", re.compile(r"/batch(/|$)")),
+    ("url_inspection", re.compile(r"urlInspection/index:inspect")),
+    ("search_analytics", re.compile(r"/searchAnalytics/query")),
+    ("sitemaps", re.compile(r"/sitemaps")),
+    ("index_coverage", re.compile(r"/indexCoverage")),
+    ("sites", re.compile(r"/sites/?(\?|$)")),
+]
+
+Status = Union[int, str, None]
+
+def endpoint_name(url: str) -> str:
+    """Short label for the API endpoint a URL calls"""
+    for name, pattern in ENDPOINTS:
+        if pattern.search(url):
+            return name
+    return "other"
+
+class EndpointStats:
+    """Counters and a latency histogram for one endpoint"""
+
+    def __init__(self):
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)  # Last bucket is +Inf
+        self.count = 0
+        self.seconds = 0.0
+        self.max_seconds = 0.0
+        self.statuses: Dict[str, int] = {}
+        self.retries = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+
+    def observe(self, status: Status, seconds: float, bytes_sent: int, bytes_received: int):
+        index = len(LATENCY_BUCKETS)
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                index = i
+                break
+        self.buckets[index] += 1
+        self.count += 1
+        self.seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+        label = "transport_error" if status is None else str(status)
+        self.statuses[label] = self.statuses.get(label, 0) + 1
+        self.bytes_sent += bytes_sent
+        self.bytes_received += bytes_received
+
+    def quantile(self, q: float) -> float:
+        """Estimate a latency quantile by interpolating within its bucket"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            if n and seen + n >= rank:
+                low = LATENCY_BUCKETS[i - 1] if i else 0.0
+                high = LATENCY_BUCKETS[i] if i < len(LATENCY_BUCKETS) else self.max_seconds
+                return min(low + (high - low) * (rank - seen) / n, self.max_seconds)
+            seen += n
+        return self.max_seconds
+
+    @property
+    def errors(self) -> int:
+        return sum(n for status, n in self.statuses.items()
+                   if status != "cache" and not status.startswith(("2", "3")))
+
+class Metrics:
+    """Thread-safe registry of EndpointStats, keyed by endpoint name"""
+
+    def __init__(self):
+        self.started = time.time()
+        self.endpoints: Dict[str, EndpointStats] = {}
+        self._lock = threading.Lock()
+
+    def _stats(self, endpoint: str) -> EndpointStats:
+        stats = self.endpoints.get(endpoint)
+        if stats is None:
+            stats = self.endpoints[endpoint] = EndpointStats()
+        return stats
+
+    def observe(self, endpoint: str, status: Status, seconds: float,
+                bytes_sent: int = 0, bytes_received: int = 0):
+        """Record one HTTP attempt (or cache hit, with status 'cache')"""
+        with self._lock:
+            self._stats(endpoint).observe(status, seconds, bytes_sent, bytes_received)
+
+    def add_retries(self, endpoint: str, count: int):
+        if count:
+            with self._lock:
+                self._stats(endpoint).retries += count
+
+    def summary(self) -> Dict:
+        """JSON-ready summary, endpoints ordered by total time spent"""
+        with self._lock:
+            items = sorted(self.endpoints.items(), key=lambda item: -item[1].seconds)
+            return {
+                "started_at": self.started,
+                "wall_seconds": round(time.time() - self.started, 3),
+                "endpoints": {
+                    name: {
+                        "requests": stats.count,
+                        "errors": stats.errors,
+                        "retries": stats.retries,
+                        "statuses": dict(sorted(stats.statuses.items())),
+                        "total_seconds": round(stats.seconds, 3),
+                        "mean_ms": round(stats.seconds / stats.count * 1000, 2) if stats.count else 0.0,
+                        "p50_ms": round(stats.quantile(0.50) * 1000, 2),
+                        "p90_ms": round(stats.quantile(0.90) * 1000, 2),
+                        "p99_ms": round(stats.quantile(0.99) * 1000, 2),
+                        "max_ms": round(stats.max_seconds * 1000, 2),
+                        "bytes_sent": stats.bytes_sent,
+                        "bytes_received": stats.bytes_received,
+                    }
+                    for name, stats in items
+                }
+            }
+
+    def prometheus(self, tool: str) -> str:
+        """Prometheus text exposition format, for the node_exporter textfile collector"""
+        lines = []
+
+        def metric(name: str, kind: str, help_text: str):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        with self._lock:
+            items = sorted(self.endpoints.items())
+            metric("gsc_api_request_duration_seconds", "histogram",
+                   "Latency of Google API HTTP requests")
+            for name, stats in items:
+                labels = f'tool="{tool}",endpoint="{name}"'
+                cumulative = 0
+                for bound, n in zip(LATENCY_BUCKETS + ["+Inf"], stats.buckets):
+                    cumulative += n
+                    lines.append(f'gsc_api_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+                lines.append(f"gsc_api_request_duration_seconds_sum{{{labels}}} {stats.seconds:.6f}")
+                lines.append(f"gsc_api_request_duration_seconds_count{{{labels}}} {stats.count}")
+
+            metric("gsc_api_requests_total", "counter", "Google API requests by response status")
+            for name, stats in items:
+                for status, n in sorted(stats.statuses.items()):
+                    lines.append(f'gsc_api_requests_total{{tool="{tool}",endpoint="{name}",status="{status}"}} {n}')
+
+            metric("gsc_api_retries_total", "counter", "Retried Google API requests")
+            for name, stats in items:
+                lines.append(f'gsc_api_retries_total{{tool="{tool}",endpoint="{name}"}} {stats.retries}')
+
+            metric("gsc_api_bytes_total", "counter", "Request and response body bytes")
+            for name, stats in items:
+                lines.append(f'gsc_api_bytes_total{{tool="{tool}",endpoint="{name}",direction="sent"}} {stats.bytes_sent}')
+                lines.append(f'gsc_api_bytes_total{{tool="{tool}",endpoint="{name}",direction="received"}} {stats.bytes_received}')
+
+        metric("gsc_api_run_timestamp_seconds", "gauge", "When this run started")
+        lines.append(f'gsc_api_run_timestamp_seconds{{tool="{tool}"}} {self.started:.0f}')
+        return "\n".join(lines) + "\n"
+
+    def export(self, tool: str, directory: str = METRICS_DIR) -> List[str]:
+        """Atomically write <tool>.prom and <tool>.json; returns their paths"""
+        os.makedirs(directory, exist_ok=True)
+        paths = []
+        for extension, content in (("prom", self.prometheus(tool)),
+                                   ("json", json.dumps(self.summary(), indent=2))):
+            path = os.path.join(directory, f"{tool}.{extension}")
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w") as f:
+                f.write(content)
+            os.replace(tmp_path, path)
+            paths.append(path)
+        return paths
+
+    def report(self) -> str:
+        """Table of endpoints by total time, for printing at the end of a run"""
+        summary = self.summary()
+        lines = [f"API calls ({summary['wall_seconds']:.1f}s wall clock):",
+                 f"  {'endpoint':<18} {'requests':>8} {'errors':>6} {'retries':>7} "
+                 f"{'total s':>8} {'p50 ms':>8} {'p99 ms':>8} {'KB in':>8}"]
+        for name, stats in summary["endpoints"].items():
+            lines.append(f"  {name:<18} {stats['requests']:>8} {stats['errors']:>6} {stats['retries']:>7} "
+                         f"{stats['total_seconds']:>8.2f} {stats['p50_ms']:>8.1f} {stats['p99_ms']:>8.1f} "
+                         f"{stats['bytes_received'] / 1024:>8.1f}")
+        return "\n".join(lines)
+
+_metrics = Metrics()
+
+def get_metrics() -> Metrics:
+    """Return the process-wide registry"""
+    return _metrics
+
+def export_on_exit(tool: str, print_report: bool = False):
+    """Write the metrics files (and optionally print the table) when the process exits"""
+    def export():
+        if not _metrics.endpoints:
+            return
+        if print_report:
+            print("\n" + _metrics.report())
+        try:
+            paths = _metrics.export(tool)
+        except OSError as e:
+            print(f"Could not write metrics: {e}")
+            return
+        if print_report:
+            print(f"Metrics written to: {', '.join(paths)}")
+    atexit.register(export)
@@ -0,0 +1,369 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the Google APIs these tools call
+Serves Indexing API publish/metadata/batch, the OAuth token endpoint and the
+Search Console endpoints with configurable latency, error rate and quota,
+so the tools can be benchmarked and load-tested without spending real quota
+
+Point the tools at it with:
+  GOOGLE_API_OVERRIDE=http://127.0.0.1:8090 python3 indexing_tool.py ...
+"""
+
+import json
+import random
+import re
+import sys
+import threading
+import time
+import zlib
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, unquote, urlsplit
+
+DEFAULT_PORT = 8090
+ANALYTICS_ROWS = 5000  # Rows in each simulated search analytics result set
+MAX_ROW_LIMIT = 25000
+
+COVERAGE_STATES = [
+    ("PASS", "Submitted and indexed"),
+    ("PASS", "Indexed, not submitted in sitemap"),
+    ("NEUTRAL", "Crawled - currently not indexed"),
+    ("NEUTRAL", "Discovered - currently not indexed"),
+    ("FAIL", "Blocked by robots.txt"),
+    ("NEUTRAL", "URL is unknown to Google"),
+]
+
+COUNTRIES = ["usa", "gbr", "can", "ind", "deu"]
+DEVICES = ["DESKTOP", "MOBILE", "TABLET"]
+
+class QuotaBucket:
+    """Per-minute token bucket mirroring an API quota"""
+
+    def __init__(self, per_minute: Optional[int]):
+        self.per_minute = per_minute
+        self.tokens = float(per_minute or 0)
+        self.updated = time.time()
+        self.lock = threading.Lock()
+
+    def take(self, count: int = 1) -> Optional[float]:
+        """Consume count calls; returns None if allowed, else seconds until allowed"""
+        if not self.per_minute:
+            return None
+        with self.lock:
+            now = time.time()
+            self.tokens = min(self.per_minute,
+                              self.tokens + (now - self.updated) * self.per_minute / 60)
+            self.updated = now
+            if self.tokens >= count:
+                self.tokens -= count
+                return None
+            return (count - self.tokens) * 60 / self.per_minute
+
+class MockState:
+    """Behaviour knobs plus the notifications published so far"""
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0,
+                 quota_per_minute: Optional[int] = None, analytics_rows: int = ANALYTICS_ROWS,
+                 sites: Optional[List[str]] = None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.analytics_rows = analytics_rows
+        self.sites = sites or ["sc-domain:example.com", "https://www.example.org/"]
+        self.quota = {
+            "publish": QuotaBucket(quota_per_minute),
+            "metadata": QuotaBucket(quota_per_minute),
+            "inspection": QuotaBucket(quota_per_minute),
+        }
+        self.notifications: Dict[str, Dict] = {}
+        self.requests = 0
+        self.lock = threading.Lock()
+
+    def delay(self):
+        if self.latency or self.jitter:
+            time.sleep(max(self.latency + random.uniform(-self.jitter, self.jitter), 0))
+
+    def fail(self) -> bool:
+        return self.error_rate > 0 and random.random() < self.error_rate
+
+def error_body(code: int, message: str, status: str) -> Dict:
+    return {"error": {"code": code, "message": message, "status": status}}
+
+def analytics_rows(site: str, query: Dict, total: int) -> Dict:
+    """Deterministic fake searchAnalytics.query page honouring startRow/rowLimit"""
+    dimensions = query.get("dimensions", [])
+    start_row = int(query.get("startRow", 0))
+    row_limit = min(int(query.get("rowLimit", 1000)), MAX_ROW_LIMIT)
+    start_date = date.fromisoformat(query["startDate"])
+    days = (date.fromisoformat(query["endDate"]) - start_date).days + 1
+    domain = site.split(":", 1)[-1].replace("https://", "").replace("http://", "").strip("/")
+    seed = f"{site}|{query['startDate']}|{query['endDate']}|{','.join(dimensions)}"
+    if dimensions == ["date"]:
+        # One row per day, stable across queries, like the real daily totals
+        total = days
+
+    rows = []
+    for i in range(start_row, min(start_row + row_limit, total)):
+        h = zlib.crc32(f"{seed}|{i}".encode())
+        if dimensions == ["date"]:
+            h = zlib.crc32(f"{site}|{start_date + timedelta(days=i)}".encode())
+        keys = []
+        for dimension in dimensions:
+            if dimension == "query":
+                keys.append(f"query {h % 997}")
+            elif dimension == "page":
+                keys.append(f"https://{domain}/page-{i}")
+            elif dimension == "date":
+                keys.append((start_date + timedelta(days=i % max(days, 1))).isoformat())
+            elif dimension == "country":
+                keys.append(COUNTRIES[h % len(COUNTRIES)])
+            elif dimension == "device":
+                keys.append(DEVICES[h % len(DEVICES)])
+        clicks = 100 + h % 900 if dimensions == ["date"] else 1000 // (i + 1) + h % 3
+        impressions = clicks * 10 + h % 100 + 1
+        row = {
+            "clicks": clicks,
+            "impressions": impressions,
+            "ctr": clicks / impressions,
+            "position": round(1 + (h % 400) / 10, 1)
+        }
+        if keys:
+            row["keys"] = keys
+        rows.append(row)
+
+    result = {"responseAggregationType": "byPage" if "page" in dimensions else "byProperty"}
+    if rows:
+        result["rows"] = rows
+    return result
+
+class MockHandler(BaseHTTPRequestHandler):
+    """Routes every Google endpoint the tools use; see module docstring"""
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    state: MockState = None  # Set by MockGoogleApi
+
+    def log_message(self, format, *args):
+        pass  # Suppress logs
+
+    def _send(self, status: int, body: bytes, content_type: str = "application/json",
+              headers: Optional[Dict[str, str]] = None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_body(self) -> bytes:
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def do_GET(self):
+        self._handle("GET")
+
+    def do_POST(self):
+        self._handle("POST")
+
+    def _handle(self, method: str):
+        body = self._read_body()
+        state = self.state
+        with state.lock:
+            state.requests += 1
+        state.delay()
+
+        if state.fail():
+            payload = error_body(503, "The service is currently unavailable.", "UNAVAILABLE")
+            self._send(503, json.dumps(payload).encode())
+            return
+
+        if self.path.startswith("/batch"):
+            self._handle_batch(body)
+            return
+
+        status, payload, headers = self.dispatch(method, self.path, body)
+        encoded = json.dumps(payload).encode()
+        if method == "GET" and status == 200:
+            # Like Google's discovery APIs, tag GET responses for revalidation
+            etag = f'"{zlib.crc32(encoded):08x}"'
+            if self.headers.get("If-None-Match") == etag:
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            headers = dict(headers, ETag=etag)
+        self._send(status, encoded, headers=headers)
+
+    def dispatch(self, method: str, path: str, body: bytes) -> Tuple[int, Dict, Dict[str, str]]:
+        """Handle one (possibly batched) API call; returns (status, json, headers)"""
+        state = self.state
+        parts = urlsplit(path)
+        route = parts.path
+
+        if route == "/token":
+            return 200, {
+                "access_token": f"mock-token-{random.getrandbits(48):012x}",
+                "expires_in": 3599,
+                "token_type": "Bearer"
+            }, {}
+
+        quota_bucket = None
+        if route == "/v3/urlNotifications:publish":
+            quota_bucket = "publish"
+        elif route == "/v3/urlNotifications/metadata":
+            quota_bucket = "metadata"
+        elif route == "/v1/urlInspection/index:inspect":
+            quota_bucket = "inspection"
+        if quota_bucket:
+            wait = state.quota[quota_bucket].take()
+            if wait is not None:
+                return 429, error_body(429, f"Quota exceeded for quota metric '{quota_bucket}'",
+                                       "RESOURCE_EXHAUSTED"), {"Retry-After": str(int(wait) + 1)}
+
+        if route == "/v3/urlNotifications:publish" and method == "POST":
+            request = json.loads(body or b"{}")
+            url, action = request.get("url"), request.get("type", "URL_UPDATED")
+            notification = {"url": url, "type": action,
+                            "notifyTime": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())}
+            with state.lock:
+                metadata = state.notifications.setdefault(url, {"url": url})
+                metadata["latestRemove" if action == "URL_DELETED" else "latestUpdate"] = notification
+                metadata = dict(metadata)
+            return 200, {"urlNotificationMetadata": metadata}, {}
+
+        if route == "/v3/urlNotifications/metadata":
+            url = parse_qs(parts.query).get("url", [""])[0]
+            with state.lock:
+                metadata = state.notifications.get(url)
+            if metadata is None:
+                return 404, error_body(404, "Requested entity was not found.", "NOT_FOUND"), {}
+            return 200, metadata, {}
+
+        if route in ("/webmasters/v3/sites", "/v1/sites"):
+            return 200, {"siteEntry": [
+                {"siteUrl": site, "permissionLevel": "siteOwner"} for site in state.sites
+            ]}, {}
+
+        match = re.match(r"^/webmasters/v3/sites/([^/]+)/searchAnalytics/query$", route)
+        if match and method == "POST":
+            site = unquote(match.group(1))
+            return 200, analytics_rows(site, json.loads(body or b"{}"), state.analytics_rows), {}
+
+        if route == "/v1/urlInspection/index:inspect" and method == "POST":
+            request = json.loads(body or b"{}")
+            url = request.get("inspectionUrl", "")
+            verdict, coverage = COVERAGE_STATES[zlib.crc32(url.encode()) % len(COVERAGE_STATES)]
+            return 200, {"inspectionResult": {
+                "inspectionResultLink": f"https://search.google.com/search-console/inspect?url={url}",
+                "indexStatusResult": {
+                    "verdict": verdict,
+                    "coverageState": coverage,
+                    "robotsTxtState": "DISALLOWED" if "robots" in coverage else "ALLOWED",
+                    "indexingState": "INDEXING_ALLOWED",
+                    "lastCrawlTime": "2024-01-01T00:00:00Z",
+                    "pageFetchState": "SUCCESSFUL"
+                }
+            }}, {}
+
+        # indexCoverage and anything else: Google answers with a 404
+        return 404, error_body(404, f"Method not found: {route}", "NOT_FOUND"), {}
+
+    def _handle_batch(self, body: bytes):
+        """Answer a multipart/mixed batch request part by part"""
+        match = re.search(r'boundary="?([^";]+)"?', self.headers.get("Content-Type", ""))
+        if not match:
+            self._send(400, json.dumps(error_body(400, "Missing boundary", "INVALID_ARGUMENT")).encode())
+            return
+
+        out_boundary = f"batch_mock_{random.getrandbits(32):08x}"
+        chunks = []
+        for part in body.replace(b"\r\n", b"\n").split(b"--" + match.group(1).encode())[1:]:
+            if part.startswith(b"--"):
+                break
+            part_headers, _, http_request = part.strip(b"\n").partition(b"\n\n")
+            content_id = re.search(rb"Content-ID:\s*<([^>]*)>", part_headers, re.IGNORECASE)
+            request_line, _, rest = http_request.partition(b"\n")
+            _, _, sub_body = rest.partition(b"\n\n")
+            method, path = request_line.decode().split()[:2]
+
+            status, payload, headers = self.dispatch(method, path, sub_body.strip())
+            extra = "".join(f"{name}: {value}\r\n" for name, value in headers.items())
+            cid = content_id.group(1).decode() if content_id else ""
+            chunks.append(
+                f"--{out_boundary}\r\n"
+                f"Content-Type: application/http\r\n"
+                f"Content-ID: <response-{cid}>\r\n\r\n"
+                f"HTTP/1.1 {status} {'OK' if status == 200 else 'Error'}\r\n"
+                f"Content-Type: application/json; charset=UTF-8\r\n{extra}\r\n"
+                f"{json.dumps(payload)}\r\n"
+            )
+        chunks.append(f"--{out_boundary}--\r\n")
+        self._send(200, "".join(chunks).encode(), f"multipart/mixed; boundary={out_boundary}")
+
+class MockServer(ThreadingHTTPServer):
+    # The default listen backlog of 5 overflows under benchmark concurrency,
+    # and the SYN retransmits that follow add ~1s outliers that are the mock's, not the client's
+    request_queue_size = 128
+    daemon_threads = True
+
+class MockGoogleApi:
+    """Run the mock server on a background thread"""
+
+    def __init__(self, port: int = 0, **state_options):
+        self.state = MockState(**state_options)
+        handler = type("BoundMockHandler", (MockHandler,), {"state": self.state})
+        self.server = MockServer(("127.0.0.1", port), handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server.server_port}"
+
+    def start(self) -> "MockGoogleApi":
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+def main():
+    args = sys.argv[1:]
+
+    def option(name, default, cast):
+        if name in args:
+            return cast(args[args.index(name) + 1])
+        return default
+
+    if "-h" in args or "--help" in args:
+        print("Usage:")
+        print("  python mock_google_api.py [--port 8090] [--latency MS] [--jitter MS]")
+        print("                            [--error-rate 0.01] [--quota-per-minute N]")
+        print("                            [--analytics-rows N]")
+        sys.exit(0)
+
+    mock = MockGoogleApi(
+        port=option("--port", DEFAULT_PORT, int),
+        latency=option("--latency", 0.0, float) / 1000,
+        jitter=option("--jitter", 0.0, float) / 1000,
+        error_rate=option("--error-rate", 0.0, float),
+        quota_per_minute=option("--quota-per-minute", None, int),
+        analytics_rows=option("--analytics-rows", ANALYTICS_ROWS, int),
+    )
+    print(f"Mock Google APIs listening on {mock.base_url}")
+    print(f"Use: GOOGLE_API_OVERRIDE={mock.base_url} python3 <tool> ...")
+    try:
+        mock.server.serve_forever()
+    except KeyboardInterrupt:
+        mock.stop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+Quota-aware rate limiting for the Indexing API
+Token-bucket per-minute limits plus per-day counters, persisted to disk and
+shared between concurrent processes through a file lock
+"""
+
+import fcntl
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Iterator, List, Optional
+
+try:
+    from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+    QUOTA_TIMEZONE = ZoneInfo("America/Los_Angeles")  # Google resets daily quota at midnight Pacific
+except (ImportError, ZoneInfoNotFoundError):
+    QUOTA_TIMEZONE = None
+
+STATE_FILE = os.path.expanduser("~/.cache/gsc-indexing-tools/quota_state.json")
+QUEUE_FILE = "indexing_queue.jsonl"
+
+# Default Indexing API project quotas; raise these if Google grants more
+QUOTAS = {
+    "publish": {"per_minute": 600, "per_day": 200},
+    "metadata": {"per_minute": 180, "per_day": None},
+    # URL Inspection limits apply per Search Console property
+    "inspection": {"per_minute": 600, "per_day": 2000},
+}
+
+def quota_day(now: Optional[float] = None) -> str:
+    """The quota day (Pacific time) that a timestamp falls in"""
+    return datetime.fromtimestamp(now or time.time(), QUOTA_TIMEZONE).strftime("%Y-%m-%d")
+
+def next_quota_reset(now: Optional[float] = None) -> datetime:
+    """When the current daily quota window ends"""
+    current = datetime.fromtimestamp(now or time.time(), QUOTA_TIMEZONE)
+    return (current + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+
+class QuotaScheduler:
+    """
+    Paces calls against one quota bucket (e.g. 'publish' or 'metadata')
+
+    The per-minute limit is a token bucket refilled continuously, so bursts
+    up to the bucket size are allowed and the long-run rate never exceeds
+    per_minute. The per-day limit is a counter for the current quota day.
+    Both live in STATE_FILE so parallel runs draw from the same budget.
+    """
+
+    _thread_lock = threading.Lock()
+
+    def __init__(self, bucket: str, per_minute: Optional[int] = None,
+                 per_day: Optional[int] = None, state_path: str = STATE_FILE):
+        defaults = QUOTAS.get(bucket, {})
+        self.bucket = bucket
+        self.per_minute = per_minute if per_minute is not None else defaults.get("per_minute")
+        self.per_day = per_day if per_day is not None else defaults.get("per_day")
+        self.state_path = state_path
+        self.exhausted = False  # Set by admit once the daily quota runs out
+
+    @contextmanager
+    def _state(self):
+        """Load, lock and save the shared quota state"""
+        os.makedirs(os.path.dirname(self.state_path) or ".", exist_ok=True)
+        with self._thread_lock, open(self.state_path + ".lock", "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                try:
+                    with open(self.state_path, "r") as f:
+                        state = json.load(f)
+                except (FileNotFoundError, ValueError):
+                    state = {}
+                yield state
+                tmp_path = f"{self.state_path}.{os.getpid()}.tmp"
+                with open(tmp_path, "w") as f:
+                    json.dump(state, f)
+                os.replace(tmp_path, self.state_path)
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _refill(self, bucket: Dict, now: float):
+        if bucket.get("day") != quota_day(now):
+            bucket["day"] = quota_day(now)
+            bucket["day_used"] = 0
+        if self.per_minute:
+            elapsed = max(now - bucket.get("updated", now), 0)
+            tokens = bucket.get("tokens", self.per_minute) + elapsed * self.per_minute / 60
+            bucket["tokens"] = min(tokens, self.per_minute)
+        bucket["updated"] = now
+
+    def remaining_today(self) -> Optional[int]:
+        """Calls left in today's quota, or None if there is no daily limit"""
+        if not self.per_day:
+            return None
+        with self._state() as state:
+            bucket = state.setdefault(self.bucket, {})
+            self._refill(bucket, time.time())
+            return max(self.per_day - bucket["day_used"], 0)
+
+    def acquire(self, count: int = 1) -> int:
+        """
+        Block until up to count calls may be made and record them as used
+
+        Returns:
+            How many calls were granted. This is less than count only when
+            the daily quota runs out; 0 means it is already exhausted.
+        """
+        while True:
+            with self._state() as state:
+                bucket = state.setdefault(self.bucket, {})
+                now = time.time()
+                self._refill(bucket, now)
+
+                granted = count
+                if self.per_day:
+                    granted = min(granted, self.per_day - bucket["day_used"])
+                if granted <= 0:
+                    return 0
+
+                if not self.per_minute:
+                    wait = 0
+                else:
+                    # A batch larger than the bucket is admitted once the bucket is full
+                    needed = min(granted, self.per_minute)
+                    wait = (needed - bucket["tokens"]) * 60 / self.per_minute
+                    if wait <= 0:
+                        bucket["tokens"] -= granted
+
+                if wait <= 0:
+                    bucket["day_used"] += granted
+                    return granted
+            time.sleep(wait)
+
+    def admit(self, items: Iterable, deferred: List, size=lambda item: 1) -> Iterator:
+        """
+        Yield items as quota allows; items beyond the daily quota go to deferred
+
+        Once the quota runs out, exhausted is set; producers that do costly
+        work per item (see indexing_tool.filter_changed) should check it and
+        stop feeding items that can only be deferred.
+
+        Args:
+            items: Work units, e.g. URLs or lists of URLs for batch requests
+            deferred: Receives URLs that could not be sent in this quota window
+            size: Quota cost of an item; list items may be split if only
+                  part of them fits in the remaining daily quota
+        """
+        for item in items:
+            cost = size(item)
+            granted = 0 if self.exhausted else self.acquire(cost)
+            if granted == cost:
+                yield item
+                continue
+            self.exhausted = True
+            if isinstance(item, list):
+                if granted:
+                    yield item[:granted]
+                deferred.extend(item[granted:])
+            else:
+                deferred.append(item)
+
+def load_queue(path: str = QUEUE_FILE) -> List[Dict]:
+    """Read deferred {url, action, queued_at} entries"""
+    if not os.path.exists(path):
+        return []
+    with open(path, "r") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def save_queue(entries: List[Dict], path: str = QUEUE_FILE):
+    """Replace the deferred queue with entries (removing it when empty)"""
+    if not entries:
+        if os.path.exists(path):
+            os.remove(path)
+        return
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        for entry in entries:
+            f.write(json.dumps(entry) + "\n")
+    os.replace(tmp_path, path)
+
+class QueueWriter:
+    """
+    List-like sink that writes deferred URLs straight to the queue file
+
+    Pass it as the deferred argument of QuotaScheduler.admit so URLs left
+    over after the daily quota runs out are never held in memory.
+    """
+
+    def __init__(self, action: str, path: str = QUEUE_FILE):
+        self.action = action
+        self.path = path
+        self.count = 0
+        self._file = None
+
+    def append(self, url: str):
+        if self._file is None:
+            self._file = open(self.path, "a")
+        entry = {"url": url, "action": self.action, "queued_at": datetime.now().isoformat()}
+        self._file.write(json.dumps(entry) + "\n")
+        self.count += 1
+
+    def extend(self, urls: Iterable[str]):
+        for url in urls:
+            self.append(url)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+On-disk cache for read-only Google API responses
+Per-endpoint TTLs, ETag revalidation and a size bound with LRU eviction,
+so repeated report runs are served locally and spend no quota
+"""
+
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from ttl_cache import CACHE_DIR
+
+RESPONSE_CACHE = os.path.join(CACHE_DIR, "responses.db")
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+# A hit records its access time only if the last one is older than this,
+# and recorded times are written with the next put (or at close), so hits
+# do not take the database write lock
+TOUCH_INTERVAL = 60
+TOUCH_FLUSH = 256  # Pending access times that force a write
+
+# First matching rule wins; (method, URL path pattern, TTL seconds).
+# Anything unmatched (publish, tokens, URL Inspection, which has its own
+# cache) is never cached.
+RESPONSE_TTLS = [
+    ("GET", re.compile(r"/(webmasters/v3|v1)/sites/?$"), 6 * 3600),
+    ("GET", re.compile(r"/sites/[^/]+/sitemaps/?$"), 3600),
+    ("GET", re.compile(r"/sites/[^/]+/indexCoverage$"), 3600),
+    ("POST", re.compile(r"/sites/[^/]+/searchAnalytics/query$"), 3600),
+]
+
+# Responses worth replaying: successes and definitive "not found" answers
+CACHEABLE_STATUS = {200, 404}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    status INTEGER NOT NULL,
+    etag TEXT,
+    body BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    stored_at REAL NOT NULL,
+    last_access REAL NOT NULL
+) WITHOUT ROWID
+"""
+
+class CachedResponse:
+    """A stored response and when it was last confirmed fresh"""
+
+    def __init__(self, status: int, etag: Optional[str], body: bytes, stored_at: float):
+        self.status = status
+        self.etag = etag
+        self.body = body
+        self.stored_at = stored_at
+
+    def is_fresh(self, ttl: float) -> bool:
+        return time.time() - self.stored_at < ttl
+
+class ResponseCache:
+    """
+    SQLite store of API responses keyed by account, method, URL and request body
+
+    account identifies the credentials the calls are made with (e.g. a
+    token_cache.fingerprint of them), so two accounts sharing a HOME never
+    see each other's results. Without one, a hash of the bearer token is
+    used: still separate, but shared only for one token's lifetime.
+
+    Entries past their TTL are kept for ETag revalidation; when the total
+    body size exceeds max_bytes the least recently used entries are evicted.
+    Safe to share between threads.
+    """
+
+    def __init__(self, path: str = RESPONSE_CACHE, max_bytes: int = DEFAULT_MAX_BYTES,
+                 account: Optional[str] = None):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.max_bytes = max_bytes
+        self.account = account
+        self.stats = {"hits": 0, "misses": 0, "revalidated": 0}
+        self._accessed: Dict[str, float] = {}  # key -> last access not yet written
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(SCHEMA)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS responses_lru ON responses (last_access)")
+        self.conn.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @staticmethod
+    def ttl_for(method: str, url: str) -> Optional[float]:
+        """TTL of the first rule matching this call, or None if it is not cacheable"""
+        path = url.split("?", 1)[0]
+        for rule_method, pattern, ttl in RESPONSE_TTLS:
+            if method == rule_method and pattern.search(path):
+                return ttl
+        return None
+
+    def key(self, method: str, url: str, body: Optional[bytes], token: Optional[str] = None) -> str:
+        account = self.account
+        if account is None:
+            account = hashlib.sha256(token.encode()).hexdigest()[:16] if token else ""
+        digest = hashlib.sha256(body or b"").hexdigest()
+        return f"{account} {method} {url} {digest}"
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT status, etag, body, stored_at, last_access FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            now = time.time()
+            if now - max(row[4], self._accessed.get(key, 0)) >= TOUCH_INTERVAL:
+                self._accessed[key] = now
+                if len(self._accessed) >= TOUCH_FLUSH:
+                    self._flush_accessed()
+                    self.conn.commit()
+        return CachedResponse(*row[:4])
+
+    def _flush_accessed(self):
+        """Write pending access times (caller holds the lock and commits)"""
+        if self._accessed:
+            self.conn.executemany("UPDATE responses SET last_access = MAX(last_access, ?) WHERE key = ?",
+                                  [(at, key) for key, at in self._accessed.items()])
+            self._accessed = {}
+
+    def put(self, key: str, status: int, etag: Optional[str], body: bytes):
+        """Store a response, then evict least recently used entries over max_bytes"""
+        now = time.time()
+        with self._lock:
+            self._flush_accessed()  # So eviction sees recent hits
+            self.conn.execute(
+                "INSERT OR REPLACE INTO responses (key, status, etag, body, size, stored_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, status, etag, body, len(body), now, now)
+            )
+            total = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+            if total > self.max_bytes:
+                excess = total - self.max_bytes
+                for old_key, size in self.conn.execute(
+                        "SELECT key, size FROM responses ORDER BY last_access").fetchall():
+                    if excess <= 0:
+                        break
+                    self.conn.execute("DELETE FROM responses WHERE key = ?", (old_key,))
+                    excess -= size
+            self.conn.commit()
+
+    def touch(self, key: str):
+        """Mark an entry fresh again after a 304 Not Modified"""
+        now = time.time()
+        with self._lock:
+            self.conn.execute("UPDATE responses SET stored_at = ?, last_access = ? WHERE key = ?",
+                              (now, now, key))
+            self.conn.commit()
+
+    def lookup(self, method: str, url: str, body: Optional[bytes],
+               token: Optional[str] = None) -> Tuple[Optional[str], Optional[CachedResponse], bool]:
+        """
+        Check the cache before a call
+
+        Returns:
+            (key or None if uncacheable, stored entry or None, whether the
+             entry is fresh enough to use without asking the server)
+        """
+        ttl = self.ttl_for(method, url)
+        if ttl is None:
+            return None, None, False
+        key = self.key(method, url, body, token)
+        entry = self.get(key)
+        fresh = entry is not None and entry.is_fresh(ttl)
+        if fresh:
+            self.count("hits")
+        return key, entry, fresh
+
+    def count(self, stat: str):
+        with self._lock:
+            self.stats[stat] += 1
+
+    def summary(self) -> Dict[str, int]:
+        with self._lock:
+            entries, size = self.conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+        return dict(self.stats, entries=entries, bytes=size)
+
+    def close(self):
+        with self._lock:
+            self._flush_accessed()
+            self.conn.commit()
+            self.conn.close()
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Shared retry policy for Google API calls
+Exponential backoff with full jitter, Retry-After support and a circuit
+breaker that pauses every worker after repeated server errors
+"""
+
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, TypeVar
+
+T = TypeVar("T")
+
+# Statuses worth retrying; None stands for a transport error (no HTTP response)
+RETRYABLE_STATUS = {None, 408, 429, 500, 502, 503, 504}
+
+DEFAULT_MAX_RETRIES = 5
+DEFAULT_BASE_DELAY = 1.0
+DEFAULT_MAX_DELAY = 64.0
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP-date)"""
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+def is_server_failure(status: Optional[int]) -> bool:
+    """5xx or no response at all: the kind of failure that signals an outage"""
+    return status is None or status >= 500
+
+class CircuitBreaker:
+    """
+    Pauses all callers after threshold consecutive server failures
+
+    While open, before_call() blocks every worker until the cooldown
+    passes, so a short outage costs one cooldown instead of every queued
+    call failing and being retried independently.
+    """
+
+    def __init__(self, threshold: int = 5, cooldown: float = 60.0):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.open_until = 0.0
+        self.trips = 0
+        self._failures = 0
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        """Block while the breaker is open"""
+        while True:
+            with self._lock:
+                wait = self.open_until - time.time()
+            if wait <= 0:
+                return
+            time.sleep(wait)
+
+    def record(self, status: Optional[int]):
+        """Count a call outcome; opens the breaker on repeated server failures"""
+        with self._lock:
+            if not is_server_failure(status):
+                self._failures = 0
+                return
+            self._failures += 1
+            if self._failures >= self.threshold and time.time() >= self.open_until:
+                self.open_until = time.time() + self.cooldown
+                self.trips += 1
+                self._failures = 0
+                print(f"  ⚠️  {self.threshold} consecutive server errors; "
+                      f"pausing all requests for {self.cooldown:.0f}s")
+
+class RetryPolicy:
+    """
+    Decides whether and how long to wait before retrying a call
+
+    Delays are drawn uniformly from [0, min(max_delay, base_delay * 2^n)]
+    ("full jitter") so parallel workers do not retry in lockstep. A
+    Retry-After value from the server is used as a lower bound.
+    """
+
+    def __init__(self, max_retries: int = DEFAULT_MAX_RETRIES,
+                 base_delay: float = DEFAULT_BASE_DELAY,
+                 max_delay: float = DEFAULT_MAX_DELAY,
+                 breaker: Optional[CircuitBreaker] = None):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.breaker = breaker if breaker is not None else CircuitBreaker()
+
+    def should_retry(self, status: Optional[int]) -> bool:
+        return status in RETRYABLE_STATUS
+
+    def backoff(self, retry: int, retry_after: Optional[float] = None) -> float:
+        """Delay before retry number retry (0-based)"""
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** retry))
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.max_delay))
+        return delay
+
+    def call(self, attempt: Callable[[], T],
+             classify: Callable[[T], Tuple[Optional[int], Optional[float]]]) -> Tuple[T, Dict]:
+        """
+        Run attempt until it succeeds, fails permanently or retries run out
+
+        Args:
+            attempt: Makes one call and returns its result
+            classify: Maps a result to (status_code, retry_after_seconds);
+                      status_code is None for transport errors
+
+        Returns:
+            (last result, {"retries": n, "retry_delays": [seconds, ...]})
+        """
+        delays = []
+        while True:
+            self.breaker.before_call()
+            result = attempt()
+            status, retry_after = classify(result)
+            self.breaker.record(status)
+            if not self.should_retry(status) or len(delays) >= self.max_retries:
+                return result, {"retries": len(delays), "retry_delays": delays}
+            delay = self.backoff(len(delays), retry_after)
+            delays.append(round(delay, 3))
+            time.sleep(delay)
+
+    def call_many(self, items: Sequence, attempt: Callable[[Sequence], List[T]],
+                  classify: Callable[[T], Tuple[Optional[int], Optional[float]]]) -> List[Tuple[T, Dict]]:
+        """
+        Like call, for a multi-item request such as a batch envelope
+
+        Only the items whose individual results are retryable are sent
+        again. attempt receives the subset of items to send and returns
+        one result per item in the same order.
+
+        Returns:
+            (result, retry info) for every item, in input order
+        """
+        outcomes: List[Optional[Tuple[T, Dict]]] = [None] * len(items)
+        pending = list(range(len(items)))
+        delays: List[float] = []
+        while pending:
+            self.breaker.before_call()
+            results = attempt([items[i] for i in pending])
+            classified = [classify(result) for result in results]
+            statuses = [status for status, _ in classified]
+            # One envelope is one call as far as the breaker is concerned
+            self.breaker.record(None if statuses and all(map(is_server_failure, statuses))
+                                else 200)
+
+            retry = []
+            retry_after = None
+            for i, result, (status, after) in zip(pending, results, classified):
+                if self.should_retry(status) and len(delays) < self.max_retries:
+                    retry.append(i)
+                    if after is not None:
+                        retry_after = max(retry_after or 0.0, after)
+                else:
+                    outcomes[i] = (result, {"retries": len(delays), "retry_delays": list(delays)})
+            if retry:
+                delay = self.backoff(len(delays), retry_after)
+                delays.append(round(delay, 3))
+                time.sleep(delay)
+            pending = retry
+        return outcomes
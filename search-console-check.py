@@ -3,60 +3,80 @@
 Check all Google Search Console sites using the newer API
 """
 
+import atexit
+import csv
+import heapq
 import json
-import subprocess
 import sys
 import os
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from urllib.parse import quote
 from datetime import datetime, timedelta
 
+from analytics_store import (DEFAULT_DAY_PARALLEL, DEFAULT_REFETCH_DAYS, STORE_DIR,
+                             iter_stores, sync_site)
+from api_client import call_api, set_response_cache
+from metrics import export_on_exit
+from response_cache import ResponseCache
+from search_analytics import (DEFAULT_PAGE_PARALLEL, AnalyticsExportError,
+                              iter_analytics_rows, write_rows)
+from snapshot_report import SNAPSHOT_ROW_LIMIT, snapshot_path
+from token_cache import RUN_LIFETIME, TokenCache, TokenRefreshError, cache_path, fingerprint
+from url_inspection import inspect_url
+
+DEFAULT_PARALLEL = 8  # Concurrent API requests across all sites
+PROJECT_HEADERS = {'x-goog-user-project': 'titanium-vision-455301-c4'}
+ANALYTICS_DIMENSIONS = ["query", "page"]  # Dimensions of the per-site summary query
+ADC_PATH = os.path.expanduser('~/.config/gcloud/application_default_credentials.json')
+
 def get_access_token():
     """Get access token from ADC"""
-    # Read ADC file
-    adc_path = os.path.expanduser('~/.config/gcloud/application_default_credentials.json')
-    
     try:
-        with open(adc_path, 'r') as f:
+        # Read ADC file
+        with open(ADC_PATH, 'r') as f:
             creds = json.load(f)
         
-        # Get fresh token
-        result = subprocess.run([
-            'curl', '-s', '-X', 'POST',
-            'https://oauth2.googleapis.com/token',
-            '-d', f"client_id={creds['client_id']}",
-            '-d', f"client_secret={creds['client_secret']}",  
-            '-d', f"refresh_token={creds['refresh_token']}",
-            '-d', 'grant_type=refresh_token'
-        ], capture_output=True, text=True)
-        
-        token_data = json.loads(result.stdout)
+        # Reuse the cached token until it is about to expire
+        def refresh(_cached):
+            return call_api('POST', 'https://oauth2.googleapis.com/token', form={
+                'client_id': creds['client_id'],
+                'client_secret': creds['client_secret'],
+                'refresh_token': creds['refresh_token'],
+                'grant_type': 'refresh_token'
+            })
         
-        if 'access_token' in token_data:
-            return token_data['access_token']
-        else:
-            print(f"Error in token response: {token_data}")
-            sys.exit(1)
+        cache = TokenCache(cache_path('adc_default'))
+        # Fetched once per run, so it must outlast a long export or sync
+        return cache.get_token(refresh, source=fingerprint(creds['client_id'], creds['refresh_token']),
+                               min_lifetime=RUN_LIFETIME)
             
+    except TokenRefreshError as e:
+        print(f"Error in token response: {e}")
+        sys.exit(1)
     except Exception as e:
         print(f"Error getting token: {e}")
         sys.exit(1)
 
-def make_api_call(url, token, method='GET', data=None):
-    """Make API call using curl"""
-    cmd = ['curl', '-s', '-X', method, url]
-    cmd.extend(['-H', f'Authorization: Bearer {token}'])
-    cmd.extend(['-H', 'x-goog-user-project: titanium-vision-455301-c4'])
-    
-    if data:
-        cmd.extend(['-H', 'Content-Type: application/json'])
-        cmd.extend(['-d', json.dumps(data)])
-    
-    result = subprocess.run(cmd, capture_output=True, text=True)
-    
+def credentials_fingerprint():
+    """Fingerprint of the ADC credentials, keying cached responses per account (None if unreadable)"""
     try:
-        return json.loads(result.stdout)
-    except:
-        return {"error": result.stdout}
+        with open(ADC_PATH, 'r') as f:
+            creds = json.load(f)
+        return fingerprint(creds['client_id'], creds['refresh_token'])
+    except (OSError, ValueError, KeyError):
+        return None
+
+def make_api_call(url, token, method='GET', data=None):
+    """Make API call through the shared pooled HTTP client"""
+    return call_api(
+        method,
+        url,
+        token=token,
+        json_body=data,
+        headers=PROJECT_HEADERS
+    )
 
 def list_sites(token):
     """List all verified sites"""
@@ -86,16 +106,7 @@ def check_indexing_coverage(token, site_url):
 
 def check_url_inspection(token, site_url, page_url):
     """Inspect a specific URL"""
-    encoded_site = quote(site_url, safe='')
-    
-    url = f"https://searchconsole.googleapis.com/v1/sites/{encoded_site}/urlInspection"
-    data = {
-        "inspectionUrl": page_url,
-        "siteUrl": site_url
-    }
-    
-    response = make_api_call(url, token, 'POST', data)
-    return response
+    return inspect_url(token, site_url, page_url, PROJECT_HEADERS)
 
 def check_search_analytics(token, site_url):
     """Get search analytics for the site"""
@@ -109,15 +120,566 @@ def check_search_analytics(token, site_url):
     data = {
         "startDate": start_date,
         "endDate": end_date,
-        "dimensions": ["query", "page"],
-        "rowLimit": 10,
+        "dimensions": ANALYTICS_DIMENSIONS,
+        "rowLimit": SNAPSHOT_ROW_LIMIT,
         "startRow": 0
     }
     
     response = make_api_call(url, token, 'POST', data)
     return response
 
+def site_data_filename(site_url):
+    """Per-site output file for main()"""
+    return f"site_data_{site_url.replace('://', '_').replace('/', '_')}.json"
+
+def print_site_report(site, analytics, coverage):
+    """Print one site's analytics and coverage summary"""
+    site_url = site['siteUrl']
+    permission = site.get('permissionLevel', 'unknown')
+    
+    print(f"Site: {site_url}")
+    print(f"Permission: {permission}")
+    print("-" * 50)
+    
+    if 'rows' in analytics and analytics['rows']:
+        total_clicks = sum(row.get('clicks', 0) for row in analytics['rows'])
+        total_impressions = sum(row.get('impressions', 0) for row in analytics['rows'])
+        print(f"Last 7 days: {total_clicks} clicks, {total_impressions} impressions")
+        
+        # Show top queries; keys follow ANALYTICS_DIMENSIONS
+        query_index = ANALYTICS_DIMENSIONS.index('query')
+        queries = {}
+        for row in analytics['rows']:
+            query = row['keys'][query_index]
+            queries[query] = queries.get(query, 0) + row.get('clicks', 0)
+        
+        if queries:
+            print("\nTop search queries:")
+            for query, clicks in heapq.nlargest(5, queries.items(), key=lambda x: x[1]):
+                print(f"  - {query}: {clicks} clicks")
+    else:
+        print("No search data available")
+    
+    print("\nIndexing status:")
+    if 'error' not in coverage:
+        print(json.dumps(coverage, indent=2))
+    else:
+        print("Indexing coverage data not available")
+    
+    print("\n" + "=" * 50 + "\n")
+
+def fetch_all_sites(token, sites, parallel=DEFAULT_PARALLEL):
+    """
+    Fetch analytics and coverage for every site concurrently
+    
+    All requests share one pool of at most parallel workers. Each site's
+    report is printed as soon as both of its requests finish, so output
+    follows completion order.
+    
+    Returns:
+        {site_url: {'analytics': ..., 'coverage': ...}}
+    """
+    checks = {
+        'analytics': check_search_analytics,
+        'coverage': check_indexing_coverage,
+    }
+    results = {site['siteUrl']: {} for site in sites}
+    by_url = {site['siteUrl']: site for site in sites}
+    
+    with ThreadPoolExecutor(max_workers=parallel) as executor:
+        futures = {
+            executor.submit(check, token, site_url): (site_url, name)
+            for site_url in results
+            for name, check in checks.items()
+        }
+        for future in as_completed(futures):
+            site_url, name = futures[future]
+            results[site_url][name] = future.result()
+            if len(results[site_url]) == len(checks):
+                print_site_report(by_url[site_url], results[site_url]['analytics'],
+                                  results[site_url]['coverage'])
+    
+    return results
+
+def write_site_data(sites, results, timestamp):
+    """Write one site_data_*.json per site, in siteEntry order, archiving a copy under snapshots/"""
+    for site in sites:
+        result = results[site['siteUrl']]
+        filename = site_data_filename(site['siteUrl'])
+        tmp_filename = filename + '.tmp'
+        with open(tmp_filename, 'w') as f:
+            json.dump({
+                'site': site,
+                'dimensions': ANALYTICS_DIMENSIONS,
+                'row_limit': SNAPSHOT_ROW_LIMIT,
+                'analytics': result['analytics'],
+                'coverage': result['coverage'],
+                'timestamp': timestamp
+            }, f, indent=2)
+        archive = snapshot_path(site['siteUrl'], timestamp)
+        os.makedirs(os.path.dirname(archive), exist_ok=True)
+        base, suffix = archive[:-len('.json')], 1
+        while os.path.exists(archive):  # Never overwrite an earlier snapshot; '_N' sorts after it
+            archive = f"{base}_{suffix}.json"
+            suffix += 1
+        shutil.copyfile(tmp_filename, archive)
+        os.replace(tmp_filename, filename)
+
+def export_analytics(token, args):
+    """Export every search analytics row for one site to CSV or JSONL"""
+    if not args or args[0].startswith('--'):
+        print("Usage: python3 search-console-check.py export <site_url> [--start YYYY-MM-DD] [--end YYYY-MM-DD]")
+        print("           [--dimensions query,page] [--type web] [--parallel N] [--output file.jsonl|file.csv]")
+        sys.exit(1)
+    
+    def option(name, default):
+        return args[args.index(name) + 1] if name in args else default
+    
+    site_url = args[0]
+    end_date = option('--end', datetime.now().strftime('%Y-%m-%d'))
+    start_date = option('--start', (datetime.now() - timedelta(days=28)).strftime('%Y-%m-%d'))
+    dimensions = option('--dimensions', 'query,page').split(',')
+    search_type = option('--type', 'web')
+    parallel = max(1, int(option('--parallel', DEFAULT_PAGE_PARALLEL)))
+    safe_site = site_url.replace('://', '_').replace('/', '_').replace(':', '_')
+    output = option('--output', f"analytics_{safe_site}_{start_date}_{end_date}.jsonl")
+    
+    print(f"Exporting {search_type} search analytics for {site_url}")
+    print(f"Dates: {start_date} to {end_date}, dimensions: {', '.join(dimensions)}")
+    
+    rows = iter_analytics_rows(token, site_url, start_date, end_date, dimensions,
+                               parallel=parallel, search_type=search_type,
+                               headers=PROJECT_HEADERS)
+    try:
+        count = write_rows(rows, output, dimensions)
+    except AnalyticsExportError as e:
+        print(f"Export failed: {e}")
+        sys.exit(1)
+    
+    print(f"✓ Exported {count} rows to {output}")
+
+def sync_analytics(token, args):
+    """Incrementally sync per-day analytics partitions for the given (or all) sites"""
+    def option(name, default):
+        if name in args:
+            i = args.index(name)
+            value = args[i + 1]
+            del args[i:i + 2]
+            return value
+        return default
+    
+    dimensions = option('--dimensions', 'query,page').split(',')
+    backfill = option('--backfill', None)
+    refetch_days = int(option('--refetch-days', DEFAULT_REFETCH_DAYS))
+    parallel = max(1, int(option('--parallel', DEFAULT_DAY_PARALLEL)))
+    store_dir = option('--store', STORE_DIR)
+    
+    site_urls = args
+    if not site_urls:
+        sites_response = list_sites(token)
+        site_urls = [site['siteUrl'] for site in sites_response.get('siteEntry', [])]
+        if not site_urls:
+            print("No sites found or unable to access Search Console")
+            sys.exit(1)
+    
+    print(f"Syncing {', '.join(dimensions)} analytics for {len(site_urls)} sites into {store_dir}/\n")
+    failed = 0
+    for site_url in site_urls:
+        summary = sync_site(token, site_url, dimensions, store_dir,
+                            backfill_days=int(backfill) if backfill else None,
+                            refetch_days=refetch_days, parallel=parallel,
+                            headers=PROJECT_HEADERS)
+        print(f"Site: {site_url}")
+        if summary['fetched']:
+            print(f"  Fetched {len(summary['fetched'])} days ({summary['rows']} rows): "
+                  f"{summary['fetched'][0]} to {summary['fetched'][-1]}")
+        print(f"  Unchanged days skipped: {summary['unchanged']}")
+        for day, error in summary['failed'].items():
+            print(f"  ❌ {day}: {error}")
+        failed += len(summary['failed'])
+        if 'high_water' in summary:
+            totals = summary['last_7_days']
+            print(f"  Stored through: {summary['high_water']}")
+            print(f"  Last 7 days: {totals['clicks']} clicks, {totals['impressions']} impressions")
+        print()
+    
+    if failed:
+        sys.exit(1)
+
+def compact_analytics(args):
+    """Build or update the columnar table for every synced store"""
+    from columnar_store import TABLE_FILE, build_table
+    
+    store_dir = args[args.index('--store') + 1] if '--store' in args else STORE_DIR
+    rebuild = '--rebuild' in args
+    
+    stores = list(iter_stores(store_dir))
+    if not stores:
+        print(f"No synced analytics in {store_dir}/ (run: python3 search-console-check.py sync)")
+        sys.exit(1)
+    
+    for store in stores:
+        table, info = build_table(store, rebuild=rebuild)
+        partitions = sum(os.path.getsize(store.partition_path(day)) for day in store.days)
+        table_size = os.path.getsize(os.path.join(store.path, TABLE_FILE))
+        totals = table.totals()
+        
+        print(f"Site: {store.site_url} ({'+'.join(store.dimensions)})")
+        print(f"  {info['rows']} rows over {len(store.days)} days "
+              f"(+{info['days_added']} / -{info['days_dropped']} days in {info['seconds']:.2f}s)")
+        print(f"  Table: {table_size / 1e6:.1f} MB on disk, {table.nbytes / 1e6:.1f} MB in memory "
+              f"(partitions: {partitions / 1e6:.1f} MB)")
+        print(f"  Totals: {totals['clicks']} clicks, {totals['impressions']} impressions, "
+              f"CTR {totals['ctr']:.2%}, avg position {totals['position']:.1f}")
+        print()
+
+def build_report(args):
+    """Render the portfolio report with week-over-week trends from every stored snapshot"""
+    from snapshot_report import (SNAPSHOT_DIR, SUMMARY_INDEX, find_snapshots, load_summaries,
+                                 render_html, render_markdown, site_trends)
+    
+    def option(name, default):
+        return args[args.index(name) + 1] if name in args else default
+    
+    output_format = option('--format', 'md')
+    if output_format not in ('md', 'html'):
+        print("Usage: python3 search-console-check.py report [--format md|html] [--output FILE] [--jobs N] [--dir DIR]")
+        sys.exit(1)
+    jobs = int(option('--jobs', 0)) or None
+    output = option('--output', f"portfolio_report_{datetime.now().strftime('%Y%m%d')}.{output_format}")
+    
+    start = time.perf_counter()
+    directory = option('--dir', '.')
+    paths = find_snapshots(directory)
+    if not paths:
+        print("No site snapshots found (run: python3 search-console-check.py)")
+        sys.exit(1)
+    index_path = None
+    if os.path.isdir(os.path.join(directory, SNAPSHOT_DIR)):
+        index_path = os.path.join(directory, SNAPSHOT_DIR, SUMMARY_INDEX)
+    trends = site_trends(load_summaries(paths, jobs, index_path))
+    content = render_html(trends) if output_format == 'html' else render_markdown(trends)
+    
+    tmp_output = output + '.tmp'
+    with open(tmp_output, 'w') as f:
+        f.write(content)
+    os.replace(tmp_output, output)
+    print(f"Report for {len(trends)} sites from {len(paths)} snapshot files "
+          f"written to {output} in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+def diff_site(args):
+    """Show what changed between two snapshots of a site and list pages to resubmit"""
+    from snapshot_diff import (DEFAULT_IMPRESSION_THRESHOLD, DEFAULT_POSITION_THRESHOLD,
+                               diff_snapshots, resubmit_urls, site_snapshots)
+    
+    if not args or args[0].startswith('--'):
+        print("Usage: python3 search-console-check.py diff <site_url> [--from SNAPSHOT] [--to SNAPSHOT]")
+        print("           [--position N] [--impressions FRACTION] [--top N] [--resubmit urls.txt] [--json FILE]")
+        print("SNAPSHOT is a snapshot or export file; the default compares the site's last two snapshots,")
+        print("which hold only the top rows; compare two exports for a full diff")
+        sys.exit(1)
+    
+    def option(name, default):
+        return args[args.index(name) + 1] if name in args else default
+    
+    site_url = args[0]
+    snapshots = site_snapshots(site_url)
+    old_path = option('--from', snapshots[-2] if len(snapshots) >= 2 else None)
+    new_path = option('--to', snapshots[-1] if snapshots else None)
+    if not old_path or not new_path:
+        print(f"Need two snapshots of {site_url}; found {len(snapshots)} (run: python3 search-console-check.py)")
+        sys.exit(1)
+    top = int(option('--top', 10))
+    
+    start = time.perf_counter()
+    diff = diff_snapshots(old_path, new_path,
+                          float(option('--position', DEFAULT_POSITION_THRESHOLD)),
+                          float(option('--impressions', DEFAULT_IMPRESSION_THRESHOLD)))
+    elapsed = time.perf_counter() - start
+    
+    print(f"Site: {site_url}")
+    print(f"From: {old_path}\nTo:   {new_path}")
+    print(f"Compared {diff['row_counts'][0]} -> {diff['row_counts'][1]} rows, "
+          f"{diff['page_counts'][0]} -> {diff['page_counts'][1]} pages in {elapsed * 1000:.0f} ms\n")
+    
+    limit = max(filter(None, diff['truncated_at']), default=None)
+    if limit:
+        print(f"Snapshots hold only their top {limit} rows: entries outside them are reported as "
+              f"entering or leaving the top {limit}, not as appearing or dropping\n")
+    for level in ('pages', 'rows'):
+        changes = diff[level]
+        summary = (f"{level.capitalize()}: {len(changes['appeared'])} appeared, "
+                   f"{len(changes['disappeared'])} disappeared, {len(changes['moved'])} moved")
+        if limit:
+            summary += (f", {len(changes['entered_top'])} entered and "
+                        f"{len(changes['left_top'])} left the top {limit}")
+        print(summary)
+    
+    def describe(record):
+        old, new = record['old'], record['new']
+        key = record['key']
+        if old and new:
+            position = (f", position {old['position']:.1f} -> {new['position']:.1f}"
+                        if old['position'] is not None and new['position'] is not None else "")
+            return f"{key}: {old['impressions']:.0f} -> {new['impressions']:.0f} impressions{position}"
+        side = new or old
+        return f"{key}: {side['impressions']:.0f} impressions, {side['clicks']:.0f} clicks"
+    
+    pages = diff['pages']
+    for title, records in (("Newly visible pages", pages['appeared']),
+                           ("Dropped pages", pages['disappeared']),
+                           ("Pages moved down", [r for r in pages['moved'] if r['direction'] == 'down']),
+                           ("Pages moved up", [r for r in pages['moved'] if r['direction'] == 'up']),
+                           (f"Pages that entered the top {limit}", pages['entered_top']),
+                           (f"Pages that left the top {limit} (not resubmitted)", pages['left_top'])):
+        if records:
+            print(f"\n{title}:")
+            for record in records[:top]:
+                print(f"  - {describe(record)}")
+            if len(records) > top:
+                print(f"  ... and {len(records) - top} more")
+    
+    urls = resubmit_urls(diff)
+    output = option('--resubmit', None)
+    if output:
+        with open(output, 'w') as f:
+            f.writelines(url + '\n' for url in urls)
+        print(f"\n{len(urls)} URLs to resubmit written to {output}")
+        print(f"  Submit with: python3 indexing_tool.py batch {output}")
+    elif urls:
+        print(f"\n{len(urls)} URLs could be resubmitted (--resubmit urls.txt to save them)")
+    
+    if '--json' in args:
+        with open(option('--json', None), 'w') as f:
+            json.dump(diff, f, indent=2)
+
+def query_analytics(args):
+    """Answer a group-by/top-k question from synced analytics, without API calls"""
+    from analytics_query import Filter, QueryError, run_query
+    from columnar_store import build_table
+    
+    def usage():
+        print("Usage: python3 search-console-check.py query [--group-by query,page] [--filter 'country=usa']")
+        print("           [--from YYYY-MM-DD] [--to YYYY-MM-DD] [--sort clicks] [--asc|--desc] [--top N]")
+        print("           [--site SITE] [--store DIR] [--format table|csv|json]")
+        sys.exit(1)
+    
+    filters = []
+    options = {}
+    flags = set()
+    i = 0
+    while i < len(args):
+        if args[i] == '--filter':
+            filters.append(args[i + 1])
+            i += 2
+        elif args[i] in ('--asc', '--desc'):
+            flags.add(args[i])
+            i += 1
+        elif args[i].startswith('--') and i + 1 < len(args):
+            options[args[i]] = args[i + 1]
+            i += 2
+        else:
+            print(f"Unexpected argument: {args[i]}")
+            usage()
+    
+    try:
+        top = int(options.get('--top', 10))
+    except ValueError:
+        print(f"--top must be a whole number, not {options['--top']!r}")
+        usage()
+    group = [d for d in options.get('--group-by', 'query').split(',') if d]
+    site_filter = options.get('--site')
+    store_dir = options.get('--store', STORE_DIR)
+    output_format = options.get('--format', 'table')
+    ascending = True if '--asc' in flags else False if '--desc' in flags else None
+    
+    try:
+        conditions = [Filter.parse(text) for text in filters]
+        needed = set(group) | {c.dimension for c in conditions}
+        needed.discard('date')  # Every store is partitioned by date
+        
+        # Per site, use the smallest synced dimension set that covers the query
+        by_site = {}
+        for store in iter_stores(store_dir):
+            if site_filter and site_filter not in store.site_url:
+                continue
+            if not needed <= set(store.dimensions):
+                continue
+            best = by_site.get(store.site_url)
+            if best is None or len(store.dimensions) < len(best.dimensions):
+                by_site[store.site_url] = store
+        
+        if not by_site:
+            print(f"No synced analytics in {store_dir}/ cover: {', '.join(sorted(needed)) or 'any dimension'}")
+            print(f"Run: python3 search-console-check.py sync --dimensions {','.join(sorted(needed)) or 'query'}")
+            sys.exit(1)
+        
+        results = {}
+        for site_url, store in sorted(by_site.items()):
+            table, _ = build_table(store)
+            results[site_url] = run_query(
+                table, group, conditions,
+                start=options.get('--from'), end=options.get('--to'),
+                limit=top,
+                sort=options.get('--sort', 'clicks'), ascending=ascending
+            )
+    except QueryError as e:
+        print(f"Query error: {e}")
+        sys.exit(1)
+    
+    columns = group + ['clicks', 'impressions', 'ctr', 'position']
+    if output_format == 'json':
+        print(json.dumps(results, indent=2))
+    elif output_format == 'csv':
+        writer = csv.writer(sys.stdout)
+        writer.writerow(['site'] + columns)
+        for site_url, rows in results.items():
+            for row in rows:
+                writer.writerow([site_url] + [row[c] for c in columns])
+    else:
+        for site_url, rows in results.items():
+            print(f"Site: {site_url}")
+            print("  " + "  ".join(f"{c:<40}" if c in group else f"{c:>11}" for c in columns))
+            for row in rows:
+                cells = [f"{row[d][:40]:<40}" for d in group]
+                cells.append(f"{row['clicks']:>11}")
+                cells.append(f"{row['impressions']:>11}")
+                cells.append(f"{row['ctr']:>11.2%}")
+                cells.append(f"{row['position']:>11.1f}")
+                print("  " + "  ".join(cells))
+            if not rows:
+                print("  No matching rows")
+            print()
+
+def inspect_site(token, args):
+    """Inspect every sitemap URL of a site and summarize index coverage"""
+    from rate_limiter import next_quota_reset
+    from sitemap_reader import SitemapError, iter_sitemap_urls
+    from ttl_cache import TTLCache
+    from url_inspection import (DEFAULT_INSPECT_CONCURRENCY, INSPECTION_CACHE, INSPECTION_TTL,
+                                CoverageSummary, coverage_state, default_sitemaps,
+                                inspect_urls, inspection_scheduler, is_indexed)
+    
+    if not args or args[0].startswith('--'):
+        print("Usage: python3 search-console-check.py inspect <site_url> [--sitemap PATH_OR_URL ...]")
+        print("           [--concurrency N] [--ttl HOURS] [--refresh] [--per-minute N] [--per-day N]")
+        print("           [--no-quota] [--output file.jsonl]")
+        sys.exit(1)
+    
+    site_url = args[0]
+    sitemaps = [args[i + 1] for i, arg in enumerate(args) if arg == '--sitemap']
+    
+    def option(name, default):
+        return args[args.index(name) + 1] if name in args else default
+    
+    concurrency = max(1, int(option('--concurrency', DEFAULT_INSPECT_CONCURRENCY)))
+    ttl = 0 if '--refresh' in args else float(option('--ttl', INSPECTION_TTL / 3600)) * 3600
+    per_minute = option('--per-minute', None)
+    per_day = option('--per-day', None)
+    safe_site = site_url.replace('://', '_').replace('/', '_').replace(':', '_')
+    output = option('--output', f"inspection_{safe_site}.jsonl")
+    
+    limiter = None
+    if '--no-quota' not in args:
+        limiter = inspection_scheduler(site_url, int(per_minute) if per_minute else None,
+                                       int(per_day) if per_day else None)
+    
+    if not sitemaps:
+        sitemaps = default_sitemaps(token, site_url, PROJECT_HEADERS)
+    print(f"Inspecting URLs of {site_url}")
+    print(f"Sitemaps: {', '.join(sitemaps)}\n")
+    
+    def sitemap_urls():
+        for sitemap in sitemaps:
+            try:
+                yield from iter_sitemap_urls(sitemap)
+            except SitemapError as e:
+                print(f"  ⚠️  Skipping sitemap {e}")
+    
+    summary = CoverageSummary()
+    deferred = []
+    with TTLCache(INSPECTION_CACHE, INSPECTION_TTL) as cache, open(output, 'w') as out:
+        records = inspect_urls(token, site_url, sitemap_urls(), concurrency, limiter,
+                               cache, ttl, deferred, PROJECT_HEADERS)
+        for record in records:
+            summary.add(record)
+            status = record['result'].get('inspectionResult', {}).get('indexStatusResult', {})
+            state = coverage_state(record['result'])
+            mark = "✓" if is_indexed(record['result']) else "✗"
+            print(f"  {mark} {record['url']}: {state}{' (cached)' if record['cached'] else ''}")
+            out.write(json.dumps({
+                'url': record['url'],
+                'verdict': status.get('verdict'),
+                'coverageState': state,
+                'lastCrawlTime': status.get('lastCrawlTime'),
+                'robotsTxtState': status.get('robotsTxtState'),
+                'cached': record['cached'],
+                'inspected_at': record['inspected_at']
+            }) + "\n")
+    
+    print(f"\nCoverage summary: {summary.total} URLs ({summary.cached} from cache)")
+    print("-" * 50)
+    for state, count in summary.states.most_common():
+        print(f"  {state:<40} {count:>6}  {count / summary.total:6.1%}")
+    if summary.total:
+        print(f"\nIndexed: {summary.indexed}/{summary.total} ({summary.indexed / summary.total:.1%})")
+    if deferred:
+        print(f"\nDaily inspection quota used up: {len(deferred)} URLs not inspected")
+        print(f"Run again after {next_quota_reset():%Y-%m-%d %H:%M %Z}; cached results will be reused")
+    print(f"Results saved to: {output}")
+
 def main():
+    args = sys.argv[1:]
+    
+    no_cache = '--no-cache' in args
+    if no_cache:
+        args.remove('--no-cache')
+    
+    # Per-endpoint latency and error metrics are written at exit; --metrics also prints them
+    print_metrics = '--metrics' in args
+    if print_metrics:
+        args.remove('--metrics')
+    export_on_exit("search_console_check", print_report=print_metrics)
+    
+    # Offline commands read local files only
+    if args and args[0] == 'compact':
+        compact_analytics(args[1:])
+        return
+    if args and args[0] == 'diff':
+        diff_site(args[1:])
+        return
+    if args and args[0] == 'report':
+        build_report(args[1:])
+        return
+    if args and args[0] == 'query':
+        query_analytics(args[1:])
+        return
+    
+    # Read calls are served from the on-disk response cache unless --no-cache;
+    # closing it writes the access times that cache hits defer
+    cache = None
+    if not no_cache:
+        cache = ResponseCache(account=credentials_fingerprint())
+        atexit.register(cache.close)
+    set_response_cache(cache)
+    
+    if args and args[0] == 'export':
+        token = get_access_token()
+        export_analytics(token, args[1:])
+        return
+    if args and args[0] == 'sync':
+        token = get_access_token()
+        sync_analytics(token, args[1:])
+        return
+    if args and args[0] == 'inspect':
+        token = get_access_token()
+        inspect_site(token, args[1:])
+        return
+    
+    parallel = DEFAULT_PARALLEL
+    if '--parallel' in args:
+        parallel = max(1, int(args[args.index('--parallel') + 1]))
+    
     print("Google Search Console Site Checker")
     print("==================================\n")
     
@@ -130,59 +692,20 @@ def main():
     
     if 'siteEntry' in sites_response:
         sites = sites_response['siteEntry']
-        print(f"Found {len(sites)} verified sites:\n")
+        print(f"Found {len(sites)} verified sites")
+        print(f"Checking search performance and indexing status ({parallel} requests in parallel)...\n")
         
-        for site in sites:
-            site_url = site['siteUrl']
-            permission = site.get('permissionLevel', 'unknown')
-            
-            print(f"Site: {site_url}")
-            print(f"Permission: {permission}")
-            print("-" * 50)
-            
-            # Check search analytics
-            print("Checking search performance...")
-            analytics = check_search_analytics(token, site_url)
-            
-            if 'rows' in analytics and analytics['rows']:
-                total_clicks = sum(row.get('clicks', 0) for row in analytics['rows'])
-                total_impressions = sum(row.get('impressions', 0) for row in analytics['rows'])
-                print(f"Last 7 days: {total_clicks} clicks, {total_impressions} impressions")
-                
-                # Show top queries
-                queries = {}
-                for row in analytics['rows']:
-                    if 'query' in row['keys']:
-                        query = row['keys'][0]
-                        queries[query] = queries.get(query, 0) + row.get('clicks', 0)
-                
-                if queries:
-                    print("\nTop search queries:")
-                    for query, clicks in sorted(queries.items(), key=lambda x: x[1], reverse=True)[:5]:
-                        print(f"  - {query}: {clicks} clicks")
-            else:
-                print("No search data available")
-            
-            # Try to check indexing coverage
-            print("\nChecking indexing status...")
-            coverage = check_indexing_coverage(token, site_url)
-            
-            if 'error' not in coverage:
-                print(json.dumps(coverage, indent=2))
-            else:
-                print("Indexing coverage data not available")
-            
-            print("\n" + "=" * 50 + "\n")
-            
-            # Save site data
-            filename = f"site_data_{site_url.replace('://', '_').replace('/', '_')}.json"
-            with open(filename, 'w') as f:
-                json.dump({
-                    'site': site,
-                    'analytics': analytics,
-                    'coverage': coverage,
-                    'timestamp': datetime.now().isoformat()
-                }, f, indent=2)
+        timestamp = datetime.now().isoformat()
+        results = fetch_all_sites(token, sites, parallel)
+        
+        # Save site data once everything is fetched, so the files do not
+        # depend on which requests happened to finish first
+        write_site_data(sites, results, timestamp)
+        print(f"Saved site data for {len(sites)} sites")
+        if cache:
+            stats = cache.summary()
+            print(f"API cache: {stats['hits']} hits, {stats['revalidated']} revalidated, "
+                  f"{stats['misses']} fetched (--no-cache to bypass)")
     
     elif 'sites' in sites_response:
         # New API format
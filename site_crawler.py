@@ -0,0 +1,383 @@
+#!/usr/bin/env python3
+"""
+Site crawler for sitemap generation
+Discovers a site's pages by following links from its homepage over pooled
+keep-alive connections, obeying robots.txt Disallow, Allow and Crawl-delay
+"""
+
+import codecs
+import hashlib
+import re
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from email.utils import parsedate_to_datetime
+from html.parser import HTMLParser
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urljoin, urlsplit, urlunsplit
+
+from api_client import ApiError, HttpClient
+from submission_ledger import header_fingerprint
+
+DEFAULT_WORKERS = 16
+DEFAULT_MAX_PAGES = 100000
+ROBOTS_AGENT = "gsc-indexing-tools"  # Product token of api_client.USER_AGENT
+
+# Links to these are assets, not pages, and are never fetched
+SKIP_EXTENSIONS = (
+    ".css", ".js", ".json", ".xml", ".txt", ".pdf", ".zip", ".gz",
+    ".png", ".jpg", ".jpeg", ".gif", ".svg", ".webp", ".ico", ".avif",
+    ".mp3", ".mp4", ".webm", ".woff", ".woff2", ".ttf", ".eot",
+)
+
+class RobotsRules:
+    """
+    The robots.txt group that applies to one user agent
+
+    Matching follows RFC 9309, as Googlebot does: the longest matching
+    Allow or Disallow pattern wins, Allow on a tie, and * and $ are
+    wildcards. (urllib.robotparser takes the first match instead, so the
+    "Allow: /" that generate_robots writes first would override every
+    Disallow after it.)
+    """
+
+    def __init__(self, rules: List[Tuple[bool, str]] = (), crawl_delay: Optional[float] = None,
+                 sitemaps: List[str] = ()):
+        self.crawl_delay = crawl_delay
+        self.sitemaps = list(sitemaps)
+        self.rules = sorted(
+            ((len(pattern), allow, self._compile(pattern)) for allow, pattern in rules),
+            key=lambda rule: (-rule[0], not rule[1]),
+        )
+
+    @staticmethod
+    def _compile(pattern: str):
+        regex = re.escape(pattern).replace(r"\*", ".*")
+        if regex.endswith(r"\$"):
+            regex = regex[:-2] + "$"
+        return re.compile(regex)
+
+    @classmethod
+    def disallow_all(cls) -> "RobotsRules":
+        return cls([(False, "/")])
+
+    @classmethod
+    def parse(cls, text: str, user_agent: str = ROBOTS_AGENT) -> "RobotsRules":
+        """The rules for user_agent's group, or the * group if none names it"""
+        groups = []
+        sitemaps = []
+        current = None
+        in_agents = False
+        for line in text.splitlines():
+            line = line.split("#", 1)[0].strip()
+            if ":" not in line:
+                continue
+            field, value = (part.strip() for part in line.split(":", 1))
+            field = field.lower()
+            if field == "user-agent":
+                if current is None or not in_agents:
+                    current = {"agents": set(), "rules": [], "delay": None}
+                    groups.append(current)
+                current["agents"].add(value.lower())
+                in_agents = True
+                continue
+            in_agents = False
+            if field == "sitemap":
+                sitemaps.append(value)
+            elif current is None:
+                continue
+            elif field in ("allow", "disallow") and value:
+                current["rules"].append((field == "allow", value))
+            elif field == "crawl-delay":
+                try:
+                    current["delay"] = float(value)
+                except ValueError:
+                    pass
+
+        agent = user_agent.lower()
+        chosen = [group for group in groups if agent in group["agents"]]
+        chosen = chosen or [group for group in groups if "*" in group["agents"]]
+        delays = [group["delay"] for group in chosen if group["delay"] is not None]
+        return cls([rule for group in chosen for rule in group["rules"]],
+                   max(delays) if delays else None, sitemaps)
+
+    def allowed(self, path: str) -> bool:
+        """Whether a path (with any query string) may be fetched"""
+        if path == "/robots.txt":
+            return True
+        for _, allow, regex in self.rules:
+            if regex.match(path):
+                return allow
+        return True
+
+def fetch_robots(client: HttpClient, origin: str, user_agent: str = ROBOTS_AGENT) -> RobotsRules:
+    """
+    Fetch and parse origin's robots.txt
+
+    A 4xx means no restrictions; a 5xx or an unreachable server means the
+    whole site is off limits for now, as RFC 9309 requires.
+    """
+    try:
+        response = client.request("GET", f"{origin}/robots.txt")
+    except ApiError:
+        return RobotsRules.disallow_all()
+    if response.ok:
+        return RobotsRules.parse(response.text, user_agent)
+    if 400 <= response.status_code < 500:
+        return RobotsRules()
+    return RobotsRules.disallow_all()
+
+def normalize_url(url: str) -> Optional[str]:
+    """Canonical form used for de-duplication: no fragment or default port, lowercase host"""
+    try:
+        parts = urlsplit(url.strip())
+        port = parts.port
+    except ValueError:
+        return None
+    scheme = parts.scheme.lower()
+    if scheme not in ("http", "https") or not parts.hostname:
+        return None
+    host = parts.hostname.lower()
+    if port is not None and port != (443 if scheme == "https" else 80):
+        host = f"{host}:{port}"
+    return urlunsplit((scheme, host, parts.path or "/", parts.query, ""))
+
+class LinkParser(HTMLParser):
+    """
+    Event-driven link extraction; no document tree is built
+
+    Collects <a>/<area> hrefs (skipping rel=nofollow), <base href>, the
+    canonical link and meta robots noindex/nofollow.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.links: List[str] = []
+        self.base: Optional[str] = None
+        self.canonical: Optional[str] = None
+        self.noindex = False
+        self.nofollow = False
+
+    def handle_starttag(self, tag, attrs):
+        if tag in ("a", "area"):
+            attrs = dict(attrs)
+            if attrs.get("href") and "nofollow" not in (attrs.get("rel") or "").lower().split():
+                self.links.append(attrs["href"])
+        elif tag == "base":
+            attrs = dict(attrs)
+            if self.base is None and attrs.get("href"):
+                self.base = attrs["href"]
+        elif tag == "link":
+            attrs = dict(attrs)
+            if "canonical" in (attrs.get("rel") or "").lower().split() and attrs.get("href"):
+                self.canonical = attrs["href"]
+        elif tag == "meta":
+            attrs = dict(attrs)
+            if (attrs.get("name") or "").lower() in ("robots", ROBOTS_AGENT):
+                directives = {d.strip() for d in (attrs.get("content") or "").lower().split(",")}
+                self.noindex = self.noindex or bool(directives & {"noindex", "none"})
+                self.nofollow = self.nofollow or bool(directives & {"nofollow", "none"})
+
+def _charset(content_type: str) -> str:
+    match = re.search(r"charset=[\"']?([\w.:-]+)", content_type, re.I)
+    try:
+        return codecs.lookup(match.group(1)).name if match else "utf-8"
+    except LookupError:
+        return "utf-8"
+
+def _lastmod(headers: Dict[str, str]) -> Optional[str]:
+    try:
+        return parsedate_to_datetime(headers["last-modified"]).strftime("%Y-%m-%d")
+    except (KeyError, TypeError, ValueError):
+        return None
+
+class SiteCrawler:
+    """
+    Breadth-first crawl of one origin with a bounded pool of fetch threads
+
+    Each thread reuses keep-alive connections from a pool sized to match,
+    and parses pages as it fetches them. Only same-origin pages that
+    robots.txt allows are followed; with a Crawl-delay, requests are
+    spaced at least that far apart across all threads.
+    """
+
+    def __init__(self, start_url: str, workers: int = DEFAULT_WORKERS,
+                 max_pages: int = DEFAULT_MAX_PAGES, respect_crawl_delay: bool = True,
+                 user_agent: str = ROBOTS_AGENT, client: Optional[HttpClient] = None):
+        self.start_url = normalize_url(start_url)
+        if self.start_url is None:
+            raise ValueError(f"Not an http(s) URL: {start_url}")
+        parts = urlsplit(self.start_url)
+        self.origin = f"{parts.scheme}://{parts.netloc}"
+        self.workers = workers
+        self.max_pages = max_pages
+        self.respect_crawl_delay = respect_crawl_delay
+        self.user_agent = user_agent
+        self.client = client or HttpClient(pool_size=workers)
+        self.robots = RobotsRules()
+        self.delay = 0.0
+        self.stats = {"fetched": 0, "pages": 0, "redirects": 0, "errors": 0,
+                      "disallowed": 0, "noindex": 0, "seconds": 0.0}
+        self._next_slot = 0.0
+        self._lock = threading.Lock()
+
+    def _wait_turn(self):
+        """Block until this thread may send its next request under Crawl-delay"""
+        if not self.delay:
+            return
+        with self._lock:
+            slot = max(time.monotonic(), self._next_slot)
+            self._next_slot = slot + self.delay
+        time.sleep(max(0.0, slot - time.monotonic()))
+
+    def _fetch(self, url: str) -> Dict:
+        """Fetch and parse one page (on a worker thread)"""
+        self._wait_turn()
+        try:
+            response = self.client.request("GET", url, {"Accept": "text/html,application/xhtml+xml;q=0.9,*/*;q=0.1"})
+        except ApiError:
+            return {"url": url, "status": None}
+
+        result = {"url": url, "status": response.status_code}
+        if 300 <= response.status_code < 400:
+            result["location"] = response.headers.get("location")
+            return result
+        content_type = response.headers.get("content-type", "")
+        if not response.ok or "html" not in content_type.lower():
+            return result
+
+        parser = LinkParser()
+        parser.feed(response.body.decode(_charset(content_type), "replace"))
+        parser.close()
+        base = urljoin(url, parser.base) if parser.base else url
+        result.update(
+            links=[] if parser.nofollow else [urljoin(base, link) for link in parser.links],
+            canonical=urljoin(base, parser.canonical) if parser.canonical else None,
+            noindex=parser.noindex,
+            entry={
+                "loc": url,
+                "lastmod": _lastmod(response.headers),
+                "fingerprint": (header_fingerprint(response.headers)
+                                or "sha256:" + hashlib.sha256(response.body).hexdigest()),
+            },
+        )
+        return result
+
+    def _in_scope(self, url: Optional[str]) -> Optional[str]:
+        url = normalize_url(url) if url else None
+        if url is None or not url.startswith(self.origin + "/"):
+            return None
+        path = url[len(self.origin):]
+        if path.lower().split("?", 1)[0].endswith(SKIP_EXTENSIONS):
+            return None
+        if not self.robots.allowed(path):
+            self.stats["disallowed"] += 1
+            return None
+        return url
+
+    def crawl(self) -> List[Dict]:
+        """
+        Crawl the site from start_url
+
+        Returns:
+            [{"loc", "lastmod", "fingerprint"}] for every indexable page,
+            sorted by loc: ready for SitemapWriter.add or
+            IncrementalSitemap.update (lastmod comes from Last-Modified
+            and may be None)
+        """
+        start = time.perf_counter()
+        self.robots = fetch_robots(self.client, self.origin, self.user_agent)
+        self.delay = (self.robots.crawl_delay or 0.0) if self.respect_crawl_delay else 0.0
+
+        seen = set()
+        checked = set()  # Raw links already considered; nav links repeat on every page
+        frontier = deque()
+        entries: Dict[str, Dict] = {}
+
+        def enqueue(url: Optional[str]):
+            if url in checked:
+                return
+            checked.add(url)
+            url = self._in_scope(url)
+            if url and url not in seen and len(seen) < self.max_pages:
+                seen.add(url)
+                frontier.append(url)
+
+        enqueue(self.start_url)
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            pending = set()
+            while frontier or pending:
+                while frontier and len(pending) < 2 * self.workers:
+                    pending.add(executor.submit(self._fetch, frontier.popleft()))
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    result = future.result()
+                    self.stats["fetched"] += 1
+                    status = result["status"]
+                    if status is None or status >= 400:
+                        self.stats["errors"] += 1
+                    elif "location" in result:
+                        self.stats["redirects"] += 1
+                        enqueue(urljoin(result["url"], result["location"] or ""))
+                    for link in result.get("links", ()):
+                        enqueue(link)
+                    if "entry" not in result:
+                        continue
+                    canonical = normalize_url(result["canonical"]) if result["canonical"] else None
+                    if result["noindex"]:
+                        self.stats["noindex"] += 1
+                    elif canonical and canonical != result["url"]:
+                        enqueue(canonical)  # Listed under its canonical URL, if that is ours
+                    else:
+                        entries[result["url"]] = result["entry"]
+
+        self.stats["pages"] = len(entries)
+        self.stats["seconds"] = time.perf_counter() - start
+        return [entries[url] for url in sorted(entries)]
+
+def crawl_site(start_url: str, **options) -> List[Dict]:
+    """Crawl start_url's site; see SiteCrawler for options"""
+    return SiteCrawler(start_url, **options).crawl()
+
+def main():
+    args = sys.argv[1:]
+
+    def option(name, default, cast):
+        if name in args:
+            return cast(args[args.index(name) + 1])
+        return default
+
+    if not args or args[0] in ("-h", "--help"):
+        print("Usage:")
+        print("  python site_crawler.py <start-url> [--jobs 16] [--max-pages 100000]")
+        print("                         [--ignore-crawl-delay] [--output urls.txt]")
+        sys.exit(0)
+
+    crawler = SiteCrawler(
+        args[0],
+        workers=option("--jobs", DEFAULT_WORKERS, int),
+        max_pages=option("--max-pages", DEFAULT_MAX_PAGES, int),
+        respect_crawl_delay="--ignore-crawl-delay" not in args,
+    )
+    entries = crawler.crawl()
+    stats = crawler.stats
+    if crawler.delay:
+        print(f"⏱  Crawl-delay {crawler.delay:g}s from robots.txt")
+    print(f"✅ {stats['pages']} pages from {stats['fetched']} fetches in {stats['seconds']:.2f}s "
+          f"({stats['fetched'] / max(stats['seconds'], 1e-9):.0f}/s)")
+    print(f"   {stats['redirects']} redirects, {stats['errors']} errors, "
+          f"{stats['disallowed']} links disallowed by robots.txt, {stats['noindex']} noindex")
+
+    output = option("--output", None, str)
+    if output:
+        with open(output, "w") as f:
+            f.writelines(entry["loc"] + "\n" for entry in entries)
+        print(f"📝 Wrote {len(entries)} URLs to {output}")
+    else:
+        for entry in entries:
+            print(entry["loc"])
+
+if __name__ == "__main__":
+    main()
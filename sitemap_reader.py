@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Streaming sitemap reader
+Yields every <loc> from sitemap files or URLs, following sitemap indexes
+and gzip, without loading whole documents into memory
+"""
+
+import gzip
+import io
+import urllib.error
+import urllib.request
+import xml.etree.ElementTree as ET
+from contextlib import contextmanager
+from typing import Iterator, Optional, Set
+
+from api_client import DEFAULT_TIMEOUT, USER_AGENT
+
+class SitemapError(Exception):
+    """A sitemap could not be fetched or parsed"""
+
+def _local_name(tag: str) -> str:
+    return tag.rsplit("}", 1)[-1]
+
+@contextmanager
+def open_sitemap(source: str):
+    """
+    Binary stream of a sitemap path or http(s) URL, gunzipped if needed
+
+    A remote body is read from the socket as it is parsed rather than
+    fetched whole first, so large sitemaps use constant memory.
+    """
+    if source.startswith(("http://", "https://")):
+        request = urllib.request.Request(source, headers={"User-Agent": USER_AGENT})
+        try:
+            raw = io.BufferedReader(urllib.request.urlopen(request, timeout=DEFAULT_TIMEOUT))
+        except urllib.error.HTTPError as e:
+            raise SitemapError(f"{source}: HTTP {e.code}")
+        except (urllib.error.URLError, OSError) as e:
+            raise SitemapError(f"{source}: {getattr(e, 'reason', e)}")
+    else:
+        try:
+            raw = open(source, "rb")
+        except OSError as e:
+            raise SitemapError(f"{source}: {e}")
+
+    with raw:
+        if raw.peek(2)[:2] == b"\x1f\x8b":
+            with gzip.GzipFile(fileobj=raw) as stream:
+                yield stream
+        else:
+            yield raw
+
+def iter_sitemap_urls(source: str, _seen: Optional[Set[str]] = None) -> Iterator[str]:
+    """
+    Yield page URLs from a sitemap or sitemap index, depth first
+
+    Child sitemaps of an index are read recursively; each sitemap is read
+    at most once, so index loops terminate.
+
+    Raises:
+        SitemapError: if the top-level sitemap cannot be read or parsed
+    """
+    seen = _seen if _seen is not None else set()
+    if source in seen:
+        return
+    seen.add(source)
+
+    children = []
+    loc = None
+    root = None
+    with open_sitemap(source) as stream:
+        try:
+            for event, element in ET.iterparse(stream, events=("start", "end")):
+                if event == "start":
+                    if root is None:
+                        root = element
+                    continue
+                name = _local_name(element.tag)
+                if name == "loc":
+                    loc = (element.text or "").strip()
+                elif name in ("url", "sitemap"):
+                    if loc:
+                        if name == "url":
+                            yield loc
+                        else:
+                            children.append(loc)
+                    loc = None
+                    root.clear()  # Drop finished entries so the tree never grows
+        except ET.ParseError as e:
+            raise SitemapError(f"{source}: {e}")
+        except (OSError, EOFError) as e:  # Connection lost or truncated gzip mid-stream
+            raise SitemapError(f"{source}: {e}")
+
+    for child in children:
+        try:
+            yield from iter_sitemap_urls(child, seen)
+        except SitemapError as e:
+            print(f"  ⚠️  Skipping sitemap {e}")
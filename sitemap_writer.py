@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+Streaming sitemap writer
+Writes <url> entries as they arrive, rolling over to a new shard at the
+protocol's 50,000-URL / 50 MB limits, with a sitemap index over the
+shards and optional gzip, in constant memory
+"""
+
+import gzip
+import io
+import os
+import re
+from concurrent.futures import FIRST_COMPLETED, Executor, wait
+from typing import Iterable, List, Optional
+from xml.sax.saxutils import escape
+
+MAX_URLS = 50000
+MAX_BYTES = 50 * 1024 * 1024  # Uncompressed, per the sitemap protocol
+
+URLSET_HEADER = ('<?xml version="1.0" encoding="UTF-8"?>\n'
+                 '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n').encode()
+URLSET_FOOTER = b"</urlset>\n"
+INDEX_HEADER = ('<?xml version="1.0" encoding="UTF-8"?>\n'
+                '<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n').encode()
+INDEX_FOOTER = b"</sitemapindex>\n"
+
+def url_entry(loc: str, lastmod: Optional[str] = None, changefreq: Optional[str] = None,
+              priority: Optional[str] = None) -> bytes:
+    """One encoded <url> element"""
+    parts = [f"  <url>\n    <loc>{escape(loc)}</loc>\n"]
+    if lastmod:
+        parts.append(f"    <lastmod>{lastmod}</lastmod>\n")
+    if changefreq:
+        parts.append(f"    <changefreq>{changefreq}</changefreq>\n")
+    if priority:
+        parts.append(f"    <priority>{priority}</priority>\n")
+    parts.append("  </url>\n")
+    return "".join(parts).encode()
+
+def sitemap_entry(loc: str, lastmod: Optional[str] = None) -> bytes:
+    """One encoded <sitemap> element of a sitemap index"""
+    entry = f"  <sitemap>\n    <loc>{escape(loc)}</loc>\n"
+    if lastmod:
+        entry += f"    <lastmod>{lastmod}</lastmod>\n"
+    return (entry + "  </sitemap>\n").encode()
+
+def open_output(path: str, compress: bool):
+    """
+    (writable, underlying file) for a sitemap file; close both, writable first
+
+    Gzip output carries no file name or timestamp, so identical content
+    always compresses to identical bytes.
+    """
+    raw = open(path, "wb", buffering=1 << 16)
+    if not compress:
+        return raw, raw
+    return gzip.GzipFile(filename="", mode="wb", fileobj=raw, compresslevel=6, mtime=0), raw
+
+def write_shard(path: str, body: bytes, compress: bool):
+    """Write one finished shard; safe on a worker thread, as zlib releases the GIL"""
+    out, raw = open_output(path, compress)
+    with raw, out:
+        out.write(body)
+
+def remove_stale_shards(directory: str, stem: str, keep: Iterable[int], compress: bool):
+    """Delete <stem>-N.xml[.gz] shard files other than the numbers in keep (in the current format)"""
+    keep = set(keep)
+    pattern = re.compile(re.escape(stem) + r"-(\d+)\.xml(\.gz)?$")
+    for entry in os.scandir(directory or "."):
+        match = pattern.match(entry.name)
+        if match and (int(match.group(1)) not in keep or bool(match.group(2)) != compress):
+            os.remove(entry.path)
+
+class SitemapWriter:
+    """
+    Stream URLs into a sitemap at path, sharding when it outgrows one file
+
+    Shards are written as <stem>-1.xml, <stem>-2.xml, ... next to path
+    (.xml.gz with compress) and published under base_url. When everything
+    fits in one shard it becomes path itself (path.gz with compress);
+    otherwise path is written as a sitemap index listing the shards, so
+    /sitemap.xml keeps working either way. Files are written under
+    temporary names and only moved into place by close(); shards left over
+    from an earlier, larger run are removed.
+
+    With an executor, each finished shard is compressed and written there
+    while the next one fills, with at most max_pending shards (default:
+    two, one writing and one queued) held in memory; pass about two per
+    executor worker to keep them all busy.
+
+    Use as a context manager, or call close() (or abort()) yourself.
+    """
+
+    def __init__(self, path: str, base_url: str, compress: bool = False,
+                 max_urls: int = MAX_URLS, max_bytes: int = MAX_BYTES,
+                 executor: Optional[Executor] = None, max_pending: int = 2):
+        self.path = path
+        self.base_url = base_url.rstrip("/")
+        self.compress = compress
+        self.max_urls = max_urls
+        self.max_bytes = max_bytes
+        self.directory = os.path.dirname(path)
+        self.stem = os.path.basename(path)[:-4] if path.endswith(".xml") else os.path.basename(path)
+        self.files: List[str] = []  # Final paths, filled by close()
+        self.count = 0
+        self._shards: List[dict] = []  # {"tmp", "path", "lastmod"}
+        self._file = None
+        self._raw = None
+        self._executor = executor
+        self._pending = set()
+        self._max_pending = max(1, max_pending)
+        self._shard_urls = 0
+        self._shard_bytes = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def shard_name(self, number: int) -> str:
+        return f"{self.stem}-{number}.xml" + (".gz" if self.compress else "")
+
+    def _open_shard(self):
+        name = self.shard_name(len(self._shards) + 1)
+        shard = {"path": os.path.join(self.directory, name),
+                 "tmp": os.path.join(self.directory, f"{name}.{os.getpid()}.tmp"),
+                 "lastmod": None}
+        self._shards.append(shard)
+        if self._executor is not None:
+            self._file = self._raw = io.BytesIO()
+        else:
+            self._file, self._raw = open_output(shard["tmp"], self.compress)
+        self._file.write(URLSET_HEADER)
+        self._shard_urls = 0
+        self._shard_bytes = len(URLSET_HEADER) + len(URLSET_FOOTER)
+
+    def _close_shard(self):
+        self._file.write(URLSET_FOOTER)
+        if self._executor is not None:
+            body = self._file.getvalue()
+            self._pending.add(self._executor.submit(write_shard, self._shards[-1]["tmp"], body, self.compress))
+            while len(self._pending) >= self._max_pending:
+                self._wait(FIRST_COMPLETED)
+        self._file.close()
+        self._raw.close()
+        self._file = self._raw = None
+
+    def _wait(self, return_when: str = "ALL_COMPLETED"):
+        """Wait for pending shard writes, re-raising the first failure"""
+        done, self._pending = wait(self._pending, return_when=return_when)
+        for future in done:
+            future.result()
+
+    def add(self, loc: str, lastmod: Optional[str] = None, changefreq: Optional[str] = None,
+            priority: Optional[str] = None):
+        """Append one URL, starting a new shard if this one is full"""
+        self.add_entry(url_entry(loc, lastmod, changefreq, priority), lastmod)
+
+    def add_entry(self, entry: bytes, lastmod: Optional[str] = None):
+        """Append an already encoded <url> element (see url_entry)"""
+        if self._file is not None and (self._shard_urls >= self.max_urls
+                                       or self._shard_bytes + len(entry) > self.max_bytes):
+            self._close_shard()
+        if self._file is None:
+            self._open_shard()
+        self._file.write(entry)
+        self._shard_urls += 1
+        self._shard_bytes += len(entry)
+        self.count += 1
+        shard = self._shards[-1]
+        if lastmod and (shard["lastmod"] is None or lastmod > shard["lastmod"]):
+            shard["lastmod"] = lastmod
+
+    def close(self) -> List[str]:
+        """Finish the last shard, move files into place and write the index if sharded"""
+        if self._file is None and not self._shards:
+            self._open_shard()  # An empty sitemap is still a valid one
+        if self._file is not None:
+            self._close_shard()
+        self._wait()
+
+        if len(self._shards) == 1:
+            final = self.path + (".gz" if self.compress else "")
+            os.replace(self._shards[0]["tmp"], final)
+            self.files = [final]
+            # The other format's single file, or a stale index from when the sitemap was sharded
+            stale = self.path if self.compress else self.path + ".gz"
+            if os.path.exists(stale):
+                os.remove(stale)
+        else:
+            tmp_index = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_index, "wb") as index:
+                index.write(INDEX_HEADER)
+                for shard in self._shards:
+                    os.replace(shard["tmp"], shard["path"])
+                    index.write(sitemap_entry(f"{self.base_url}/{os.path.basename(shard['path'])}",
+                                              shard["lastmod"]))
+                index.write(INDEX_FOOTER)
+            os.replace(tmp_index, self.path)
+            self.files = [shard["path"] for shard in self._shards] + [self.path]
+
+        keep = range(1, len(self._shards) + 1) if len(self._shards) > 1 else ()
+        remove_stale_shards(self.directory, self.stem, keep, self.compress)
+        return self.files
+
+    def abort(self):
+        """Discard everything written so far"""
+        if self._file is not None:
+            self._file.close()
+            self._raw.close()
+            self._file = self._raw = None
+        wait(self._pending)
+        self._pending = set()
+        for shard in self._shards:
+            if os.path.exists(shard["tmp"]):
+                os.remove(shard["tmp"])
+        self._shards = []
+
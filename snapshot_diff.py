@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Diff two search analytics snapshots of a site
+Finds (page, query) rows and pages that appeared, disappeared or moved
+between runs in one linear pass, and lists the pages worth resubmitting
+"""
+
+import csv
+import gzip
+import json
+import os
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from analytics_store import safe_name
+from snapshot_report import LEGACY_DIMENSIONS, SNAPSHOT_DIR, SNAPSHOT_ROW_LIMIT
+
+DEFAULT_POSITION_THRESHOLD = 3.0    # Positions a row must move to count as moved
+DEFAULT_IMPRESSION_THRESHOLD = 0.5  # Relative impressions change that counts as moved
+MIN_IMPRESSIONS = 10  # Impressions changes on rows smaller than this on both sides are noise
+
+Key = Tuple[str, str]  # (page, query)
+Metrics = List[float]  # [clicks, impressions, position * impressions]
+
+def site_snapshots(site_url: str, root: str = SNAPSHOT_DIR) -> List[str]:
+    """Archived snapshot paths of one site, oldest first"""
+    directory = os.path.join(root, safe_name(site_url))
+    if not os.path.isdir(directory):
+        return []
+    return sorted(entry.path for entry in os.scandir(directory) if entry.name.endswith(".json"))
+
+def iter_rows(path: str) -> Iterator[Tuple[Key, float, float, float]]:
+    """
+    Yield ((page, query), clicks, impressions, position) for every row of a
+    snapshot (.json) or an export (.jsonl, .csv, optionally .gz)
+
+    A missing page or query dimension is reported as "".
+    """
+    opener = gzip.open if path.endswith(".gz") else open
+    name = path[:-3] if path.endswith(".gz") else path
+
+    if name.endswith(".json"):
+        with opener(path, "rt") as f:
+            snapshot = json.load(f)
+        dimensions = snapshot.get("dimensions", LEGACY_DIMENSIONS)
+        page_index = dimensions.index("page") if "page" in dimensions else None
+        query_index = dimensions.index("query") if "query" in dimensions else None
+        for row in snapshot.get("analytics", {}).get("rows") or []:
+            keys = row.get("keys") or []
+            page = keys[page_index] if page_index is not None and page_index < len(keys) else ""
+            query = keys[query_index] if query_index is not None and query_index < len(keys) else ""
+            yield ((page, query), row.get("clicks", 0), row.get("impressions", 0),
+                   row.get("position", 0))
+        return
+
+    with opener(path, "rt", newline="") as f:
+        rows = csv.DictReader(f) if name.endswith(".csv") else map(json.loads, f)
+        for row in rows:
+            yield ((row.get("page", ""), row.get("query", "")), float(row.get("clicks") or 0),
+                   float(row.get("impressions") or 0), float(row.get("position") or 0))
+
+def truncated_at(path: str) -> Optional[int]:
+    """
+    The row limit a snapshot was cut off at, or None if it holds every row
+
+    A snapshot (.json) that filled its rowLimit may have dropped rows
+    below it; exports (.jsonl, .csv) are paged through to the end.
+    """
+    opener = gzip.open if path.endswith(".gz") else open
+    name = path[:-3] if path.endswith(".gz") else path
+    if not name.endswith(".json"):
+        return None
+    with opener(path, "rt") as f:
+        snapshot = json.load(f)
+    limit = snapshot.get("row_limit", SNAPSHOT_ROW_LIMIT)
+    rows = snapshot.get("analytics", {}).get("rows") or []
+    return limit if limit and len(rows) >= limit else None
+
+def index_rows(path: str) -> Tuple[Dict[Key, Metrics], Dict[str, Metrics]]:
+    """Rows and per-page totals of a snapshot, keyed for lookup"""
+    rows: Dict[Key, Metrics] = {}
+    pages: Dict[str, Metrics] = {}
+    for key, clicks, impressions, position in iter_rows(path):
+        weighted = position * impressions
+        # Exports with extra dimensions (date, country...) repeat keys, so both tables accumulate
+        for table, table_key in ((rows, key), (pages, key[0])):
+            totals = table.get(table_key)
+            if totals is None:
+                table[table_key] = [clicks, impressions, weighted]
+            else:
+                totals[0] += clicks
+                totals[1] += impressions
+                totals[2] += weighted
+    return rows, pages
+
+def _position(totals: Metrics) -> Optional[float]:
+    return totals[2] / totals[1] if totals[1] else None
+
+def _record(key, old: Optional[Metrics], new: Optional[Metrics]) -> Dict:
+    record = {"key": key}
+    for label, totals in (("old", old), ("new", new)):
+        record[label] = None if totals is None else {
+            "clicks": totals[0], "impressions": totals[1], "position": _position(totals)
+        }
+    return record
+
+def classify_move(old: Metrics, new: Metrics, position_threshold: float,
+                  impression_threshold: float) -> Optional[str]:
+    """'up', 'down' or None for an entry present in both snapshots"""
+    old_impressions, new_impressions = old[1], new[1]
+    if old_impressions and new_impressions:
+        shift = new[2] / new_impressions - old[2] / old_impressions
+        if shift >= position_threshold:
+            return "down"
+        if shift <= -position_threshold:
+            return "up"
+    if old_impressions >= MIN_IMPRESSIONS or new_impressions >= MIN_IMPRESSIONS:
+        change = (new_impressions - old_impressions) / max(old_impressions, 1.0)
+        if change <= -impression_threshold:
+            return "down"
+        if change >= impression_threshold:
+            return "up"
+    return None
+
+def _compare(old: Dict, new: Dict, position_threshold: float, impression_threshold: float,
+             old_truncated: bool = False, new_truncated: bool = False) -> Dict[str, List[Dict]]:
+    """
+    One pass over new, removing matches from a copy of old; what is left disappeared
+
+    Against a truncated side, an entry missing from it may only have
+    ranked below the cut-off, so it is reported as entered_top or left_top
+    rather than appeared or disappeared.
+    """
+    remaining = dict(old)
+    changes: Dict[str, List[Dict]] = {"appeared": [], "disappeared": [], "moved": [],
+                                      "entered_top": [], "left_top": []}
+    appeared = changes["entered_top" if old_truncated else "appeared"]
+    for key, new_totals in new.items():
+        old_totals = remaining.pop(key, None)
+        if old_totals is None:
+            appeared.append(_record(key, None, new_totals))
+            continue
+        direction = classify_move(old_totals, new_totals, position_threshold, impression_threshold)
+        if direction:
+            record = _record(key, old_totals, new_totals)
+            record["direction"] = direction
+            changes["moved"].append(record)
+    changes["left_top" if new_truncated else "disappeared"] = [
+        _record(key, totals, None) for key, totals in remaining.items()]
+    for records in changes.values():
+        records.sort(key=_impact, reverse=True)
+    return changes
+
+def _impact(record: Dict) -> float:
+    """Impressions at stake, for ordering the biggest changes first"""
+    return max((record[side] or {}).get("impressions", 0) for side in ("old", "new"))
+
+def diff_snapshots(old_path: str, new_path: str,
+                   position_threshold: float = DEFAULT_POSITION_THRESHOLD,
+                   impression_threshold: float = DEFAULT_IMPRESSION_THRESHOLD) -> Dict:
+    """
+    Compare two snapshots by (page, query) row and by page
+
+    Each snapshot is read once and hashed; the comparison is then a single
+    pass over the newer one, so the cost is linear in the row count.
+
+    Returns:
+        {"rows": changes, "pages": changes}, where changes maps appeared,
+        disappeared, moved, entered_top and left_top to records of
+        {key, old, new[, direction]} ordered by impressions at stake, and
+        "truncated_at" holds each side's truncated_at
+    """
+    old_rows, old_pages = index_rows(old_path)
+    new_rows, new_pages = index_rows(new_path)
+    truncated = [truncated_at(old_path), truncated_at(new_path)]
+    sides = (position_threshold, impression_threshold, truncated[0] is not None, truncated[1] is not None)
+    return {
+        "old": old_path,
+        "new": new_path,
+        "rows": _compare(old_rows, new_rows, *sides),
+        "pages": _compare(old_pages, new_pages, *sides),
+        "row_counts": [len(old_rows), len(new_rows)],
+        "page_counts": [len(old_pages), len(new_pages)],
+        "truncated_at": truncated,
+    }
+
+def resubmit_urls(diff: Dict) -> List[str]:
+    """
+    Pages that disappeared or moved down, biggest loss first
+
+    Pages that only left a truncated snapshot's top rows are not included.
+    """
+    pages = diff["pages"]
+    urls = [record["key"] for record in pages["disappeared"]]
+    urls += [record["key"] for record in pages["moved"] if record["direction"] == "down"]
+    return [url for url in urls if url.startswith(("http://", "https://"))]
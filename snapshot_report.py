@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+"""
+Portfolio report over stored site snapshots
+Loads every site_data_*.json and archived snapshot in one pass, parsing
+them across processes, and renders per-site trends with week-over-week
+deltas as Markdown or HTML
+"""
+
+import bisect
+import html
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional
+
+from analytics_store import safe_name
+
+SNAPSHOT_DIR = "snapshots"
+SNAPSHOT_ROW_LIMIT = 10  # rowLimit of search-console-check's per-site query; snapshots hold its top rows only
+SUMMARY_INDEX = "_summaries.json"  # Per-file summaries, so unchanged snapshots are not re-parsed
+SUMMARY_VERSION = 2  # Bumped when summaries gain fields, so indexed ones are re-parsed
+LEGACY_DIMENSIONS = ["query", "page"]  # Snapshots written before dimensions were recorded
+PARALLEL_THRESHOLD = 32  # Below this many files, process start-up costs more than it saves
+WEEK = timedelta(days=7)
+WEEK_SLACK = timedelta(hours=12)  # A snapshot this much short of a week old still counts
+SPARK_CHARS = "▁▂▃▄▅▆▇█"
+SPARK_POINTS = 14
+
+def snapshot_path(site_url: str, timestamp: str, root: str = SNAPSHOT_DIR) -> str:
+    """Archive path of one site snapshot, e.g. snapshots/sc-domain_example.com/2024-05-01T093000.123456.json
+
+    Microseconds are kept at a fixed width, so runs in the same second get
+    distinct names that still sort in time order.
+    """
+    stamp = datetime.fromisoformat(timestamp).strftime("%Y-%m-%dT%H%M%S.%f")
+    return os.path.join(root, safe_name(site_url), stamp + ".json")
+
+def find_snapshots(directory: str = ".", root: Optional[str] = None) -> List[str]:
+    """Current site_data_*.json files in directory plus every archived snapshot"""
+    root = root or os.path.join(directory, SNAPSHOT_DIR)
+    paths = [entry.path for entry in os.scandir(directory)
+             if entry.name.startswith("site_data_") and entry.name.endswith(".json")]
+    if os.path.isdir(root):
+        for site_dir in os.scandir(root):
+            if site_dir.is_dir():
+                paths.extend(entry.path for entry in os.scandir(site_dir.path)
+                             if entry.name.endswith(".json"))
+    return sorted(paths)
+
+def summarize_snapshot(path: str) -> Optional[Dict]:
+    """
+    Reduce one snapshot file to its site, time and metric totals
+
+    Runs in worker processes, so only this small dict crosses back.
+
+    Returns:
+        {site, timestamp, clicks, impressions, position, rows, pages,
+         coverage_ok, truncated_at}, or None if the file is not a readable
+        snapshot; truncated_at is the row limit when the snapshot filled
+        it, in which case the totals cover only its top rows
+    """
+    try:
+        with open(path, "rb") as f:
+            snapshot = json.load(f)
+        site_url = snapshot["site"]["siteUrl"]
+        timestamp = snapshot["timestamp"]
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+    rows = snapshot.get("analytics", {}).get("rows") or []
+    dimensions = snapshot.get("dimensions", LEGACY_DIMENSIONS)
+    page_index = dimensions.index("page") if "page" in dimensions else None
+    limit = snapshot.get("row_limit", SNAPSHOT_ROW_LIMIT)
+    clicks = impressions = weighted = 0.0
+    pages = set()
+    for row in rows:
+        row_impressions = row.get("impressions", 0)
+        clicks += row.get("clicks", 0)
+        impressions += row_impressions
+        weighted += row.get("position", 0) * row_impressions
+        keys = row.get("keys") or []
+        if page_index is not None and page_index < len(keys):
+            pages.add(keys[page_index])
+    return {
+        "site": site_url,
+        "timestamp": timestamp,
+        "clicks": clicks,
+        "impressions": impressions,
+        "position": weighted / impressions if impressions else None,
+        "rows": len(rows),
+        "pages": len(pages),
+        "coverage_ok": "error" not in (snapshot.get("coverage") or {"error": True}),
+        "truncated_at": limit if limit and len(rows) >= limit else None,
+    }
+
+def _summarize_all(paths: List[str], jobs: int) -> List[Optional[Dict]]:
+    if jobs == 1 or len(paths) < PARALLEL_THRESHOLD:
+        return list(map(summarize_snapshot, paths))
+    chunksize = max(1, len(paths) // (jobs * 4))
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        return list(executor.map(summarize_snapshot, paths, chunksize=chunksize))
+
+def load_summaries(paths: List[str], jobs: Optional[int] = None,
+                   index_path: Optional[str] = None) -> List[Dict]:
+    """
+    Summarize every snapshot, in parallel processes when there are enough files
+
+    With index_path, summaries are kept keyed by (size, mtime,
+    SUMMARY_VERSION), so only new or rewritten files are parsed; the index
+    is rewritten when it changes.
+    """
+    jobs = jobs or os.cpu_count() or 1
+    index: Dict[str, list] = {}
+    if index_path:
+        try:
+            with open(index_path) as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            index = {}
+
+    stamps = {}
+    misses = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        stamps[path] = [stat.st_size, stat.st_mtime_ns, SUMMARY_VERSION]
+        entry = index.get(path)
+        if entry is None or entry[:3] != stamps[path]:
+            misses.append(path)
+
+    for path, summary in zip(misses, _summarize_all(misses, jobs)):
+        index[path] = stamps[path] + [summary]
+
+    if index_path and (misses or len(index) != len(stamps)):
+        index = {path: index[path] for path in stamps}
+        tmp_path = f"{index_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(index, f)
+        os.replace(tmp_path, index_path)
+    return [index[path][3] for path in stamps if index[path][3]]
+
+def _delta(current: Optional[float], previous: Optional[float]) -> Optional[float]:
+    if current is None or previous is None:
+        return None
+    return current - previous
+
+def site_trends(summaries: Iterable[Dict]) -> List[Dict]:
+    """
+    Per-site history with the latest snapshot and week-over-week deltas
+
+    The current site_data file and its archived copy share a timestamp and
+    are counted once. The week-ago baseline is the newest snapshot at least
+    WEEK (less WEEK_SLACK) older than the latest.
+
+    Returns:
+        [{site, latest, baseline or None, deltas, history}] sorted by latest clicks
+    """
+    by_site: Dict[str, Dict[str, Dict]] = {}
+    for summary in summaries:
+        by_site.setdefault(summary["site"], {})[summary["timestamp"]] = summary
+
+    trends = []
+    for site_url, snapshots in by_site.items():
+        history = [snapshots[timestamp] for timestamp in sorted(snapshots)]
+        times = [datetime.fromisoformat(summary["timestamp"]) for summary in history]
+        latest = history[-1]
+        index = bisect.bisect_right(times, times[-1] - WEEK + WEEK_SLACK) - 1
+        baseline = history[index] if index >= 0 and index < len(history) - 1 else None
+        trends.append({
+            "site": site_url,
+            "latest": latest,
+            "baseline": baseline,
+            "deltas": {
+                metric: _delta(latest[metric], baseline[metric]) if baseline else None
+                for metric in ("clicks", "impressions", "position")
+            },
+            "history": history,
+        })
+    trends.sort(key=lambda trend: (-trend["latest"]["clicks"], trend["site"]))
+    return trends
+
+def sparkline(values: List[float]) -> str:
+    """Unicode sparkline of the last SPARK_POINTS values"""
+    values = values[-SPARK_POINTS:]
+    if not values:
+        return ""
+    low, high = min(values), max(values)
+    if high == low:
+        return SPARK_CHARS[0] * len(values)
+    scale = (len(SPARK_CHARS) - 1) / (high - low)
+    return "".join(SPARK_CHARS[round((value - low) * scale)] for value in values)
+
+def format_count_delta(delta: Optional[float], previous: Optional[float]) -> str:
+    if delta is None:
+        return "—"
+    text = f"{delta:+,.0f}"
+    if previous:
+        text += f" ({delta / previous:+.1%})"
+    return text
+
+def format_position(position: Optional[float]) -> str:
+    return f"{position:.1f}" if position is not None else "—"
+
+def format_position_delta(delta: Optional[float]) -> str:
+    # Negative is better: the site moved up the results
+    return f"{delta:+.1f}" if delta is not None else "—"
+
+def portfolio_totals(trends: List[Dict]) -> Dict:
+    """
+    Latest clicks/impressions summed across sites, with week-over-week
+    deltas over the sites that have a week-ago baseline (None if none do)
+    """
+    totals: Dict = {"clicks": 0.0, "impressions": 0.0}
+    compared = [trend for trend in trends if trend["baseline"]]
+    for trend in trends:
+        totals["clicks"] += trend["latest"]["clicks"]
+        totals["impressions"] += trend["latest"]["impressions"]
+    for metric in ("clicks", "impressions"):
+        baseline = sum(trend["baseline"][metric] for trend in compared)
+        totals[f"baseline_{metric}"] = baseline
+        totals[f"{metric}_delta"] = (sum(trend["latest"][metric] for trend in compared) - baseline
+                                     if compared else None)
+    return totals
+
+def top_rows(trends: List[Dict]) -> Optional[int]:
+    """Row limit the latest snapshots were cut off at, or None if they are complete"""
+    return max((trend["latest"].get("truncated_at") or 0 for trend in trends), default=0) or None
+
+def _totals_label(trends: List[Dict]) -> str:
+    limit = top_rows(trends)
+    return f"Last 7 days, top {limit} rows per site:" if limit else "Last 7 days:"
+
+def _table_rows(trends: List[Dict]) -> List[List[str]]:
+    rows = []
+    for trend in trends:
+        latest, baseline, deltas = trend["latest"], trend["baseline"], trend["deltas"]
+        rows.append([
+            trend["site"],
+            f"{latest['clicks']:,.0f}",
+            format_count_delta(deltas["clicks"], baseline and baseline["clicks"]),
+            f"{latest['impressions']:,.0f}",
+            format_count_delta(deltas["impressions"], baseline and baseline["impressions"]),
+            format_position(latest["position"]),
+            format_position_delta(deltas["position"]),
+            str(len(trend["history"])),
+            sparkline([summary["clicks"] for summary in trend["history"]]),
+            latest["timestamp"][:16].replace("T", " "),
+        ])
+    return rows
+
+TOP_ROWS_NOTE = ("Clicks, impressions and position are summed over each snapshot's top {limit} "
+                 "query/page rows, not whole-site totals.")
+
+TABLE_HEADERS = ["Site", "Clicks", "Δ WoW", "Impressions", "Δ WoW", "Avg position", "Δ WoW",
+                 "Snapshots", "Clicks trend", "Last snapshot"]
+
+def render_markdown(trends: List[Dict], generated: Optional[datetime] = None) -> str:
+    """Whole-portfolio report as Markdown"""
+    generated = generated or datetime.now()
+    totals = portfolio_totals(trends)
+    lines = [
+        "# Search Console Portfolio Report",
+        "",
+        f"Generated: {generated.strftime('%Y-%m-%d %H:%M')}  ",
+        f"Sites: {len(trends)}, snapshots: {sum(len(t['history']) for t in trends)}",
+        "",
+        f"**{_totals_label(trends)}** {totals['clicks']:,.0f} clicks "
+        f"({format_count_delta(totals['clicks_delta'], totals['baseline_clicks'])} WoW), "
+        f"{totals['impressions']:,.0f} impressions "
+        f"({format_count_delta(totals['impressions_delta'], totals['baseline_impressions'])} WoW)",
+        "",
+        "| " + " | ".join(TABLE_HEADERS) + " |",
+        "|" + "|".join(["---"] + ["---:"] * 7 + ["---", "---"]) + "|",
+    ]
+    for row in _table_rows(trends):
+        lines.append("| " + " | ".join(cell.replace("|", "\\|") for cell in row) + " |")
+    lines += [
+        "",
+        "Week-over-week deltas compare the latest snapshot with the newest one a week older; "
+        "a negative position delta means the site moved up. Sites with '—' have no snapshot that old yet.",
+        "",
+    ]
+    if top_rows(trends):
+        lines += [TOP_ROWS_NOTE.format(limit=top_rows(trends)), ""]
+    return "\n".join(lines)
+
+def render_html(trends: List[Dict], generated: Optional[datetime] = None) -> str:
+    """Whole-portfolio report as a standalone HTML page"""
+    generated = generated or datetime.now()
+    totals = portfolio_totals(trends)
+
+    def cell(text: str, numeric: bool, lower_is_better: bool = False) -> str:
+        classes = ["num"] if numeric else []
+        if text.startswith(("+", "-")):
+            better = text.startswith("-") if lower_is_better else text.startswith("+")
+            classes.append("up" if better else "down")
+        attr = f' class="{" ".join(classes)}"' if classes else ""
+        return f"<td{attr}>{html.escape(text)}</td>"
+
+    body = []
+    for row in _table_rows(trends):
+        body.append("<tr>" + "".join(cell(text, 0 < i < 8, i == 6) for i, text in enumerate(row)) + "</tr>")
+    return "\n".join([
+        "<!DOCTYPE html>",
+        '<html lang="en"><head><meta charset="utf-8">',
+        "<title>Search Console Portfolio Report</title>",
+        "<style>body{font-family:sans-serif;margin:2em}table{border-collapse:collapse}"
+        "th,td{padding:4px 10px;border-bottom:1px solid #ddd}td.num{text-align:right}"
+        ".up{color:#1a7f37}.down{color:#cf222e}</style>",
+        "</head><body>",
+        "<h1>Search Console Portfolio Report</h1>",
+        f"<p>Generated {generated.strftime('%Y-%m-%d %H:%M')} &middot; {len(trends)} sites &middot; "
+        f"{sum(len(t['history']) for t in trends)} snapshots</p>",
+        f"<p><strong>{html.escape(_totals_label(trends))}</strong> {totals['clicks']:,.0f} clicks "
+        f"({html.escape(format_count_delta(totals['clicks_delta'], totals['baseline_clicks']))} WoW), "
+        f"{totals['impressions']:,.0f} impressions "
+        f"({html.escape(format_count_delta(totals['impressions_delta'], totals['baseline_impressions']))} WoW)</p>",
+        "<table><thead><tr>" + "".join(f"<th>{html.escape(h)}</th>" for h in TABLE_HEADERS) + "</tr></thead>",
+        "<tbody>", *body, "</tbody></table>",
+        "<p>A negative position delta means the site moved up.</p>",
+        *([f"<p>{html.escape(TOP_ROWS_NOTE.format(limit=top_rows(trends)))}</p>"] if top_rows(trends) else []),
+        "</body></html>",
+        "",
+    ])
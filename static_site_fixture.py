@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Local static site for exercising the crawler and build scanner
+Generates a linked site with the robots.txt rules generate_robots writes
+and serves a directory over HTTP/1.1 keep-alive on 127.0.0.1
+"""
+
+import os
+import sys
+import threading
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_PORT = 8091
+DEFAULT_PAGES = 1000
+FANOUT = 10  # Child pages linked from each page
+
+PAGE_TEMPLATE = """<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="utf-8">
+<title>{title}</title>
+{head}</head>
+<body>
+<nav><a href="/">Home</a> <a href="/about/">About</a> <a href="/private/">Private</a>
+<a href="/admin/login.html">Admin</a> <a href="https://example.com/">Elsewhere</a></nav>
+<main>
+<h1>{title}</h1>
+<p>Generated page for crawler tests. <a href="#top">Back to top</a>
+<a href="/assets/site.css">Stylesheet</a> <a href="/page-0/?ref=nofollow" rel="nofollow">Tracked</a></p>
+<ul>
+{links}
+</ul>
+</main>
+</body>
+</html>
+"""
+
+ROBOTS_TEMPLATE = """# Robots.txt for the fixture site
+User-agent: *
+Allow: /
+{delay}
+# Block admin/private areas if they exist
+Disallow: /admin/
+Disallow: /private/
+Disallow: /.git/
+Disallow: /api/private/
+"""
+
+def _write(path: str, content: str):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write(content)
+
+def build_site(directory: str, pages: int = DEFAULT_PAGES, crawl_delay: float = 0) -> int:
+    """
+    Write a site of pages linked pages (a FANOUT-ary tree under /) into directory
+
+    Pages are directories with an index.html, linked without the trailing
+    slash half the time so the server's redirects are exercised. Every
+    97th page is noindex; /private/ and /admin/ pages exist but are
+    disallowed by robots.txt.
+
+    Returns:
+        The number of pages a correct crawl should list
+    """
+    noindex = 0
+    for number in range(pages):
+        path = "index.html" if number == 0 else f"page-{number}/index.html"
+        children = range(number * FANOUT + 1, min((number + 1) * FANOUT + 1, pages))
+        links = "\n".join(
+            f'<li><a href="/page-{child}{"/" if child % 2 else ""}">Page {child}</a></li>'
+            for child in children
+        )
+        head = ""
+        if number and number % 97 == 0:
+            head = '<meta name="robots" content="noindex">\n'
+            noindex += 1
+        _write(os.path.join(directory, path),
+               PAGE_TEMPLATE.format(title=f"Page {number}", head=head, links=links))
+
+    _write(os.path.join(directory, "about", "index.html"),
+           PAGE_TEMPLATE.format(title="About", head='<link rel="canonical" href="/about/">\n', links=""))
+    _write(os.path.join(directory, "private", "index.html"),
+           PAGE_TEMPLATE.format(title="Private", head="", links='<li><a href="/private/secret/">Secret</a></li>'))
+    _write(os.path.join(directory, "admin", "login.html"),
+           PAGE_TEMPLATE.format(title="Admin", head="", links=""))
+    _write(os.path.join(directory, "assets", "site.css"), "body { font-family: sans-serif; }\n")
+    _write(os.path.join(directory, "robots.txt"),
+           ROBOTS_TEMPLATE.format(delay=f"\nCrawl-delay: {crawl_delay:g}\n" if crawl_delay else ""))
+    return pages - noindex + 1  # Plus /about/
+
+class FixtureHandler(SimpleHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep connections alive between requests
+
+    def log_message(self, format, *args):
+        pass
+
+class StaticSite:
+    """Serve a directory on a background thread"""
+
+    def __init__(self, directory: str, port: int = 0):
+        handler = partial(FixtureHandler, directory=directory)
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server.server_port}"
+
+    def start(self) -> "StaticSite":
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+def main():
+    args = sys.argv[1:]
+
+    def option(name, default, cast):
+        if name in args:
+            return cast(args[args.index(name) + 1])
+        return default
+
+    if "-h" in args or "--help" in args:
+        print("Usage:")
+        print("  python static_site_fixture.py <directory> [--build] [--pages 1000]")
+        print("                                [--crawl-delay 0] [--port 8091]")
+        sys.exit(0)
+
+    directory = args[0] if args and not args[0].startswith("--") else "fixture-site"
+    if "--build" in args or not os.path.isdir(directory):
+        expected = build_site(directory, option("--pages", DEFAULT_PAGES, int),
+                              option("--crawl-delay", 0, float))
+        print(f"✅ Built {directory} ({expected} indexable pages)")
+
+    site = StaticSite(directory, option("--port", DEFAULT_PORT, int))
+    print(f"Serving {directory} on {site.base_url}")
+    print(f"Use: python3 site_crawler.py {site.base_url}/")
+    try:
+        site.server.serve_forever()
+    except KeyboardInterrupt:
+        site.stop()
+
+if __name__ == "__main__":
+    main()
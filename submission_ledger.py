@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Persistent ledger of Indexing API notifications
+Records each URL's last notification and a fingerprint of its content so
+unchanged pages are not resubmitted and daily publish quota is not wasted
+"""
+
+import hashlib
+import os
+import sqlite3
+from datetime import datetime
+from typing import Dict, Optional
+
+from api_client import ApiError, get_client
+
+LEDGER_FILE = os.path.expanduser("~/.cache/gsc-indexing-tools/submissions.db")
+
+# Seconds a write waits for another run's transaction before giving up
+BUSY_TIMEOUT = 60
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS submissions (
+    url TEXT PRIMARY KEY,
+    action TEXT,
+    notified_at TEXT,
+    fingerprint TEXT,
+    seen_fingerprint TEXT,
+    checked_at TEXT
+) WITHOUT ROWID
+"""
+
+def header_fingerprint(headers: Dict[str, str]) -> Optional[str]:
+    """'etag:...' or 'modified:...' from (lowercased) response headers, if either is present"""
+    if headers.get("etag"):
+        return "etag:" + headers["etag"]
+    if headers.get("last-modified"):
+        return "modified:" + headers["last-modified"]
+    return None
+
+def fetch_fingerprint(url: str, previous: Optional[str] = None) -> Optional[str]:
+    """
+    Cheaply identify the current content of a page
+
+    Sends a HEAD request, conditional on the previous fingerprint when it
+    came from an ETag or Last-Modified header. Only when the server sends
+    neither header is the body downloaded and hashed.
+
+    Returns:
+        'etag:...', 'modified:...' or 'sha256:...', previous on a 304, or
+        None if the page could not be fetched
+    """
+    headers = {}
+    if previous and previous.startswith("etag:"):
+        headers["If-None-Match"] = previous[len("etag:"):]
+    elif previous and previous.startswith("modified:"):
+        headers["If-Modified-Since"] = previous[len("modified:"):]
+
+    client = get_client()
+    try:
+        response = client.request("HEAD", url, headers)
+        if response.status_code == 304:
+            return previous
+        if response.status_code >= 400:
+            return None
+        fingerprint = header_fingerprint(response.headers)
+        if fingerprint:
+            return fingerprint
+
+        response = client.request("GET", url)
+    except ApiError:
+        return None
+
+    if not response.ok:
+        return None
+    return "sha256:" + hashlib.sha256(response.body).hexdigest()
+
+class SubmissionLedger:
+    """
+    SQLite table of url -> last action, notify time and content fingerprints
+
+    fingerprint is the content that was last notified; seen_fingerprint is
+    the content observed by the latest check, promoted to fingerprint once
+    a URL_UPDATED notification for it succeeds. Lookups go through the
+    url primary key, so checking a million-URL list stays fast.
+
+    Not thread-safe: use one ledger from one thread.
+    """
+
+    def __init__(self, path: str = LEDGER_FILE):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(SCHEMA)
+        self.conn.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def get(self, url: str) -> Optional[Dict]:
+        """Return the ledger row for url, or None if it was never seen"""
+        row = self.conn.execute("SELECT * FROM submissions WHERE url = ?", (url,)).fetchone()
+        return dict(row) if row else None
+
+    def mark_seen(self, url: str, fingerprint: Optional[str]):
+        """Record the fingerprint observed by a content check"""
+        self.conn.execute(
+            """
+            INSERT INTO submissions (url, seen_fingerprint, checked_at) VALUES (?, ?, ?)
+            ON CONFLICT(url) DO UPDATE SET
+                seen_fingerprint = excluded.seen_fingerprint,
+                checked_at = excluded.checked_at
+            """,
+            (url, fingerprint, datetime.now().isoformat())
+        )
+        self._wrote()
+
+    def mark_notified(self, url: str, action: str):
+        """Record a successful notification of the last seen content"""
+        self.conn.execute(
+            """
+            INSERT INTO submissions (url, action, notified_at) VALUES (?, ?, ?)
+            ON CONFLICT(url) DO UPDATE SET
+                action = excluded.action,
+                notified_at = excluded.notified_at,
+                fingerprint = CASE WHEN excluded.action = 'URL_UPDATED'
+                                   THEN submissions.seen_fingerprint END
+            """,
+            (url, action, datetime.now().isoformat())
+        )
+        self._wrote()
+
+    def is_unchanged(self, row: Optional[Dict], action: str, fingerprint: Optional[str] = None) -> bool:
+        """
+        Whether sending action for this URL would repeat its last notification
+
+        Deletions repeat if the URL was last notified as deleted. Updates
+        repeat if the content fingerprint matches the last notified one; an
+        unknown fingerprint always counts as changed.
+        """
+        if not row or row["action"] != action:
+            return False
+        if action == "URL_DELETED":
+            return True
+        return fingerprint is not None and row["fingerprint"] == fingerprint
+
+    def _wrote(self):
+        # Commit every write so the write lock is held only briefly and concurrent
+        # runs sharing the ledger interleave; in WAL mode with synchronous=NORMAL
+        # a commit does not fsync, so this stays cheap
+        self.conn.commit()
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+On-disk OAuth access token cache
+Reuses a token until shortly before it expires and refreshes it under a
+file lock, so parallel processes share one refresh instead of each doing their own
+"""
+
+import fcntl
+import hashlib
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional
+
+CACHE_DIR = os.path.expanduser("~/.cache/gsc-indexing-tools")
+
+# Refresh this many seconds before the token actually expires
+EXPIRY_MARGIN = 300
+
+# Used when the token endpoint omits expires_in (Google tokens last 3600s)
+DEFAULT_EXPIRES_IN = 3600
+
+# Lifetime a command should ask for when it fetches its token once at start:
+# a quota-paced run must not begin with a token that dies minutes in
+RUN_LIFETIME = 3000
+
+class TokenRefreshError(Exception):
+    """The refresh callback did not return an access token"""
+
+def cache_path(name: str) -> str:
+    """Path of a named token cache under CACHE_DIR"""
+    return os.path.join(CACHE_DIR, f"{name}.json")
+
+def fingerprint(*parts: str) -> str:
+    """Short stable hash identifying the credentials a token was minted from"""
+    return hashlib.sha256("\0".join(parts).encode()).hexdigest()[:16]
+
+class TokenCache:
+    """
+    A JSON token file holding access_token and expires_at (epoch seconds)
+
+    Other fields in the file (e.g. refresh_token) are preserved, so it can
+    wrap an existing token store such as ~/.indexing_tokens.json.
+    """
+
+    _thread_lock = threading.Lock()
+
+    def __init__(self, path: str, margin: float = EXPIRY_MARGIN):
+        self.path = path
+        self.margin = margin
+
+    @contextmanager
+    def _locked(self):
+        """Hold an exclusive lock shared by threads and processes"""
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with self._thread_lock:
+            with open(self.path + ".lock", "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def load(self) -> Dict:
+        """Return the stored tokens, or {} if there are none"""
+        try:
+            with open(self.path, "r") as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def store(self, tokens: Dict):
+        """Atomically write tokens, stamping expires_at from expires_in"""
+        tokens = dict(tokens)
+        if "access_token" in tokens and "expires_at" not in tokens:
+            expires_in = tokens.get("expires_in", DEFAULT_EXPIRES_IN)
+            tokens["expires_at"] = time.time() + float(expires_in)
+
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w") as f:
+            json.dump(tokens, f)
+        os.replace(tmp_path, self.path)
+
+    def _valid_token(self, tokens: Dict, source: Optional[str], min_lifetime: float) -> Optional[str]:
+        if source is not None and tokens.get("source") != source:
+            return None
+        if tokens.get("expires_at", 0) - min_lifetime <= time.time():
+            return None
+        return tokens.get("access_token")
+
+    def get_token(self, refresh: Callable[[Dict], Dict], source: Optional[str] = None,
+                  min_lifetime: Optional[float] = None) -> str:
+        """
+        Return a cached access token, refreshing it if it is missing or expiring
+
+        Args:
+            refresh: Called with the stored tokens; returns a token endpoint
+                     response containing access_token and expires_in
+            source: Optional credentials fingerprint; a cached token minted
+                    from different credentials is not reused
+            min_lifetime: Seconds the returned token must still be valid for
+                          (default: the cache's margin); see RUN_LIFETIME
+
+        Raises:
+            TokenRefreshError: if refresh returns no access_token
+        """
+        min_lifetime = self.margin if min_lifetime is None else min_lifetime
+        token = self._valid_token(self.load(), source, min_lifetime)
+        if token:
+            return token
+
+        with self._locked():
+            # Another process may have refreshed while we waited for the lock
+            tokens = self.load()
+            token = self._valid_token(tokens, source, min_lifetime)
+            if token:
+                return token
+
+            response = refresh(tokens)
+            if "access_token" not in response:
+                raise TokenRefreshError(f"Token refresh failed: {response}")
+
+            tokens.update(response)
+            if "expires_at" not in response:
+                tokens.pop("expires_at", None)  # Re-derive from the new expires_in
+            if source is not None:
+                tokens["source"] = source
+            self.store(tokens)
+            return tokens["access_token"]
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Small SQLite key/value cache with per-read TTLs
+Used to keep API lookups (URL notification metadata, inspections) on disk
+so repeated reports read them locally instead of spending quota
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+
+CACHE_DIR = os.path.expanduser("~/.cache/gsc-indexing-tools")
+
+class TTLCache:
+    """
+    JSON values keyed by string, each stamped with the time it was stored
+
+    The TTL is applied when reading, so different callers can accept
+    different staleness from the same cache. Safe to share between threads.
+    """
+
+    def __init__(self, path: str, default_ttl: float):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.default_ttl = default_ttl
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, stored_at REAL NOT NULL"
+            ") WITHOUT ROWID"
+        )
+        self.conn.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def get(self, key: str, ttl: Optional[float] = None) -> Optional[Tuple[Dict, float]]:
+        """
+        Return (value, stored_at) if key was stored within ttl seconds
+
+        ttl defaults to default_ttl; a ttl of 0 always misses.
+        """
+        ttl = self.default_ttl if ttl is None else ttl
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT value, stored_at FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None or time.time() - row[1] >= ttl:
+            return None
+        return json.loads(row[0]), row[1]
+
+    def set(self, key: str, value: Dict):
+        self.set_many([(key, value)])
+
+    def set_many(self, items: Iterable[Tuple[str, Dict]]):
+        """Store several values in one transaction"""
+        now = time.time()
+        rows = [(key, json.dumps(value), now) for key, value in items]
+        with self._lock:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO entries (key, value, stored_at) VALUES (?, ?, ?)", rows
+            )
+            self.conn.commit()
+
+    def items(self, ttl: Optional[float] = None) -> Iterator[Tuple[str, Dict, float]]:
+        """Yield (key, value, stored_at) for every entry fresher than ttl"""
+        cutoff = time.time() - (self.default_ttl if ttl is None else ttl)
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT key, value, stored_at FROM entries WHERE stored_at > ? ORDER BY key",
+                (cutoff,)
+            ).fetchall()
+        for key, value, stored_at in rows:
+            yield key, json.loads(value), stored_at
+
+    def purge(self, max_age: float) -> int:
+        """Delete entries older than max_age seconds; returns how many"""
+        with self._lock:
+            cursor = self.conn.execute(
+                "DELETE FROM entries WHERE stored_at <= ?", (time.time() - max_age,)
+            )
+            self.conn.commit()
+        return cursor.rowcount
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Bulk URL Inspection
+Inspects sitemap URLs concurrently within the per-property inspection
+quota, caching each result so re-runs only spend quota on stale URLs
+"""
+
+import os
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional
+from urllib.parse import quote
+
+from api_client import call_api
+from rate_limiter import QUOTAS, QuotaScheduler
+from ttl_cache import CACHE_DIR, TTLCache
+
+INSPECTION_URL = "https://searchconsole.googleapis.com/v1/urlInspection/index:inspect"
+INSPECTION_CACHE = os.path.join(CACHE_DIR, "url_inspection.db")
+INSPECTION_TTL = 24 * 3600  # Seconds a cached inspection stays fresh
+DEFAULT_INSPECT_CONCURRENCY = 8
+
+def inspect_url(token: str, site_url: str, page_url: str,
+                headers: Optional[Dict[str, str]] = None) -> Dict:
+    """One urlInspection.index.inspect call"""
+    return call_api('POST', INSPECTION_URL, token=token, headers=headers,
+                    json_body={"inspectionUrl": page_url, "siteUrl": site_url})
+
+def inspection_scheduler(site_url: str, per_minute: Optional[int] = None,
+                         per_day: Optional[int] = None) -> QuotaScheduler:
+    """Quota scheduler for one property; inspection quota is per site, not per project"""
+    defaults = QUOTAS["inspection"]
+    return QuotaScheduler(
+        f"inspection:{site_url}",
+        per_minute if per_minute is not None else defaults["per_minute"],
+        per_day if per_day is not None else defaults["per_day"],
+    )
+
+def default_sitemaps(token: str, site_url: str,
+                     headers: Optional[Dict[str, str]] = None) -> List[str]:
+    """Sitemaps submitted for the property, falling back to /sitemap.xml"""
+    url = f"https://www.googleapis.com/webmasters/v3/sites/{quote(site_url, safe='')}/sitemaps"
+    response = call_api('GET', url, token=token, headers=headers)
+    paths = [entry["path"] for entry in response.get("sitemap", []) if entry.get("path")]
+    if paths:
+        return paths
+    if site_url.startswith("sc-domain:"):
+        return [f"https://{site_url[len('sc-domain:'):]}/sitemap.xml"]
+    return [site_url.rstrip("/") + "/sitemap.xml"]
+
+def coverage_state(result: Dict) -> str:
+    """coverageState of an inspection result, or a label for an API error"""
+    if "error" in result:
+        return f"API error ({result['error'].get('code')})"
+    status = result.get("inspectionResult", {}).get("indexStatusResult", {})
+    return status.get("coverageState", "Unknown")
+
+def is_indexed(result: Dict) -> bool:
+    status = result.get("inspectionResult", {}).get("indexStatusResult", {})
+    return status.get("verdict") == "PASS"
+
+def inspect_urls(token: str, site_url: str, urls: Iterable[str],
+                 concurrency: int = DEFAULT_INSPECT_CONCURRENCY,
+                 limiter: Optional[QuotaScheduler] = None,
+                 cache: Optional[TTLCache] = None, ttl: Optional[float] = None,
+                 deferred: Optional[List[str]] = None,
+                 headers: Optional[Dict[str, str]] = None) -> Iterator[Dict]:
+    """
+    Inspect URLs and yield {url, result, cached, inspected_at} as each finishes
+
+    Duplicate URLs are inspected once. Fresh cached results are yielded
+    without an API call or quota; the rest are paced by limiter, with URLs
+    beyond its daily quota appended to deferred. Only successful
+    inspections are cached. At most 2 * concurrency calls are queued.
+    """
+    def fetch(url: str) -> Dict:
+        result = inspect_url(token, site_url, url, headers)
+        if cache is not None and "error" not in result:
+            cache.set(f"{site_url} {url}", result)
+        return {"url": url, "result": result, "cached": False,
+                "inspected_at": datetime.now().isoformat(timespec="seconds")}
+
+    seen = set()
+    exhausted = False
+    with ThreadPoolExecutor(max_workers=max(concurrency, 1)) as executor:
+        in_flight = set()
+        for url in urls:
+            if url in seen:
+                continue
+            seen.add(url)
+
+            hit = cache.get(f"{site_url} {url}", ttl) if cache is not None else None
+            if hit is not None:
+                value, stored_at = hit
+                yield {"url": url, "result": value, "cached": True,
+                       "inspected_at": datetime.fromtimestamp(stored_at).isoformat(timespec="seconds")}
+                continue
+
+            if limiter is not None and (exhausted or not limiter.acquire(1)):
+                exhausted = True
+                if deferred is not None:
+                    deferred.append(url)
+                continue
+
+            in_flight.add(executor.submit(fetch, url))
+            while len(in_flight) >= 2 * max(concurrency, 1):
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+
+        while in_flight:
+            done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+
+class CoverageSummary:
+    """Running counts by coverage state, filled as records stream past"""
+
+    def __init__(self):
+        self.states = Counter()
+        self.total = 0
+        self.indexed = 0
+        self.cached = 0
+
+    def add(self, record: Dict):
+        self.total += 1
+        self.states[coverage_state(record["result"])] += 1
+        self.indexed += is_indexed(record["result"])
+        self.cached += record["cached"]